@@ -0,0 +1,534 @@
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from benchmarks.synthetic import SyntheticOrg
+
+# Resource locations the SDK clients used by adobackup resolve through OPTIONS /_apis.
+# The ids are the service's own; the route templates match the paths handled below.
+LOCATIONS = [
+    ("603fe2ac-9723-48b9-88ad-09305aa6c6e1", "core", "projects", "_apis/projects/{projectId}"),
+    ("d30a3dd1-f8ba-442a-b86a-bd0c0c383e59", "core", "teams", "_apis/projects/{projectId}/teams"),
+    ("c9175577-28a1-4b06-9197-8636af9f64ad", "work", "iterations", "{project}/{team}/_apis/work/teamsettings/iterations/{id}"),
+    ("1a9c53f7-f243-4447-b110-35ef023636e4", "wit", "wiql", "{project}/{team}/_apis/wit/wiql/{id}"),
+    ("72c7ddf8-2cdc-4f60-90cd-ab71c14a399b", "wit", "workItemsBatch", "{project}/_apis/wit/workitems"),
+    ("b70d8d39-926c-465e-b927-b1bf0e5ca0e0", "wit", "recyclebin", "{project}/_apis/wit/recyclebin/{id}"),
+    ("225f7195-f9c7-4d14-ab28-a83f7ff77e1f", "git", "repositories", "{project}/_apis/git/repositories/{repositoryId}"),
+    ("28e1305e-2afe-47bf-abaf-cbb0e6a91988", "pipelines", "pipelines", "{project}/_apis/pipelines/{pipelineId}"),
+    ("0e292477-a0c2-47f3-a9b6-34f153d627f4", "testplan", "plans", "{project}/_apis/testplan/plans/{planId}"),
+    ("1046d5d3-ab61-4ca7-a65a-36118a978256", "testplan", "suites", "{project}/_apis/testplan/Plans/{planId}/suites/{suiteId}"),
+    ("a9bd61ac-45cf-4d13-9441-43dcd01edf8d", "testplan", "testcase",
+     "{project}/_apis/testplan/Plans/{planId}/Suites/{suiteId}/TestCase/{testCaseId}"),
+    ("dbeaf647-6167-421a-bda9-c9327b25e2e6", "build", "definitions", "{project}/_apis/build/definitions/{definitionId}"),
+    ("d8f96f24-8ea7-4cb6-baab-2df8fc515665", "release", "definitions", "{project}/_apis/release/definitions/{definitionId}"),
+    ("e81700f7-3be2-46de-8624-2eb35882fcaa", "location", "resourceAreas", "_apis/resourceAreas/{areaId}"),
+]
+
+SEG = r"(?P<{}>[^/]+)"
+ROUTES = [
+    ("OPTIONS", r"_apis", "options"),
+    ("GET", r"_apis/resourceAreas", "resource_areas"),
+    ("GET", r"_apis/projects", "projects"),
+    ("POST", r"_apis/projects", "create_project"),
+    ("GET", rf"_apis/projects/{SEG.format('project')}/teams", "teams"),
+    ("GET", rf"{SEG.format('project')}(?:/{SEG.format('team')})?/_apis/work/teamsettings/iterations", "iterations"),
+    ("POST", rf"{SEG.format('project')}(?:/{SEG.format('team')})?/_apis/work/teamsettings/iterations", "create_iteration"),
+    ("POST", rf"{SEG.format('project')}(?:/{SEG.format('team')})?/_apis/wit/wiql", "wiql"),
+    ("GET", rf"(?:{SEG.format('project')}/)?_apis/wit/workitems", "work_items"),
+    ("POST", r"_apis/wit/\$batch", "work_item_batch"),
+    ("GET", rf"{SEG.format('project')}/_apis/wit/recyclebin", "recycle_bin"),
+    ("GET", rf"(?:{SEG.format('project')}/)?_apis/git/repositories", "repositories"),
+    ("POST", rf"{SEG.format('project')}/_apis/git/repositories", "create_repository"),
+    ("GET", rf"{SEG.format('project')}/_apis/pipelines(?:/(?P<id>\d+))?", "pipelines"),
+    ("POST", rf"{SEG.format('project')}/_apis/pipelines", "create_pipeline"),
+    ("GET", rf"{SEG.format('project')}/_apis/testplan/plans", "test_plans"),
+    ("GET", rf"{SEG.format('project')}/_apis/testplan/Plans/(?P<plan>\d+)/suites", "test_suites"),
+    ("GET", rf"{SEG.format('project')}/_apis/testplan/Plans/(?P<plan>\d+)/Suites/(?P<suite>\d+)/TestCase", "test_cases"),
+    ("GET", rf"{SEG.format('project')}/_apis/(?P<kind>build|release)/definitions", "definitions"),
+    ("POST", rf"{SEG.format('project')}/_apis/(?P<kind>build|release)/definitions", "create_definition"),
+    ("GET", rf"{SEG.format('project')}/_apis/wiki/wikis", "wikis"),
+    (None, rf"{SEG.format('project')}/_git/(?P<repo>[^/]+?)(?:\.git)?(?P<rest>/.*)", "git"),
+]
+ROUTES = [(method, re.compile(pattern + "/?$", re.IGNORECASE), name) for method, pattern, name in ROUTES]
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeAzureDevOps:
+    """Local stand-in for the Azure DevOps REST endpoints and git remotes adobackup talks to.
+
+    Serves one or more SyntheticOrg instances at http://127.0.0.1:<port>/<org>,
+    including the OPTIONS resource location discovery the azure-devops SDK
+    performs, so the real clients (and PooledConnection) are exercised end
+    to end. Git traffic is served by `git http-backend` over the same port.
+
+    Faults are injected per request: latency (plus uniform jitter) before
+    answering, a throttle_rate fraction of 429s with Retry-After, 429s for
+    requests beyond max_concurrency in flight, and X-RateLimit-* headers
+    once more than rate_limit requests were answered. List endpoints page
+    at page_size with X-MS-ContinuationToken like the service does.
+    """
+
+    def __init__(self, orgs, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 1.0, max_concurrency: int = None, rate_limit: int = None,
+                 page_size: int = 100, seed: int = 0):
+        self.orgs = {org.name.lower(): org for org in orgs}
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.page_size = page_size
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._in_flight = 0
+        self.calls = Counter()
+        self.throttled = 0
+        self.peak_concurrency = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def org_url(self, name: str) -> str:
+        return f"{self.url}/{name}"
+
+    def add_org(self, org: SyntheticOrg):
+        self.orgs[org.name.lower()] = org
+
+    def start(self) -> "FakeAzureDevOps":
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "api_calls": sum(count for (_, name), count in self.calls.items() if name != "git"),
+                "git_requests": sum(count for (_, name), count in self.calls.items() if name == "git"),
+                "throttled": self.throttled,
+                "peak_concurrency": self.peak_concurrency,
+                "calls": {f"{method} {name}": count for (method, name), count in sorted(self.calls.items())}
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.throttled = 0
+            self.peak_concurrency = 0
+
+    # -- fault injection -------------------------------------------------
+
+    def _admit(self, route: str) -> dict:
+        """Enter a request; returns extra response headers, or raises HttpError(429)"""
+        with self._lock:
+            self._in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._in_flight)
+            answered = sum(self.calls.values())
+            throttle = (self.max_concurrency is not None and self._in_flight > self.max_concurrency) \
+                or (self.throttle_rate and route != "options" and self._rng.random() < self.throttle_rate)
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if throttle:
+            with self._lock:
+                self.throttled += 1
+            raise HttpError(429, "Request was blocked due to exceeding usage of resource")
+        if self.rate_limit is not None and answered >= self.rate_limit:
+            return {
+                "X-RateLimit-Resource": "ATCPU",
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Delay": "0.5"
+            }
+        return {}
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    # -- paging ----------------------------------------------------------
+
+    def _page(self, items: list, query: dict):
+        """Slice a listing by $top and continuationToken (or $skip); returns (page, next token or None)"""
+        start = int(query.get("continuationToken") or query.get("$skip") or 0)
+        size = int(query.get("$top") or self.page_size)
+        end = start + size
+        return items[start:end], (str(end) if end < len(items) else None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeAzureDevOps = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PATCH(self):
+        self._dispatch()
+
+    def do_OPTIONS(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        segments = parts.path.strip("/").split("/", 1)
+        org = self.fake.orgs.get(unquote(segments[0]).lower())
+        rest = segments[1] if len(segments) > 1 else ""
+        body = self._read_body()
+
+        route, match = None, None
+        for method, pattern, name in ROUTES:
+            match = pattern.match(unquote(rest))
+            if match and (method is None or method == self.command):
+                route = name
+                break
+
+        with self.fake._lock:
+            self.fake.calls[(self.command, route or "unrouted")] += 1
+        if org is None or route is None:
+            self._send_json(404, {"message": f"No fake route for {self.command} {parts.path}"})
+            return
+
+        headers = {}
+        try:
+            headers = self.fake._admit(route)
+            if route == "git":
+                self._git(org, match, parts.query, body)
+                return
+            handler = getattr(self, f"_{route}")
+            status, payload, extra = handler(org, match.groupdict(), query, json.loads(body) if body else None)
+            headers.update(extra)
+            self._send_json(status, payload, headers)
+        except HttpError as e:
+            if e.status == 429:
+                headers = {**headers, "Retry-After": str(self.fake.retry_after)}
+            self._send_json(e.status, {"message": str(e)}, headers)
+        finally:
+            self.fake._leave()
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _base(self, org) -> str:
+        return f"http://{self.headers.get('Host')}/{quote(org.name)}"
+
+    def _project(self, org, key: str) -> dict:
+        project = org.project(key or "")
+        if project is None:
+            raise HttpError(404, f"TF200016: The following project does not exist: {key}")
+        return project
+
+    @staticmethod
+    def _collection(items: list, token: str = None):
+        return 200, {"count": len(items), "value": items}, ({"X-MS-ContinuationToken": token} if token else {})
+
+    # -- git ---------------------------------------------------------------
+
+    def _git(self, org, match, query_string: str, body: bytes):
+        """Serve git smart HTTP for a repository by running git http-backend as a CGI"""
+        project = self._project(org, match["project"])
+        env = {
+            **os.environ,
+            "GIT_PROJECT_ROOT": str(org.git_root),
+            "GIT_HTTP_EXPORT_ALL": "1",
+            "REMOTE_USER": "bench",
+            "REQUEST_METHOD": self.command,
+            "PATH_INFO": f"/{project['name']}/{match['repo']}.git{match['rest']}",
+            "QUERY_STRING": query_string,
+            "CONTENT_TYPE": self.headers.get("Content-Type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "GIT_PROTOCOL": self.headers.get("Git-Protocol", ""),
+            "HTTP_CONTENT_ENCODING": self.headers.get("Content-Encoding", "")
+        }
+        result = subprocess.run(["git", "http-backend"], input=body, env=env, capture_output=True)
+        head, _, payload = result.stdout.partition(b"\r\n\r\n")
+        status = 200
+        headers = []
+        for line in head.decode("latin-1").split("\r\n"):
+            key, _, value = line.partition(":")
+            if key.lower() == "status":
+                status = int(value.split()[0])
+            elif key:
+                headers.append((key, value.strip()))
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # -- REST handlers: (org, route params, query, json body) -> (status, payload, headers) ---------
+
+    def _options(self, org, params, query, body):
+        locations = [
+            {
+                "id": location_id, "area": area, "resourceName": resource, "routeTemplate": template,
+                "resourceVersion": 1, "minVersion": "1.0", "maxVersion": "7.2", "releasedVersion": "7.1"
+            }
+            for location_id, area, resource, template in LOCATIONS
+        ]
+        return self._collection(locations)
+
+    def _resource_areas(self, org, params, query, body):
+        # No resource areas: every client talks to the organization URL, as on Azure DevOps Server
+        return self._collection([])
+
+    def _projects(self, org, params, query, body):
+        projects = [
+            {key: p[key] for key in ("id", "name", "description", "state", "visibility", "revision", "lastUpdateTime")}
+            for p in org.projects.values()
+        ]
+        return self._collection(*self.fake._page(projects, query))
+
+    def _create_project(self, org, params, query, body):
+        if org.project(body["name"]) is not None:
+            raise HttpError(409, f"TF200019: The following project already exists: {body['name']}")
+        project = org.add_project(body["name"], body.get("description") or "")
+        return 202, {"id": project["id"], "status": "succeeded", "url": f"{self._base(org)}/_apis/operations"}, {}
+
+    def _teams(self, org, params, query, body):
+        return self._collection(self._project(org, params["project"])["teams"])
+
+    def _iterations(self, org, params, query, body):
+        return self._collection(self._project(org, params["project"])["iterations"])
+
+    def _create_iteration(self, org, params, query, body):
+        return 200, org.add_iteration(params["project"], body), {}
+
+    def _wiql(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        text = body.get("query", "")
+        after = re.search(r"\[System\.Id\]\s*>\s*(\d+)", text)
+        changed = re.search(r"\[System\.ChangedDate\]\s*>=\s*'([^']+)'", text)
+        items = sorted(
+            wi["id"] for wi in org.project_work_items(project)
+            if (after is None or wi["id"] > int(after.group(1)))
+            and (changed is None or wi["fields"]["System.ChangedDate"] >= changed.group(1))
+        )
+        top = int(query.get("$top") or 20000)
+        refs = [{"id": wi_id, "url": f"{self._base(org)}/_apis/wit/workItems/{wi_id}"} for wi_id in items[:top]]
+        return 200, {"queryType": "flat", "asOf": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "workItems": refs}, {}
+
+    def _work_item(self, org, wi: dict) -> dict:
+        base = self._base(org)
+        return {
+            "id": wi["id"],
+            "rev": wi["rev"],
+            "fields": wi["fields"],
+            "relations": [{**r, "url": r["url"].replace("{base}", base)} for r in wi["relations"]],
+            "url": f"{base}/_apis/wit/workItems/{wi['id']}"
+        }
+
+    def _work_items(self, org, params, query, body):
+        ids = [int(i) for i in query.get("ids", "").split(",") if i]
+        if len(ids) > 200:
+            raise HttpError(400, "VS402337: The number of work items requested exceeds the limit of 200")
+        return self._collection([
+            self._work_item(org, org.work_items[i]) if i in org.work_items else None for i in ids
+        ])
+
+    def _work_item_batch(self, org, params, query, body):
+        responses = []
+        for request in body:
+            path = unquote(urlsplit(request["uri"]).path)
+            create = re.match(r"/(?P<project>[^/]+)/_apis/wit/workitems/\$(?P<type>.+)$", path)
+            update = re.match(r"/_apis/wit/workitems/(?P<id>\d+)$", path)
+            try:
+                if create:
+                    project = self._project(org, create["project"])
+                    fields = {
+                        op["path"][len("/fields/"):]: op["value"]
+                        for op in request["body"] if op["path"].startswith("/fields/")
+                    }
+                    wi = org.add_work_item(project["name"], {**fields, "System.WorkItemType": create["type"]})
+                elif update and int(update["id"]) in org.work_items:
+                    wi = org.work_items[int(update["id"])]
+                    for op in request["body"]:
+                        if op["path"] == "/relations/-":
+                            wi["relations"].append(op["value"])
+                        elif op["path"].startswith("/fields/") and op["op"] == "remove":
+                            wi["fields"].pop(op["path"][len("/fields/"):], None)
+                        elif op["path"].startswith("/fields/"):
+                            wi["fields"][op["path"][len("/fields/"):]] = op["value"]
+                    wi["rev"] += 1
+                else:
+                    raise HttpError(404, f"TF401232: Work item {path} does not exist")
+                responses.append({"code": 200, "headers": {}, "body": json.dumps(self._work_item(org, wi))})
+            except HttpError as e:
+                responses.append({"code": e.status, "headers": {}, "body": json.dumps({"message": str(e)})})
+        return self._collection(responses)
+
+    def _recycle_bin(self, org, params, query, body):
+        self._project(org, params["project"])
+        return self._collection([])
+
+    def _repository(self, org, project: dict, repo: dict) -> dict:
+        url = f"{self._base(org)}/{quote(project['name'])}/_git/{quote(repo['name'])}"
+        return {
+            "id": repo["id"],
+            "name": repo["name"],
+            "url": url,
+            "remoteUrl": url,
+            "defaultBranch": "refs/heads/main",
+            "size": sum(f.stat().st_size for f in repo["path"].rglob("*") if f.is_file()),
+            "project": {"id": project["id"], "name": project["name"]}
+        }
+
+    def _repositories(self, org, params, query, body):
+        projects = [self._project(org, params["project"])] if params.get("project") else org.projects.values()
+        return self._collection([
+            self._repository(org, project, repo) for project in projects for repo in project["repos"] if not repo["wiki"]
+        ])
+
+    def _create_repository(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        if any(r["name"].lower() == body["name"].lower() for r in project["repos"]):
+            raise HttpError(409, f"TF400948: A Git repository with the name {body['name']} already exists.")
+        return 201, self._repository(org, project, org.add_repo(project["name"], body["name"])), {}
+
+    def _pipelines(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        base = f"{self._base(org)}/{quote(project['name'])}/_apis/pipelines"
+        if params.get("id"):
+            pipeline = next((p for p in project["pipelines"] if p["id"] == int(params["id"])), None)
+            if pipeline is None:
+                raise HttpError(404, f"Pipeline {params['id']} not found")
+            return 200, {
+                **pipeline,
+                "url": f"{base}/{pipeline['id']}",
+                "configuration": pipeline.get("configuration") or {
+                    "type": "yaml", "path": f"/{pipeline['name']}.yml",
+                    "repository": {"id": project["repos"][0]["id"] if project["repos"] else None, "type": "azureReposGit"}
+                }
+            }, {}
+        pipelines = [{**p, "url": f"{base}/{p['id']}"} for p in project["pipelines"]]
+        return self._collection(*self.fake._page(pipelines, query))
+
+    def _create_pipeline(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        if any(p["name"].lower() == body["name"].lower() for p in project["pipelines"]):
+            raise HttpError(409, f"A pipeline with the name {body['name']} already exists.")
+        pipeline = org.add_pipeline(project["name"], body["name"])
+        pipeline.update(folder=body.get("folder") or "\\", configuration=body.get("configuration"))
+        return 200, {**pipeline, "url": f"{self._base(org)}/{quote(project['name'])}/_apis/pipelines/{pipeline['id']}"}, {}
+
+    def _test_plans(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        plans = [
+            {"id": p["id"], "name": p["name"], "state": p["state"], "revision": p["revision"],
+             "project": {"id": project["id"], "name": project["name"]}}
+            for p in project["plans"]
+        ]
+        return self._collection(*self.fake._page(plans, query))
+
+    def _plan(self, org, params) -> dict:
+        project = self._project(org, params["project"])
+        plan = next((p for p in project["plans"] if p["id"] == int(params["plan"])), None)
+        if plan is None:
+            raise HttpError(404, f"Test plan {params['plan']} not found")
+        return plan
+
+    def _test_suites(self, org, params, query, body):
+        plan = self._plan(org, params)
+        suites = [
+            {"id": s["id"], "name": s["name"], "suiteType": s["suiteType"], "revision": s["revision"],
+             "plan": {"id": plan["id"], "name": plan["name"]}}
+            for s in plan["suites"]
+        ]
+        return self._collection(*self.fake._page(suites, query))
+
+    def _test_cases(self, org, params, query, body):
+        plan = self._plan(org, params)
+        suite = next((s for s in plan["suites"] if s["id"] == int(params["suite"])), None)
+        if suite is None:
+            raise HttpError(404, f"Test suite {params['suite']} not found")
+        cases = [
+            {"order": c["order"], "workItem": {"id": c["id"], "name": c["name"]},
+             "testPlan": {"id": plan["id"]}, "testSuite": {"id": suite["id"]}}
+            for c in suite["cases"]
+        ]
+        return self._collection(*self.fake._page(cases, query))
+
+    def _definitions(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        definitions = [
+            {**d, "project": {"id": project["id"], "name": project["name"]}}
+            for d in project[f"{params['kind'].lower()}s"]
+        ]
+        return self._collection(*self.fake._page(definitions, query))
+
+    def _create_definition(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        kind = params["kind"].lower()
+        if any(d["name"] == body.get("name") for d in project[f"{kind}s"]):
+            raise HttpError(409, f"A {kind} definition named {body.get('name')} already exists")
+        definition = {key: value for key, value in body.items() if key not in ("id", "project")}
+        return 200, org.add_definition(project["name"], kind, definition), {}
+
+    def _wikis(self, org, params, query, body):
+        project = self._project(org, params["project"])
+        return self._collection([
+            {
+                "id": repo["id"], "name": repo["name"], "type": "projectWiki", "projectId": project["id"],
+                "remoteUrl": f"{self._base(org)}/{quote(project['name'])}/_git/{quote(repo['name'])}"
+            }
+            for repo in project["repos"] if repo["wiki"]
+        ])
+
@@ -0,0 +1,219 @@
+"""Benchmark backup and restore against a local fake Azure DevOps organization.
+
+Generates a synthetic org, serves it (REST endpoints and git remotes) from
+benchmarks.fake_ado on 127.0.0.1, runs BackupEngine over it and then
+RestoreEngine from that backup into an empty org on the same server. The
+report holds wall time, throughput, peak traced memory and API call counts
+for both, and is printed as JSON (or written with --output) so runs can be
+compared across commits:
+
+    python benchmarks/run.py --work-items 5000 --latency 0.02 --output base.json
+    git checkout my-branch
+    python benchmarks/run.py --work-items 5000 --latency 0.02 --compare base.json
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "src")]
+
+COMPONENTS = ["Boards", "Repos", "Pipelines", "Test Plans", "Wikis"]
+COMPARED = [
+    ("backup", "seconds"), ("backup", "peak_memory_bytes"), ("backup", "api_calls"), ("backup", "records_per_second"),
+    ("restore", "seconds"), ("restore", "peak_memory_bytes"), ("restore", "api_calls"), ("restore", "work_items_per_second")
+]
+
+
+@contextmanager
+def measure(trace_memory: bool = True):
+    """Time a block and, optionally, track the peak of Python allocations made during it"""
+    result = {}
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        if trace_memory:
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_backup(server, args) -> dict:
+    from adobackup.core.backup_engine import BackupEngine
+
+    server.reset_stats()
+    with measure(not args.no_tracemalloc) as result:
+        engine = BackupEngine(args.org, args.pat, base_url=server.org_url(args.org))
+        backup, manifest = engine.backup_all(args.components, max_workers=args.max_workers)
+        engine.save_to_local(backup)
+    records = sum(entry["records"] for entry in backup["data"].values() if isinstance(entry, dict))
+    result.update({
+        "api_calls": server.stats()["api_calls"],
+        "server": server.stats(),
+        "client": backup["metadata"]["http"],
+        "rate_limit": {k: v for k, v in backup["metadata"]["rate_limit"].items() if k != "components"},
+        "records": records,
+        "records_per_second": round(records / result["seconds"], 1) if result["seconds"] else 0.0,
+        "snapshot_bytes": sum(f.stat().st_size for f in Path(backup["metadata"]["snapshot"]).rglob("*") if f.is_file()),
+        "timings": backup["metadata"]["timings"],
+        "errors": backup["metadata"]["errors"]
+    })
+    return result
+
+
+def run_restore(server, args) -> dict:
+    from adobackup.core.restore_engine import RestoreEngine
+
+    target = f"{args.org}-restore"
+    server.reset_stats()
+    error = None
+    with measure(not args.no_tracemalloc) as result:
+        engine = RestoreEngine(target, args.pat, max_workers=args.max_workers, base_url=server.org_url(target))
+        try:
+            engine.restore_all("Local Storage")
+        except Exception as e:
+            error = str(e)
+    work_items = engine.report.get("work_items", {}).get("created", 0)
+    result.update({
+        "api_calls": server.stats()["api_calls"],
+        "server": server.stats(),
+        "client": engine.report["http"],
+        "work_items": work_items,
+        "work_items_per_second": round(work_items / result["seconds"], 1) if result["seconds"] else 0.0,
+        "target": server.orgs[target.lower()].size(),
+        "phases": engine.metrics.report()["phases"],
+        "error": error
+    })
+    return result
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\n{'metric':<34}{'baseline':>14}{'current':>14}{'change':>10}")
+    for section, metric in COMPARED:
+        old = baseline.get(section, {}).get(metric)
+        new = current.get(section, {}).get(metric)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{section + '.' + metric:<34}{old:>14}{new:>14}{change:>10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark adobackup against a local fake Azure DevOps server")
+    size = parser.add_argument_group("organization size (per project)")
+    size.add_argument("--projects", type=int, default=3)
+    size.add_argument("--repos", type=int, default=2)
+    size.add_argument("--commits", type=int, default=20, help="Commits per repository")
+    size.add_argument("--work-items", type=int, default=1000)
+    size.add_argument("--work-item-bytes", type=int, default=512, help="Description size of each work item")
+    size.add_argument("--iterations", type=int, default=6)
+    size.add_argument("--pipelines", type=int, default=20)
+    size.add_argument("--test-plans", type=int, default=3)
+    size.add_argument("--suites", type=int, default=4, help="Suites per test plan")
+    size.add_argument("--cases", type=int, default=10, help="Test cases per suite")
+    size.add_argument("--wikis", type=int, default=1)
+    faults = parser.add_argument_group("fault injection")
+    faults.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    faults.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    faults.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of API calls answered with 429")
+    faults.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with each 429")
+    faults.add_argument("--max-concurrency", type=int, help="Answer 429 above this many requests in flight")
+    faults.add_argument("--rate-limit", type=int, help="Send X-RateLimit-* delay headers after this many calls")
+    faults.add_argument("--page-size", type=int, default=100, help="Page size of paged list endpoints")
+    run = parser.add_argument_group("run")
+    run.add_argument("--components", default=",".join(COMPONENTS),
+                     help=f"Comma separated components to back up (default: {','.join(COMPONENTS)})")
+    run.add_argument("--max-workers", type=int, default=4)
+    run.add_argument("--skip-restore", action="store_true")
+    run.add_argument("--no-tracemalloc", action="store_true",
+                     help="Skip memory tracing, which slows Python code down noticeably")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--workdir", help="Keep generated data and snapshots here instead of a temporary directory")
+    run.add_argument("--output", help="Write the JSON report to this file")
+    run.add_argument("--compare", metavar="REPORT", help="Print changes against an earlier JSON report")
+    run.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    args.components = [c.strip() for c in args.components.split(",") if c.strip()]
+    args.org = "bench"
+    args.pat = "bench-pat"
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="adobackup-bench-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    # The SDK caches resource locations on disk per URL; keep them out of the user's cache
+    os.environ["AZURE_DEVOPS_CACHE_DIR"] = str(workdir / "sdk-cache")
+
+    from benchmarks.fake_ado import FakeAzureDevOps
+    from benchmarks.synthetic import SyntheticOrg
+
+    started = time.perf_counter()
+    source = SyntheticOrg.generate(
+        args.org, workdir / "remote" / args.org, projects=args.projects, repos=args.repos, commits=args.commits,
+        work_items=args.work_items, iterations=args.iterations, pipelines=args.pipelines,
+        test_plans=args.test_plans, suites=args.suites, cases=args.cases, wikis=args.wikis,
+        work_item_bytes=args.work_item_bytes, seed=args.seed
+    )
+    target = SyntheticOrg(f"{args.org}-restore", workdir / "remote" / f"{args.org}-restore")
+    print(f"Generated {source.size()} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    report = {
+        "commit": commit(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir", "pat")},
+        "org": source.size()
+    }
+    cwd = os.getcwd()
+    server = FakeAzureDevOps(
+        [source, target], latency=args.latency, jitter=args.jitter, throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after, max_concurrency=args.max_concurrency, rate_limit=args.rate_limit,
+        page_size=args.page_size, seed=args.seed
+    )
+    try:
+        # The engines report progress with print(); keep stdout for the JSON report
+        with server, redirect_stdout(sys.stderr):
+            os.chdir(workdir)
+            report["backup"] = run_backup(server, args)
+            if not args.skip_restore:
+                report["restore"] = run_restore(server, args)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare the size and speed of the two ways test plan models have been serialized.
+
+"__dict__" is the old json.dump(default=lambda x: x.__dict__); "to_dict" is
+adobackup.modules.serialize.to_dict with the Test Plans field projection.
+Both serialize the same synthetic TestCase models, shaped like what
+get_test_case_list returns (identities with links and avatars, work item
+fields, point assignments):
+
+    python benchmarks/serialize.py --cases 5000 --output before.json
+    python benchmarks/serialize.py --compare before.json
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from azure.devops.v7_1.test_plan.models import (  # noqa: E402
+    PointAssignment, TestCase, TestPlanReference, TestSuiteReference, WorkItemDetails
+)
+from azure.devops.v7_1.test_plan.models import IdentityRef, ReferenceLinks, TeamProjectReference  # noqa: E402
+from adobackup.modules.serialize import to_dict  # noqa: E402
+from adobackup.modules.testplans import CASE_FIELDS  # noqa: E402
+
+
+def identity(rng: random.Random) -> IdentityRef:
+    user = f"user{rng.randrange(1000)}"
+    return IdentityRef(
+        display_name=user.title(), unique_name=f"{user}@contoso.com", id=f"{rng.getrandbits(128):032x}",
+        url=f"https://vssps.dev.azure.com/contoso/_apis/Identities/{user}", image_url=f"https://dev.azure.com/{user}.png",
+        descriptor=f"aad.{rng.getrandbits(160):040x}",
+        _links=ReferenceLinks(links={"avatar": {"href": f"https://dev.azure.com/contoso/_apis/GraphProfile/{user}"}})
+    )
+
+
+def test_cases(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    project = TeamProjectReference(id=f"{rng.getrandbits(128):032x}", name="Project001", state="wellFormed",
+                                   url="https://dev.azure.com/contoso/_apis/projects/Project001", revision=12,
+                                   visibility="private", last_update_time=datetime.now(timezone.utc))
+    plan = TestPlanReference(id=1, name="Plan 1")
+    cases = []
+    for i in range(1, count + 1):
+        suite = TestSuiteReference(id=i // 50 + 1, name=f"Suite {i // 50 + 1}")
+        work_item = WorkItemDetails(id=1000 + i, name=f"Test case {i}", work_item_fields=[
+            {"System.State": rng.choice(["Design", "Ready", "Closed"])},
+            {"Microsoft.VSTS.TCM.Steps": "<steps>" + "<step/>" * rng.randrange(1, 8) + "</steps>"},
+            {"System.AssignedTo": f"user{rng.randrange(1000)}@contoso.com"}
+        ])
+        assignments = [
+            PointAssignment(id=i * 10 + c, configuration_id=c, configuration_name=f"Config {c}", tester=identity(rng))
+            for c in range(1, rng.randrange(2, 4))
+        ]
+        cases.append(TestCase(order=i % 50, project=project, test_plan=plan, test_suite=suite, work_item=work_item,
+                              point_assignments=assignments,
+                              links=ReferenceLinks(links={"self": {"href": f"https://dev.azure.com/contoso/{i}"}})))
+    return cases
+
+
+METHODS = {
+    # The old default raised on datetimes; str() them so there is something to compare against
+    "__dict__": lambda cases: json.dumps(cases, default=lambda x: getattr(x, "__dict__", None) or str(x)),
+    "to_dict": lambda cases: json.dumps(to_dict(cases, CASE_FIELDS), separators=(",", ":")),
+}
+
+
+def measure(cases: list, runs: int) -> dict:
+    report = {}
+    for name, dump in METHODS.items():
+        seconds = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = dump(cases)
+            seconds.append(time.perf_counter() - started)
+        median = statistics.median(seconds)
+        report[name] = {
+            "median_seconds": round(median, 4),
+            "cases_per_second": round(len(cases) / median, 1),
+            "bytes": len(output.encode()),
+            "bytes_per_case": round(len(output.encode()) / len(cases), 1)
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark test plan model serialization")
+    parser.add_argument("--cases", type=int, default=5000, help="Synthetic test cases to serialize")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per method")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", metavar="REPORT", help="Print changes against an earlier report")
+    args = parser.parse_args(argv)
+
+    report = measure(test_cases(args.cases), args.runs)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"{'method':<12}{'median s':>10}{'cases/s':>12}{'bytes/case':>12}{'baseline s':>12}{'change':>9}")
+    for name, result in report.items():
+        old = baseline.get(name, {}).get("median_seconds")
+        change = f"{(result['median_seconds'] - old) / old * 100:+.0f}%" if old else ""
+        print(f"{name:<12}{result['median_seconds']:>10}{result['cases_per_second']:>12}"
+              f"{result['bytes_per_case']:>12}{old or '':>12}{change:>9}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
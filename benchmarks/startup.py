@@ -0,0 +1,88 @@
+"""Measure adobackup's startup cost: import time and the modules each entry point loads.
+
+Each scenario runs in a fresh interpreter several times and the median wall
+time is reported, together with the number of modules imported and whether
+the heaviest optional dependencies (questionary, azure.storage.blob) were
+loaded. Run it on two commits and compare with --compare:
+
+    python benchmarks/startup.py --output before.json
+    python benchmarks/startup.py --compare before.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    "import adobackup.cli": "import adobackup.cli",
+    "adobackup backup --help": (
+        "import contextlib, io, adobackup.cli\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    try:\n"
+        "        adobackup.cli.main(['backup', '--help'])\n"
+        "    except SystemExit:\n"
+        "        pass"
+    ),
+    # What `adobackup backup --components Boards --storage local` has to import
+    "local Boards backup (imports)": "import adobackup.cli, adobackup.core.backup_engine, adobackup.modules.boards",
+}
+HEAVY = ["questionary", "azure.storage.blob", "azure.devops.v7_1.release", "azure.devops.v7_1.test"]
+
+PROBE = """
+import sys, time
+sys.path.insert(0, {src!r})
+started = time.perf_counter()
+exec({code!r})
+elapsed = time.perf_counter() - started
+print(elapsed, len(sys.modules), ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def measure(code: str, runs: int) -> dict:
+    seconds, modules, heavy = [], 0, ""
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(src=str(ROOT / "src"), code=code, heavy=HEAVY)],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        seconds.append(float(output[0]))
+        modules = int(output[1])
+        heavy = output[2] if len(output) > 2 else ""
+    return {
+        "median_seconds": round(statistics.median(seconds), 4),
+        "min_seconds": round(min(seconds), 4),
+        "modules": modules,
+        "heavy_modules": heavy.split(",") if heavy else []
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure adobackup startup time")
+    parser.add_argument("--runs", type=int, default=7, help="Interpreter launches per scenario")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", metavar="REPORT", help="Print changes against an earlier report")
+    args = parser.parse_args(argv)
+
+    report = {name: measure(code, args.runs) for name, code in SCENARIOS.items()}
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"{'scenario':<34}{'median s':>10}{'modules':>9}{'baseline s':>12}{'change':>9}  heavy modules")
+    for name, result in report.items():
+        old = baseline.get(name, {}).get("median_seconds")
+        change = f"{(result['median_seconds'] - old) / old * 100:+.0f}%" if old else ""
+        print(f"{name:<34}{result['median_seconds']:>10}{result['modules']:>9}{old or '':>12}{change:>9}  "
+              f"{', '.join(result['heavy_modules']) or '-'}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
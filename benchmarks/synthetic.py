@@ -0,0 +1,225 @@
+import random
+import subprocess
+import uuid
+from pathlib import Path
+
+CHANGED_DATE = "2024-01-01T00:00:00Z"
+WORK_ITEM_TYPES = ("Epic", "Feature", "User Story", "Task", "Bug")
+STATES = ("New", "Active", "Resolved", "Closed")
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def init_bare_repo(path: Path, commits: int = 0, file_bytes: int = 1024, seed: int = 0):
+    """Create a bare repository at path holding a linear history of commits on main"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run(["git", "init", "--bare", "-q", "-b", "main", str(path)], check=True)
+    if not commits:
+        return
+    rng = random.Random(seed)
+    stream = []
+    for n in range(1, commits + 1):
+        content = rng.randbytes(file_bytes // 2).hex().encode()
+        message = f"Commit {n}".encode()
+        stream.append(b"commit refs/heads/main\n")
+        stream.append(f"committer Bench <bench@example.com> {1700000000 + n} +0000\n".encode())
+        stream.append(b"data %d\n%s\n" % (len(message), message))
+        stream.append(b"M 644 inline file_%d.txt\ndata %d\n%s\n" % (n % 10, len(content), content))
+    subprocess.run(["git", "fast-import", "--quiet"], input=b"".join(stream), cwd=path, check=True)
+
+
+class SyntheticOrg:
+    """In-memory state of one fake Azure DevOps organization.
+
+    Holds projects with their teams, iterations, work items, repositories,
+    pipelines, test plans, build/release definitions and wikis in the shape
+    the REST API returns them. Repositories and wikis are bare git repos
+    under git_root/<project>/. The fake server reads and mutates this state,
+    so a restore into an empty org can be inspected afterwards.
+    """
+
+    def __init__(self, name: str, git_root):
+        self.name = name
+        self.git_root = Path(git_root)
+        self.git_root.mkdir(parents=True, exist_ok=True)
+        self.projects = {}
+        self.work_items = {}
+        self._rng = random.Random(0)
+        self._next_id = {"work_item": 1, "pipeline": 1, "plan": 1, "suite": 1, "case": 1, "definition": 1}
+
+    @classmethod
+    def generate(cls, name: str, git_root, projects: int = 2, repos: int = 2, commits: int = 5,
+                 work_items: int = 100, iterations: int = 4, pipelines: int = 5, test_plans: int = 2,
+                 suites: int = 3, cases: int = 10, wikis: int = 1, work_item_bytes: int = 512,
+                 seed: int = 0) -> "SyntheticOrg":
+        """Build an organization of the given size; counts are per project (suites per plan, cases per suite)"""
+        org = cls(name, git_root)
+        org._rng = rng = random.Random(seed)
+        for p in range(1, projects + 1):
+            project = org.add_project(f"Project{p:03d}", description=f"Synthetic project {p}")
+            for i in range(1, iterations + 1):
+                org.add_iteration(project["name"], {
+                    "name": f"Sprint {i}",
+                    "attributes": {"startDate": f"2024-{i:02d}-01T00:00:00Z", "finishDate": f"2024-{i:02d}-14T00:00:00Z"}
+                })
+            for r in range(1, repos + 1):
+                org.add_repo(project["name"], f"{project['name']}-repo{r:02d}", commits=commits, seed=rng.getrandbits(32))
+            for w in range(1, wikis + 1):
+                org.add_repo(project["name"], f"{project['name']}-wiki{w:02d}.wiki", commits=2, wiki=True)
+
+            first = org._next_id["work_item"]
+            for _ in range(work_items):
+                wi_id = org._next_id["work_item"]
+                fields = {
+                    "System.Title": f"Work item {wi_id}",
+                    "System.WorkItemType": rng.choice(WORK_ITEM_TYPES),
+                    "System.State": rng.choice(STATES),
+                    "System.Description": rng.randbytes(work_item_bytes // 2).hex(),
+                    "Microsoft.VSTS.Common.Priority": rng.randint(1, 4)
+                }
+                relations = []
+                if wi_id > first:
+                    parent = rng.randint(first, wi_id - 1)
+                    relations.append({
+                        "rel": "System.LinkTypes.Hierarchy-Reverse",
+                        "url": f"{{base}}/_apis/wit/workItems/{parent}",
+                        "attributes": {"isLocked": False, "name": "Parent"}
+                    })
+                org.add_work_item(project["name"], fields, relations)
+
+            for n in range(1, pipelines + 1):
+                org.add_pipeline(project["name"], f"pipeline-{n:03d}", revision=1)
+                org.add_definition(project["name"], "build", {"name": f"build-{n:03d}", "revision": 1})
+                org.add_definition(project["name"], "release", {"name": f"release-{n:03d}", "revision": 1})
+
+            for t in range(1, test_plans + 1):
+                plan = org.add_test_plan(project["name"], f"Plan {t}")
+                for s in range(1, suites + 1):
+                    suite = org.add_test_suite(project["name"], plan["id"], f"Suite {s}")
+                    for c in range(cases):
+                        org.add_test_case(project["name"], plan["id"], suite["id"], f"Case {c + 1}")
+        return org
+
+    def project(self, key: str):
+        """Look a project up by name (case-insensitive) or id"""
+        key = key.lower()
+        for project in self.projects.values():
+            if project["name"].lower() == key or project["id"] == key:
+                return project
+        return None
+
+    def add_project(self, name: str, description: str = "") -> dict:
+        project = {
+            "id": _uuid(self._rng),
+            "name": name,
+            "description": description,
+            "state": "wellFormed",
+            "visibility": "private",
+            "revision": 1,
+            "lastUpdateTime": CHANGED_DATE,
+            "teams": [],
+            "iterations": [],
+            "repos": [],
+            "pipelines": [],
+            "plans": [],
+            "builds": [],
+            "releases": []
+        }
+        project["teams"].append({"id": _uuid(self._rng), "name": f"{name} Team"})
+        self.projects[project["id"]] = project
+        return project
+
+    def add_iteration(self, project_name: str, iteration: dict) -> dict:
+        project = self.project(project_name)
+        entry = {
+            "id": _uuid(self._rng),
+            "name": iteration["name"],
+            "path": f"{project['name']}\\{iteration['name']}",
+            "attributes": iteration.get("attributes") or {}
+        }
+        project["iterations"].append(entry)
+        return entry
+
+    def add_repo(self, project_name: str, name: str, commits: int = 0, seed: int = 0, wiki: bool = False) -> dict:
+        project = self.project(project_name)
+        path = self.git_root / project["name"] / f"{name}.git"
+        init_bare_repo(path, commits=commits, seed=seed)
+        repo = {"id": _uuid(self._rng), "name": name, "wiki": wiki, "path": path}
+        project["repos"].append(repo)
+        return repo
+
+    def add_work_item(self, project_name: str, fields: dict, relations: list = None) -> dict:
+        project = self.project(project_name)
+        wi_id = self._next_id["work_item"]
+        self._next_id["work_item"] += 1
+        item = {
+            "id": wi_id,
+            "rev": 1,
+            "project": project["id"],
+            "fields": {
+                **fields,
+                "System.Id": wi_id,
+                "System.TeamProject": project["name"],
+                "System.ChangedDate": CHANGED_DATE
+            },
+            "relations": list(relations or [])
+        }
+        self.work_items[wi_id] = item
+        return item
+
+    def project_work_items(self, project: dict) -> list:
+        return [wi for wi in self.work_items.values() if wi["project"] == project["id"]]
+
+    def _next(self, kind: str) -> int:
+        value = self._next_id[kind]
+        self._next_id[kind] += 1
+        return value
+
+    def add_pipeline(self, project_name: str, name: str, revision: int = 1) -> dict:
+        pipeline = {"id": self._next("pipeline"), "name": name, "folder": "\\", "revision": revision}
+        self.project(project_name)["pipelines"].append(pipeline)
+        return pipeline
+
+    def add_definition(self, project_name: str, kind: str, definition: dict) -> dict:
+        """kind is "build" or "release" """
+        entry = {**definition, "id": self._next("definition"), "revision": definition.get("revision", 1)}
+        self.project(project_name)[f"{kind}s"].append(entry)
+        return entry
+
+    def add_test_plan(self, project_name: str, name: str) -> dict:
+        plan = {"id": self._next("plan"), "name": name, "state": "Active", "revision": 1, "suites": []}
+        self.project(project_name)["plans"].append(plan)
+        return plan
+
+    def _plan(self, project_name: str, plan_id: int) -> dict:
+        return next(p for p in self.project(project_name)["plans"] if p["id"] == plan_id)
+
+    def add_test_suite(self, project_name: str, plan_id: int, name: str) -> dict:
+        suite = {"id": self._next("suite"), "name": name, "suiteType": "staticTestSuite", "revision": 1, "cases": []}
+        self._plan(project_name, plan_id)["suites"].append(suite)
+        return suite
+
+    def add_test_case(self, project_name: str, plan_id: int, suite_id: int, name: str) -> dict:
+        suite = next(s for s in self._plan(project_name, plan_id)["suites"] if s["id"] == suite_id)
+        case = {"id": self._next("case"), "name": name, "order": len(suite["cases"]) + 1}
+        suite["cases"].append(case)
+        return case
+
+    def size(self) -> dict:
+        """Entity counts, for reports"""
+        projects = list(self.projects.values())
+        return {
+            "projects": len(projects),
+            "repos": sum(1 for p in projects for r in p["repos"] if not r["wiki"]),
+            "wikis": sum(1 for p in projects for r in p["repos"] if r["wiki"]),
+            "work_items": len(self.work_items),
+            "iterations": sum(len(p["iterations"]) for p in projects),
+            "pipelines": sum(len(p["pipelines"]) for p in projects),
+            "build_definitions": sum(len(p["builds"]) for p in projects),
+            "release_definitions": sum(len(p["releases"]) for p in projects),
+            "test_plans": sum(len(p["plans"]) for p in projects),
+            "test_suites": sum(len(plan["suites"]) for p in projects for plan in p["plans"]),
+            "test_cases": sum(len(s["cases"]) for p in projects for plan in p["plans"] for s in plan["suites"])
+        }
@@ -1,12 +1,202 @@
-import questionary
-from adobackup.core.storage_manager import StorageManager
-from adobackup.core.backup_engine import BackupEngine
-from adobackup.core.restore_engine import RestoreEngine
-from azure.devops.connection import Connection
-from msrest.authentication import BasicAuthentication
+import argparse
+import json
+import os
+import sys
 
+# Heavy imports (questionary, the Azure SDKs, the engines) are deferred to the
+# functions that need them, so `adobackup backup --components Boards` only
+# loads what a local Boards backup uses.
+
+COMPONENTS = ["Repos", "Boards", "Pipelines", "Test Plans", "Artifacts", "Wikis"]
+# Components the restore can write back
+RESTORABLE = ["Repos", "Boards", "Pipelines", "Artifacts"]
+
+DEFAULTS = {
+    "org": None,
+    "base_url": None,
+    "pat_env": "AZURE_DEVOPS_PAT",
+    "components": None,
+    "storage": "local",
+    "workers": 1,
+    "clone_workers": 4,
+    "incremental": True,
+    "dedupe": False,
+    "archive": False,
+    "keep": None,
+    "resume": None,
+    "source": "local",
+    "batch_size": 200,
+    "restore_workers": 4,
+    "entity": None,
+    "project": None,
+    "ids": None,
+    "snapshot": None,
+    "catalog": "backups/catalog.sqlite",
+    "delta": False,
+    "dry_run": False
+}
+
+
+def switch(parser, name, help):
+    """--name / --no-name pair that leaves the option unset (None) when neither is given"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(f"--{name}", dest=name, action="store_true", default=None, help=help)
+    group.add_argument(f"--no-{name}", dest=name, action="store_false", default=None, help=argparse.SUPPRESS)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="adobackup",
+        description="Back up and restore Azure DevOps organizations. "
+                    "Without a command the interactive mode starts."
+    )
+    parser.add_argument("--resume", metavar="SNAPSHOT",
+                        help="finish an interrupted backup in place (snapshot name or path)")
+    commands = parser.add_subparsers(dest="command")
+
+    def common(command):
+        command.add_argument("--config", metavar="FILE",
+                             help="JSON file with any of the options below (flags take precedence)")
+        command.add_argument("--org", help="organization name")
+        command.add_argument("--base-url", help="server URL instead of https://dev.azure.com/<org>")
+        command.add_argument("--pat-env", metavar="VAR",
+                             help=f"environment variable holding the PAT (default: {DEFAULTS['pat_env']})")
+
+    backup = commands.add_parser("backup", help="run a backup without prompts")
+    common(backup)
+    backup.add_argument("--components", help=f"comma separated, or 'all' ({', '.join(COMPONENTS)})")
+    backup.add_argument("--storage", choices=["local", "blob"], help="where the snapshot goes (default: local)")
+    backup.add_argument("--workers", type=int, help="components to run concurrently (default: 1)")
+    backup.add_argument("--clone-workers", type=int, help="parallel git clones for Repos/Wikis (default: 4)")
+    switch(backup, "incremental", "reuse the previous snapshot's mirrors and watermarks (default: on, --no-incremental to disable)")
+    switch(backup, "dedupe", "commit the snapshot to the deduplicated store")
+    switch(backup, "archive", "also produce a compressed .tar.gz archive")
+    backup.add_argument("--keep", type=int, help="snapshots to retain in the deduplicated store")
+    backup.add_argument("--resume", metavar="SNAPSHOT", default=argparse.SUPPRESS,
+                        help="finish an interrupted backup in place")
+
+    restore = commands.add_parser("restore", help="run a restore without prompts")
+    common(restore)
+    restore.add_argument("--source", choices=["local", "blob"], help="where the backup is read from (default: local)")
+    restore.add_argument("--batch-size", type=int, help="work items per $batch request (default: 200)")
+    restore.add_argument("--workers", type=int, dest="restore_workers", help="concurrent work item batches (default: 4)")
+    restore.add_argument("--components", help="comma separated: only restore these (Repos, Boards, Pipelines, Artifacts)")
+    restore.add_argument("--project", help="comma separated project names to restore (with --entity: its project)")
+    restore.add_argument("--ids", help="comma separated entity IDs to restore: work item or pipeline IDs, repo names")
+    restore.add_argument("--entity", metavar="TYPE:ID",
+                         help="restore only this cataloged entity (project, repo, iteration, work_item or pipeline), "
+                              "e.g. work_item:42 or repo:web")
+    restore.add_argument("--snapshot", help="snapshot to take --entity from (default: the newest that has it)")
+    restore.add_argument("--catalog", metavar="FILE", help=f"snapshot catalog (default: {DEFAULTS['catalog']})")
+    switch(restore, "delta", "only write work items that differ from the target org")
+    restore.add_argument("--dry-run", dest="dry_run", action="store_true", default=None,
+                         help="plan a delta restore and print its estimate without writing anything")
+
+    catalog = commands.add_parser("catalog", help="query the index of local snapshots")
+    catalog.add_argument("--catalog", metavar="FILE", default=DEFAULTS["catalog"],
+                         help=f"snapshot catalog (default: {DEFAULTS['catalog']})")
+    actions = catalog.add_subparsers(dest="action", required=True)
+    actions.add_parser("list", help="list cataloged snapshots")
+    history = actions.add_parser("history", help="show every cataloged version of an entity")
+    history.add_argument("type", help="record type, e.g. work_item, repo, pipeline, test_plan")
+    history.add_argument("id", help="entity ID (or name, for repos and wikis)")
+    history.add_argument("--project", help="only this project")
+    rebuild = actions.add_parser("rebuild", help="index snapshots that are not cataloged yet")
+    rebuild.add_argument("--backup-dir", default="backups", help="directory holding the snapshots (default: backups)")
+    return parser
+
+
+def load_options(args) -> dict:
+    """Defaults, overridden by the --config file, overridden by flags given on the command line"""
+    options = dict(DEFAULTS)
+    if getattr(args, "config", None):
+        with open(args.config) as f:
+            config = json.load(f)
+        unknown = set(config) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown option(s) in {args.config}: {', '.join(sorted(unknown))}")
+        options.update(config)
+    options.update({
+        key: value for key, value in vars(args).items()
+        if key in DEFAULTS and value is not None
+    })
+    return options
+
+
+def parse_components(value) -> list:
+    """Component names from a list or comma separated string; case-insensitive, 'all' for every one"""
+    names = value if isinstance(value, list) else str(value or "").split(",")
+    names = [n.strip() for n in names if n and n.strip()]
+    if [n.lower() for n in names] == ["all"]:
+        return list(COMPONENTS)
+    lookup = {c.lower(): c for c in COMPONENTS}
+    unknown = [n for n in names if n.lower() not in lookup]
+    if unknown:
+        raise ValueError(f"Unknown component(s): {', '.join(unknown)}")
+    return [lookup[n.lower()] for n in names]
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        return run_interactive(resume=args.resume)
+    if args.command == "catalog":
+        return catalog(args)
+
+    try:
+        options = load_options(args)
+        if not options["org"] and not options["base_url"]:
+            raise ValueError("--org (or org in the config file) is required")
+        pat = os.getenv(options["pat_env"])
+        if not pat:
+            raise ValueError(f"Set the PAT in the {options['pat_env']} environment variable")
+        if args.command == "backup":
+            components = parse_components(options["components"])
+            if not components:
+                raise ValueError("--components is required")
+        else:
+            # "all" (or nothing) restores everything the restore supports
+            components = parse_components(options["components"]) or None
+            if components == COMPONENTS:
+                components = None
+            unsupported = [c for c in components or [] if c not in RESTORABLE]
+            if unsupported:
+                raise ValueError(f"Cannot restore: {', '.join(unsupported)}")
+        if options["entity"] and ":" not in options["entity"]:
+            raise ValueError("--entity takes TYPE:ID, e.g. work_item:42")
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.command == "backup":
+        results = backup(options["org"], pat, components, storage=options["storage"], workers=options["workers"],
+                         clone_workers=options["clone_workers"], incremental=options["incremental"],
+                         dedupe=options["dedupe"], archive=options["archive"], keep=options["keep"],
+                         resume=options["resume"], base_url=options["base_url"])
+        # Records that failed (a throttled clone, a pipeline that could not be read) mean data is missing too
+        return 0 if results and not results["metadata"]["errors"] and not results["metadata"]["failed_units"] else 1
+    if options["entity"]:
+        kind, _, entity_id = options["entity"].partition(":")
+        return restore_entity(options["org"], pat, kind, entity_id, project=options["project"],
+                              snapshot=options["snapshot"], catalog_path=options["catalog"],
+                              base_url=options["base_url"])
+    return restore(options["org"], pat, options["source"], batch_size=options["batch_size"],
+                   max_workers=options["restore_workers"], base_url=options["base_url"], components=components,
+                   projects=split(options["project"]), ids=split(options["ids"]), catalog_path=options["catalog"],
+                   delta=options["delta"], dry_run=options["dry_run"])
+
+
+def split(value):
+    """Items of a list or comma separated string, or None when empty"""
+    if not value:
+        return None
+    items = value if isinstance(value, list) else str(value).split(",")
+    return [str(item).strip() for item in items if str(item).strip()] or None
+
+
+def run_interactive(resume=None):
+    import questionary
 
-def main():
     print("\U0001F6E1️ Azure DevOps Backup & Restore Tool")
 
     action = questionary.select(
@@ -18,40 +208,41 @@ def main():
         ]).ask()
 
     if "Backup" in action:
-        run_backup(action)
+        run_backup(action, resume=resume)
     else:
         run_restore()
+    return 0
 
 
-def run_backup(storage_type):
-    org = questionary.text("Enter source organization name:").ask()
-    pat = questionary.password("Enter PAT (Personal Access Token):").ask()
+def check_auth(org, pat, base_url=None) -> bool:
+    from adobackup.modules.http_client import PooledConnection
 
-    # Validate auth
     try:
-        connection = Connection(
-            base_url=f"https://dev.azure.com/{org}",
-            creds=BasicAuthentication('', pat)
-        )
+        connection = PooledConnection(base_url or f"https://dev.azure.com/{org}", pat)
         core_client = connection.clients.get_core_client()
         projects = list(core_client.get_projects())
         if not projects:
             print("⚠️ Auth succeeded, but no projects found in the org.")
         else:
             print(f"✅ Authenticated successfully. Found {len(projects)} project(s).")
+        return True
     except Exception as e:
         print(f"❌ Authentication to Azure DevOps failed: {str(e)}")
+        return False
+
+
+def run_backup(storage_type, resume=None):
+    import questionary
+
+    org = questionary.text("Enter source organization name:").ask()
+    pat = questionary.password("Enter PAT (Personal Access Token):").ask()
+
+    # Validate auth
+    if not check_auth(org, pat):
         return
 
     # Component selection
-    component_options = {
-        "1": "Repos",
-        "2": "Boards",
-        "3": "Pipelines",
-        "4": "Test Plans",
-        "5": "Artifacts",
-        "6": "Wikis"
-    }
+    component_options = {str(n): name for n, name in enumerate(COMPONENTS, start=1)}
 
     print("\nSelect components to back up by typing numbers (e.g., 1,2,4):")
     for num, name in component_options.items():
@@ -68,22 +259,109 @@ def run_backup(storage_type):
         print("❌ No valid components selected. Backup aborted.")
         return
 
+    workers_raw = questionary.text("Max components to run concurrently:", default="1").ask()
+    max_workers = int(workers_raw) if workers_raw and workers_raw.strip().isdigit() else 1
+    clones_raw = questionary.text("Max parallel git clones (Repos/Wikis):", default="4").ask()
+    clone_workers = int(clones_raw) if clones_raw and clones_raw.strip().isdigit() else 4
+    incremental = questionary.confirm(
+        "Run incrementally against the previous snapshot (Repos mirrors, Boards watermarks)?", default=True
+    ).ask()
+
+    dedupe = questionary.confirm(
+        "Commit the snapshot to the deduplicated (content-addressed) store?", default=False
+    ).ask()
+    keep = None
+    if dedupe:
+        keep_raw = questionary.text("Snapshots to retain in the store (blank keeps all):").ask()
+        keep = int(keep_raw) if keep_raw and keep_raw.strip().isdigit() else None
+    archive = questionary.confirm(
+        "Also produce a compressed .tar.gz archive of the snapshot?", default=False
+    ).ask()
+
+    backup(org, pat, components, storage="blob" if "Azure" in storage_type else "local", workers=max_workers,
+           clone_workers=clone_workers, incremental=bool(incremental), dedupe=bool(dedupe),
+           archive=bool(archive), keep=keep, resume=resume, check=False)
+
+
+def backup(org, pat, components, storage="local", workers=1, clone_workers=4, incremental=True,
+           dedupe=False, archive=False, keep=None, resume=None, base_url=None, check=True):
+    """Run a backup of components and store it; returns the engine results, or None if auth failed"""
+    from adobackup.core.backup_engine import BackupEngine
+
+    if check and not check_auth(org, pat, base_url):
+        return None
+
+    module_options = {
+        "Repos": {"max_workers": max(clone_workers, 1), "incremental": bool(incremental)},
+        "Wikis": {"max_workers": max(clone_workers, 1)},
+        "Boards": {"incremental": bool(incremental)},
+        "Pipelines": {"incremental": bool(incremental)}
+    }
+
+    storage_manager = None
+    if storage == "blob":
+        from adobackup.core.storage_manager import StorageManager
+        storage_manager = StorageManager()
+    store = None
+    if dedupe:
+        from adobackup.core.chunk_store import ChunkStore, LocalObjectBackend
+        store = storage_manager.chunk_store() if storage_manager else ChunkStore(LocalObjectBackend("backups/store"))
+
     # Perform backup
-    engine = BackupEngine(org, pat)
-    results, manifest_path = engine.backup_all(components)
+    engine = BackupEngine(org, pat, store=store, prometheus_path=os.getenv("ADOBACKUP_PROMETHEUS_TEXTFILE"),
+                          base_url=base_url)
+    results, manifest_path = engine.backup_all(
+        components, max_workers=max(workers, 1), module_options=module_options, resume=resume
+    )
+
+    print("\n⏱️ Component wall times:")
+    for name, elapsed in results["metadata"]["timings"].items():
+        status = "failed" if name in results["metadata"]["errors"] else "ok"
+        if results["metadata"]["failed_units"].get(name):
+            status += f", {results['metadata']['failed_units'][name]} records failed"
+        print(f"  {name}: {elapsed:.1f}s ({status})")
 
     latest_path = "backups/latest_backup.json"
     engine.save_to_local(results, latest_path)
 
-    if "Azure" in storage_type:
+    if store is not None and keep:
+        gc = store.expire(keep)
+        print(f"🧹 Expired {len(gc['expired'])} snapshot(s), removed {gc['removed']} unreferenced chunks")
+
+    if storage_manager is not None:
         print("☁️ Uploading to Azure Blob Storage...")
-        StorageManager().upload_file_to_blob(latest_path)
+        with engine.metrics.phase("upload"):
+            if archive:
+                summary = storage_manager.upload_archive(results["metadata"]["snapshot"])
+                engine.metrics.add("bytes_uploaded", summary["compressed_bytes"], target="archive")
+                print(f"🗜️ Streamed {summary['blob']} ({summary['ratio']}x, {summary['throughput_mb_s']} MB/s)")
+                # Tells a blob restore to unpack the archive instead of reading <date>/shards
+                results["metadata"]["archive"] = {"blob": summary["blob"], "codec": summary["codec"]}
+                engine.save_to_local(results, latest_path)
+            elif store is None:
+                summary = storage_manager.upload_snapshot(results["metadata"]["snapshot"],
+                                                          prefix=results["metadata"]["date"])
+                engine.metrics.add("bytes_uploaded", summary["bytes"], target="blob")
+                print(f"📤 Uploaded {summary['blobs']} blobs ({summary['bytes']} bytes, {summary['skipped']} unchanged)")
+            storage_manager.upload_file_to_blob(latest_path)
         print("✅ Backup uploaded to Azure Blob.")
     else:
+        if archive:
+            summary = engine.archive_snapshot(results["metadata"]["snapshot"])
+            print(f"🗜️ Archive written to {summary['path']} ({summary['ratio']}x, {summary['throughput_mb_s']} MB/s)")
+            for component, stats in summary["components"].items():
+                print(f"  {component}: {stats['ratio']}x, {stats['throughput_mb_s']} MB/s")
         print(f"✅ Backup saved locally at: {manifest_path}")
 
+    report = engine.write_metrics(results["metadata"]["snapshot"])
+    print(f"📊 {report['api_calls']} API calls, {report['http']['retries']} retries; "
+          f"metrics in {results['metadata']['snapshot']}/backup_metrics.json")
+    return results
+
 
 def run_restore():
+    import questionary
+
     source = questionary.select(
         "Select backup source:",
         choices=["Local Storage", "Azure Blob Storage"]
@@ -92,9 +370,81 @@ def run_restore():
     org = questionary.text("Enter target organization name:").ask()
     pat = questionary.password("Enter target PAT:").ask()
 
-    engine = RestoreEngine(org, pat)
-    engine.restore_all(source)
+    restore(org, pat, "blob" if "Azure" in source else "local")
+
+
+def restore(org, pat, source="local", batch_size=200, max_workers=4, base_url=None, components=None,
+            projects=None, ids=None, catalog_path=None, delta=False, dry_run=False) -> int:
+    """Restore the latest backup into org, or only the given components, projects and IDs; returns an exit code"""
+    from adobackup.core.restore_engine import RestoreEngine
+    from adobackup.core.scope import RestoreScope
+
+    scope = RestoreScope(components=components, projects=projects, ids=ids)
+    engine = RestoreEngine(org, pat, batch_size=batch_size, max_workers=max_workers,
+                           prometheus_path=os.getenv("ADOBACKUP_PROMETHEUS_TEXTFILE"), base_url=base_url)
+    try:
+        engine.restore_all("Azure Blob Storage" if source == "blob" else "Local Storage", scope=scope,
+                           catalog_path=catalog_path, delta=delta, dry_run=dry_run)
+    except Exception as e:
+        print(f"❌ Restore failed: {str(e)}", file=sys.stderr)
+        return 1
+    plan = engine.report.get("plan")
+    if plan:
+        print(f"🧮 Work items: {plan['create']} to create, {plan['update']} to update, {plan['skip']} unchanged, "
+              f"{plan['links']} links to add (about {plan['total_api_calls']} API calls)")
+    if dry_run:
+        print("✅ Dry run complete, nothing was written.")
+        return 0
+    failed = {kind: engine.report.get(kind, {}).get("failed", 0) for kind in ("work_items", "pipelines")}
+    for failure in engine.report.get("pipelines", {}).get("failures", []):
+        print(f"❌ Pipeline {failure['name']} in {failure['project']}: {failure['error']}", file=sys.stderr)
+    problems = " and ".join(f"{count} failed {kind.replace('_', ' ')}" for kind, count in failed.items() if count)
+    print(f"✅ Restore completed{f' with {problems}' if problems else ''}.")
+    return 1 if problems else 0
+
+
+def restore_entity(org, pat, kind, entity_id, project=None, snapshot=None, catalog_path=None, base_url=None) -> int:
+    """Restore a single entity found through the snapshot catalog; returns a process exit code"""
+    from adobackup.core.restore_engine import RestoreEngine
+
+    engine = RestoreEngine(org, pat, prometheus_path=os.getenv("ADOBACKUP_PROMETHEUS_TEXTFILE"), base_url=base_url)
+    try:
+        engine.restore_entity(kind, entity_id, project=project, snapshot=snapshot, catalog_path=catalog_path)
+    except Exception as e:
+        print(f"❌ Restore failed: {str(e)}", file=sys.stderr)
+        return 1
+    failed = engine.report.get("work_items", {}).get("failed", 0)
+    for failure in engine.report.get("pipelines", {}).get("failures", []):
+        failed += 1
+        print(f"❌ Pipeline {failure['name']} failed to restore: {failure['error']}", file=sys.stderr)
+    print(f"✅ Restored {kind} {entity_id}." if not failed else f"❌ {kind} {entity_id} failed to restore.")
+    return 1 if failed else 0
+
+
+def catalog(args) -> int:
+    """`adobackup catalog list|history|rebuild`"""
+    from adobackup.core.catalog import SnapshotCatalog
+
+    with SnapshotCatalog(args.catalog) as snapshots:
+        if args.action == "rebuild":
+            added = snapshots.rebuild(args.backup_dir)
+            print(f"🗂️ Cataloged {len(added)} snapshot(s){': ' + ', '.join(added) if added else ''}")
+        elif args.action == "list":
+            for snapshot in snapshots.snapshots():
+                errors = f", failed: {', '.join(snapshot['errors'])}" if snapshot["errors"] else ""
+                print(f"{snapshot['name']}  {snapshot['entities']:>8} entities  "
+                      f"{', '.join(snapshot['components'])}{errors}")
+        else:
+            versions = snapshots.history(args.type, args.id, project=args.project)
+            if not versions:
+                print(f"No {args.type} {args.id} in the catalog", file=sys.stderr)
+                return 1
+            for version in versions:
+                marker = "changed" if version["changed"] else "same"
+                print(f"{version['snapshot']}  {version['project'] or '-'}  {version['name'] or ''}  "
+                      f"{version['hash'][:12]}  {marker}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -2,12 +2,36 @@
 adobackup.core - Core backup functionality
 """
 
-from .storage_manager import StorageManager
-from .backup_engine import BackupEngine
-from .restore_engine import RestoreEngine
+from importlib import import_module
 
 __all__ = [
     'StorageManager',
-    'BackupEngine', 
-    'RestoreEngine'
-]
\ No newline at end of file
+    'BackupEngine',
+    'RestoreEngine',
+    'ChunkStore',
+    'LocalObjectBackend',
+    'BlobObjectBackend'
+]
+
+# Exports are imported on first access, so importing one submodule does not
+# pull in the Azure Blob and every Azure DevOps client with it
+_LAZY = {
+    'StorageManager': '.storage_manager',
+    'BackupEngine': '.backup_engine',
+    'RestoreEngine': '.restore_engine',
+    'ChunkStore': '.chunk_store',
+    'LocalObjectBackend': '.chunk_store',
+    'BlobObjectBackend': '.chunk_store'
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
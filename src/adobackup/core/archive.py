@@ -0,0 +1,223 @@
+import base64
+import gzip
+import io
+import logging
+import os
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for codec="zstd"
+    zstandard = None
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+CODEC_SUFFIXES = {"gzip": ".tar.gz", "zstd": ".tar.zst"}
+
+
+class BlobSink:
+    """File-like sink that stages writes as blocks of block_size bytes and commits on close"""
+
+    def __init__(self, blob_client, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.blob_client = blob_client
+        self.block_size = block_size
+        self.block_ids = []
+        self._buffer = bytearray()
+
+    def write(self, data: bytes):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._stage(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+
+    def _stage(self, data: bytes):
+        block_id = base64.b64encode(f"{len(self.block_ids):08d}".encode()).decode()
+        self.blob_client.stage_block(block_id, data, length=len(data))
+        self.block_ids.append(block_id)
+
+    def close(self):
+        from azure.storage.blob import BlobBlock
+
+        if self._buffer:
+            self._stage(bytes(self._buffer))
+            self._buffer.clear()
+        self.blob_client.commit_block_list([BlobBlock(block_id=b) for b in self.block_ids])
+
+
+class ChunkReader(io.RawIOBase):
+    """Readable binary stream over an iterable of byte chunks, e.g. a blob download"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b""
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def extract_archive(fileobj, target_dir, codec: str = "gzip") -> Path:
+    """Unpack an archive written by SnapshotArchiver from a sequential binary stream"""
+    if codec not in CODEC_SUFFIXES:
+        raise ValueError(f"Unknown codec: {codec}")
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("codec 'zstd' requires the 'zstandard' package")
+        stream = zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+    else:
+        # GzipFile reads the concatenated members the archiver writes as one stream
+        stream = gzip.GzipFile(fileobj=fileobj, mode="rb")
+    target_dir = Path(target_dir)
+    # Python versions with extraction filters get the safe one; the checks below cover the rest
+    options = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+    with tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            if not member.isfile() or Path(member.name).is_absolute() or ".." in Path(member.name).parts:
+                raise ValueError(f"Unexpected archive member: {member.name}")
+            tar.extract(member, target_dir, **options)
+    return target_dir
+
+
+class SnapshotArchiver:
+    """Streams a snapshot directory into a compressed tar archive.
+
+    The tar stream is cut into blocks of at most block_size bytes (and at
+    every component boundary); each block is compressed independently on a
+    thread pool and written in order. Concatenated gzip members and zstd
+    frames are both valid single archives, so standard tools read the result
+    as one .tar.gz / .tar.zst. At most 2 x max_workers blocks are in memory.
+    """
+
+    def __init__(self, codec: str = "gzip", level: int = 6, block_size: int = DEFAULT_BLOCK_SIZE, max_workers: int = None):
+        if codec not in CODEC_SUFFIXES:
+            raise ValueError(f"Unknown codec: {codec}")
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("codec 'zstd' requires the 'zstandard' package")
+        self.codec = codec
+        self.level = level
+        self.block_size = block_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def suffix(self) -> str:
+        return CODEC_SUFFIXES[self.codec]
+
+    def _compress(self, component, data):
+        started = time.perf_counter()
+        if self.codec == "zstd":
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.level)
+        return component, len(data), compressed, time.perf_counter() - started
+
+    def _tar_stream(self, snapshot_path):
+        """Yield (component, bytes) pieces of an uncompressed tar stream"""
+        snapshot_path = Path(snapshot_path)
+        for path in sorted(p for p in snapshot_path.rglob("*") if p.is_file()):
+            relative = path.relative_to(snapshot_path)
+            component = relative.parts[0] if len(relative.parts) > 1 else "."
+            info = tarfile.TarInfo(f"{snapshot_path.name}/{relative.as_posix()}")
+            stat = path.stat()
+            info.size = stat.st_size
+            info.mtime = int(stat.st_mtime)
+            # Keep permission bits: mirror hooks must stay executable
+            info.mode = stat.st_mode & 0o7777
+            yield component, info.tobuf(format=tarfile.PAX_FORMAT)
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.block_size), b""):
+                    yield component, chunk
+            if stat.st_size % tarfile.BLOCKSIZE:
+                yield component, b"\0" * (tarfile.BLOCKSIZE - stat.st_size % tarfile.BLOCKSIZE)
+        yield ".", b"\0" * (2 * tarfile.BLOCKSIZE)
+
+    def _blocks(self, snapshot_path):
+        """Group tar pieces into per-component blocks of at most block_size bytes"""
+        current, pending, size = None, [], 0
+        for component, piece in self._tar_stream(snapshot_path):
+            if pending and (component != current or size + len(piece) > self.block_size):
+                yield current, b"".join(pending)
+                pending, size = [], 0
+            current = component
+            while len(piece) > self.block_size:
+                yield component, piece[:self.block_size]
+                piece = piece[self.block_size:]
+            pending.append(piece)
+            size += len(piece)
+        if pending:
+            yield current, b"".join(pending)
+
+    def write(self, snapshot_path, output) -> dict:
+        """Archive snapshot_path into a binary file-like output, returning stats"""
+        started = time.perf_counter()
+        components = {}
+        in_flight = deque()
+
+        def drain(future):
+            component, raw, compressed, seconds = future.result()
+            output.write(compressed)
+            stats = components.setdefault(component, {"raw_bytes": 0, "compressed_bytes": 0, "cpu_seconds": 0.0})
+            stats["raw_bytes"] += raw
+            stats["compressed_bytes"] += len(compressed)
+            stats["cpu_seconds"] += seconds
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for component, block in self._blocks(snapshot_path):
+                in_flight.append(pool.submit(self._compress, component, block))
+                if len(in_flight) >= 2 * self.max_workers:
+                    drain(in_flight.popleft())
+            while in_flight:
+                drain(in_flight.popleft())
+
+        for stats in components.values():
+            stats["ratio"] = round(stats["raw_bytes"] / stats["compressed_bytes"], 2) if stats["compressed_bytes"] else 0.0
+            stats["throughput_mb_s"] = (
+                round(stats["raw_bytes"] / stats["cpu_seconds"] / (1024 * 1024), 2) if stats["cpu_seconds"] else 0.0
+            )
+            stats["cpu_seconds"] = round(stats["cpu_seconds"], 3)
+
+        raw = sum(s["raw_bytes"] for s in components.values())
+        compressed = sum(s["compressed_bytes"] for s in components.values())
+        seconds = time.perf_counter() - started
+        summary = {
+            "codec": self.codec,
+            "raw_bytes": raw,
+            "compressed_bytes": compressed,
+            "ratio": round(raw / compressed, 2) if compressed else 0.0,
+            "seconds": round(seconds, 3),
+            "throughput_mb_s": round(raw / seconds / (1024 * 1024), 2) if seconds else 0.0,
+            "components": components
+        }
+        self.logger.info(
+            f"Archived {raw} bytes into {compressed} ({summary['ratio']}x) at {summary['throughput_mb_s']} MB/s"
+        )
+        return summary
+
+    def archive_to_file(self, snapshot_path, output_path=None) -> dict:
+        snapshot_path = Path(snapshot_path)
+        output_path = Path(output_path or snapshot_path.with_name(snapshot_path.name + self.suffix))
+        with open(output_path, "wb") as f:
+            summary = self.write(snapshot_path, f)
+        summary["path"] = str(output_path)
+        return summary
+
+    def archive_to_blob(self, snapshot_path, blob_client) -> dict:
+        """Stream the archive straight into a block blob without a local copy"""
+        sink = BlobSink(blob_client)
+        summary = self.write(snapshot_path, sink)
+        sink.close()
+        return summary
@@ -1,75 +1,288 @@
 ﻿from datetime import datetime
-from azure.devops.connection import Connection
-from msrest.authentication import BasicAuthentication
-from ..modules.boards import BoardsModule
-from ..modules.repos import ReposModule
-from adobackup.modules.pipelines import PipelinesModule
-from adobackup.modules.testplans import TestPlansModule
-from adobackup.modules.artifacts import ArtifactsModule
-from adobackup.modules.wikis import WikisModule
+from importlib import import_module
+from adobackup.modules.http_client import PooledConnection
+from adobackup.modules.rate_limit import component_scope
+from adobackup.modules.journal import RunJournal
+from adobackup.modules.metrics import Metrics
+from adobackup.modules.git_mirror import directory_size
+from adobackup.modules.snapshots import previous_snapshots
+from adobackup.core.shards import ShardWriter
 import os
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import json
+import shutil
+import time
 import zipfile
 
 class BackupEngine:
-    def __init__(self, org_url, pat):
-        self.connection = Connection(
-            base_url=f"https://dev.azure.com/{org_url}",
-            creds=BasicAuthentication('', pat)
-        )
+    # Module classes, or "package.module:Class" paths imported only when the component runs
+    module_map = {
+        "Boards": "adobackup.modules.boards:BoardsModule",
+        "Repos": "adobackup.modules.repos:ReposModule",
+        "Pipelines": "adobackup.modules.pipelines:PipelinesModule",
+        "Test Plans": "adobackup.modules.testplans:TestPlansModule",
+        "Artifacts": "adobackup.modules.artifacts:ArtifactsModule",
+        "Wikis": "adobackup.modules.wikis:WikisModule"
+    }
+    # Modules that checkpoint their own units in the run journal
+    resumable = {"Boards", "Repos", "Pipelines", "Test Plans", "Wikis"}
+
+    def __init__(self, org_url, pat, store=None, prometheus_path=None, base_url=None, catalog_path=None):
+        """base_url overrides https://dev.azure.com/<org_url>, e.g. for an Azure DevOps Server collection"""
+        self.pat = pat
+        self.store = store
+        self.prometheus_path = prometheus_path
+        self.metrics = Metrics()
+        self._snapshot_bytes = {}
+        self.connection = PooledConnection(base_url or f"https://dev.azure.com/{org_url}", pat, metrics=self.metrics)
         self.backup_dir = Path("backups")
         self.backup_dir.mkdir(exist_ok=True)
+        self.catalog_path = Path(catalog_path) if catalog_path else self.backup_dir / "catalog.sqlite"
+
+    def backup_all(self, components, max_workers: int = 1, module_options: dict = None, resume: str = None):
+        """Backup all selected components
+
+        With max_workers > 1 the selected components run concurrently on a
+        thread pool of that size. A failing component never aborts the
+        others, and the manifest is always assembled in module_map order.
+        module_options maps a component name to extra keyword arguments for
+        its module, e.g. {"Repos": {"max_workers": 8}}.
+
+        Module records are streamed to shards/<component>.ndjson inside the
+        snapshot; the manifest only carries each shard's path and counters.
+        Once the manifest is written the shards are indexed in the snapshot
+        catalog (see adobackup.core.catalog).
+
+        Timings, API calls, retries and byte counts are written to
+        backup_metrics.json next to the manifest (see write_metrics).
 
-    def backup_all(self, components):
-        """Backup all selected components"""
+        Progress is checkpointed in the snapshot's journal.ndjson (per repo,
+        work item batch, pipeline and test plan). resume names an earlier
+        snapshot, or its path, to finish in place: completed components are
+        kept as they are and the others skip the units already done.
+        """
         if not components:
             raise ValueError("No components selected for backup.")
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = self.backup_dir / timestamp
-        backup_path.mkdir()
+        if resume:
+            backup_path = Path(resume) if Path(resume).is_dir() else self.backup_dir / resume
+            if not backup_path.is_dir():
+                raise ValueError(f"No snapshot to resume at {backup_path}")
+            timestamp = backup_path.name
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_path = self.backup_dir / timestamp
+            backup_path.mkdir()
+        journal = RunJournal(backup_path / "journal.ndjson")
+        if resume:
+            print(f"♻️ Resuming {timestamp} from {len(journal)} checkpoints")
 
         results = {
             "metadata": {
                 "date": timestamp,
+                "snapshot": str(backup_path),
                 "organization": self.connection.base_url,
-                "components": components
+                "components": components,
+                "timings": {},
+                "errors": {},
+                "failed_units": {},
+                "resumed": bool(resume)
             },
             "data": {}
         }
 
-        module_map = {
-            "Boards": BoardsModule,
-            "Repos": ReposModule,
-            "Pipelines": PipelinesModule,
-            "Test Plans": TestPlansModule,
-            "Artifacts": ArtifactsModule,
-            "Wikis": WikisModule
-        }
+        module_options = module_options or {}
+        selected = [
+            (name, module, backup_path, module_options.get(name, {}), journal)
+            for name, module in self.module_map.items() if name in components
+        ]
+
+        if max_workers == 1 or len(selected) == 1:
+            outcomes = [self._run_component(*job) for job in selected]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(selected))) as pool:
+                futures = [pool.submit(self._run_component, *job) for job in selected]
+                outcomes = [future.result() for future in futures]
+        journal.close()
 
-        for name, module in module_map.items():
-            if name in components:
-                print(f"🔍 Backing up: {name}")
-                try:
-                    module_instance = module(self.connection)
-                    backup_data = module_instance.backup(backup_path)
-                    print(f"📁 {name} data size: {len(str(backup_data)) if backup_data else 0}")
-                    results["data"][name.lower().replace(" ", "")] = backup_data
-                except Exception as e:
-                    print(f"❌ Failed to backup {name}: {str(e)}")
+        for (name, *_), (backup_data, elapsed, error, failed) in zip(selected, outcomes):
+            results["metadata"]["timings"][name] = round(elapsed, 3)
+            if error is not None:
+                results["metadata"]["errors"][name] = error
+            else:
+                results["data"][name.lower().replace(" ", "")] = backup_data
+            if failed:
+                results["metadata"]["failed_units"][name] = failed
+        results["metadata"]["http"] = self.connection.session.stats()
+        results["metadata"]["rate_limit"] = self.connection.session.limiter.stats()
 
         # Save metadata
         with open(backup_path / "backup_manifest.json", "w") as f:
             json.dump(results, f, indent=2)
 
+        with self.metrics.phase("catalog"):
+            self.catalog_snapshot(backup_path, results)
+
+        if self.store is not None:
+            print("🗄️ Committing snapshot to the deduplicated store...")
+            with self.metrics.phase("store"):
+                results["metadata"]["store"] = self.store.put_snapshot(backup_path)
+            self.metrics.add("bytes_uploaded", results["metadata"]["store"]["new_bytes"], target="store")
+            print(f"🗄️ {results['metadata']['store']['new_bytes']} new bytes stored")
+            # Restores of this snapshot read it from the store once it is pruned
+            with open(backup_path / "backup_manifest.json", "w") as f:
+                json.dump(results, f, indent=2)
+            pruned = self.prune_committed(backup_path)
+            if pruned:
+                print(f"🧹 Pruned {len(pruned)} local snapshot(s) already in the store")
+
+        self.write_metrics(backup_path)
         return results, str(backup_path / "backup_manifest.json")
 
+    def prune_committed(self, backup_path) -> list:
+        """Free the local copies of snapshots older than backup_path that the store holds.
+
+        Only backup_manifest.json and backup_metrics.json are kept, so the
+        catalog and restores can still find them. backup_path itself stays
+        whole: the next incremental run seeds its mirrors and pipeline
+        definitions from it.
+        """
+        committed = set(self.store.list_snapshots())
+        pruned = []
+        for snapshot in previous_snapshots(backup_path):
+            if snapshot.name not in committed or not (snapshot / "shards").is_dir():
+                continue
+            with open(snapshot / "backup_manifest.json") as f:
+                if "store" not in json.load(f).get("metadata", {}):
+                    # Committed before manifests recorded it: a restore would not know to read the store
+                    continue
+            for path in snapshot.iterdir():
+                if path.name in ("backup_manifest.json", "backup_metrics.json"):
+                    continue
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+            pruned.append(snapshot.name)
+        return pruned
+
+    def catalog_snapshot(self, snapshot_path, manifest: dict = None) -> int:
+        """Index a snapshot's entities in the catalog; a failure is reported but never fails the backup"""
+        from adobackup.core.catalog import SnapshotCatalog
+
+        try:
+            with SnapshotCatalog(self.catalog_path) as catalog:
+                count = catalog.add_snapshot(snapshot_path, manifest)
+        except Exception as e:
+            print(f"⚠️ Could not update the snapshot catalog: {str(e)}")
+            return 0
+        print(f"🗂️ Cataloged {count} entities in {self.catalog_path}")
+        return count
+
+    def write_metrics(self, snapshot_path) -> dict:
+        """Write backup_metrics.json into the snapshot (and the Prometheus textfile, if configured).
+
+        Safe to call again after later steps such as uploads or archiving so
+        their timings and byte counts land in the same report. Those steps do
+        not change the snapshot, so its size is only measured the first time.
+        """
+        snapshot_path = Path(snapshot_path)
+        if snapshot_path not in self._snapshot_bytes:
+            self._snapshot_bytes[snapshot_path] = directory_size(snapshot_path)
+        http = self.connection.session.stats()
+        report = self.metrics.write_json(
+            snapshot_path / "backup_metrics.json",
+            snapshot=snapshot_path.name,
+            snapshot_bytes=self._snapshot_bytes[snapshot_path],
+            http=http,
+            rate_limit=self.connection.session.limiter.stats()
+        )
+        if self.prometheus_path:
+            self.metrics.write_prometheus(
+                self.prometheus_path,
+                snapshot_bytes=report["snapshot_bytes"],
+                http_requests_total=http["requests"],
+                http_retries_total=http["retries"],
+                http_throttled_total=http["throttled"],
+                http_throttled_seconds_total=http["throttled_seconds"]
+            )
+        return report
+
+    def _create_module(self, name, module, options, journal=None):
+        if isinstance(module, str):
+            module_path, _, class_name = module.partition(":")
+            module = getattr(import_module(module_path), class_name)
+        kwargs = dict(options)
+        if name == "Wikis":
+            kwargs.setdefault("pat", self.pat)
+        if journal is not None and name in self.resumable:
+            kwargs.setdefault("journal", journal.scope(name))
+        return module(self.connection, **kwargs)
+
+    def _run_component(self, name, module, backup_path, options, journal=None):
+        """Run a single component backup, returning (shard summary, elapsed seconds, error, failed records)"""
+        if journal is not None and journal.done("engine", name):
+            print(f"⏭️ {name} already complete in this snapshot")
+            checkpoint = journal.get("engine", name)
+            return checkpoint["summary"], 0.0, None, checkpoint.get("failed", 0)
+        print(f"🔍 Backing up: {name}")
+        started = time.perf_counter()
+        shard_path = backup_path / "shards" / f"{name.lower().replace(' ', '')}.ndjson"
+        try:
+            module_instance = self._create_module(name, module, options, journal)
+            failed = 0
+            with self.metrics.phase(name), component_scope(name), ShardWriter(shard_path) as shard:
+                for record in self._iter_records(module_instance, backup_path):
+                    shard.write(record)
+                    # A repo, pipeline or plan that could not be backed up is missing from the snapshot
+                    failed += record.get("status") in ("failed", "error")
+                    if record.get("type") in ("repo", "wiki") and record.get("bytes"):
+                        self.metrics.add("git_bytes", record["bytes"], component=name, mode=record.get("mode", "clone"))
+            self.metrics.add("records", shard.records, component=name)
+            self.metrics.add("bytes_written", shard.bytes, component=name)
+            elapsed = time.perf_counter() - started
+            print(f"📁 {name}: {shard.records} records, {shard.bytes} bytes")
+            if failed:
+                print(f"⚠️ {name}: {failed} records failed to back up")
+            print(f"⏱️ {name} finished in {elapsed:.1f}s")
+            summary = shard.summary(relative_to=backup_path)
+            if journal is not None:
+                journal.record("engine", name, {"summary": summary, "failed": failed})
+            return summary, elapsed, None, failed
+        except Exception as e:
+            print(f"❌ Failed to backup {name}: {str(e)}")
+            return None, time.perf_counter() - started, str(e), 0
+
+    @staticmethod
+    def _iter_records(module_instance, backup_path):
+        """Records from module.stream(), or from a legacy backup() return value"""
+        if hasattr(module_instance, "stream"):
+            yield from module_instance.stream(backup_path)
+            return
+        backup_data = module_instance.backup(backup_path)
+        if isinstance(backup_data, list):
+            yield from backup_data
+        elif backup_data:
+            yield backup_data
+
     def save_to_local(self, results: dict, path: str = "backups/latest_backup.json"):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, "w") as f:
             json.dump(results, f, indent=2)
 
     def zip_backup(self, source_json: str = "backups/latest_backup.json", output_zip: str = "backups/latest_backup.zip"):
-        with zipfile.ZipFile(output_zip, 'w') as zipf:
+        with zipfile.ZipFile(output_zip, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
             zipf.write(source_json, arcname=os.path.basename(source_json))
+
+    def archive_snapshot(self, snapshot_path: str, codec: str = "gzip", output_path: str = None, max_workers: int = None):
+        """Stream a whole snapshot directory into a compressed tar archive"""
+        from adobackup.core.archive import SnapshotArchiver
+
+        archiver = SnapshotArchiver(codec=codec, max_workers=max_workers)
+        with self.metrics.phase("archive"):
+            summary = archiver.archive_to_file(snapshot_path, output_path)
+        self.metrics.add("bytes_written", summary["compressed_bytes"], component="archive")
+        return summary
@@ -0,0 +1,259 @@
+import json
+import logging
+import shutil
+import tempfile
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from adobackup.core.archive import extract_archive
+from adobackup.core.shards import iter_lines, iter_records
+from adobackup.modules.git_mirror import restore_layout
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of at most size items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BackupReader:
+    """Lazily iterates the records of a backup snapshot.
+
+    The manifest (latest_backup.json) is small and loaded eagerly; component
+    data is read record by record from the NDJSON shards it points to, so
+    memory use is bounded by what the caller keeps, not by the backup size.
+    Manifests written before shards existed hold the data inline and are
+    served from memory.
+
+    Every accessor takes an optional RestoreScope. When a snapshot catalog
+    is attached and the shards are local, a scoped read seeks straight to
+    the matching records instead of scanning the shard.
+
+    Pipeline records get the definition stored next to the shards, read
+    with read_file. Repository records get a local_path to push from:
+    mirror() resolves a mirror's snapshot path to a local directory.
+    Sources that have to download or rebuild mirrors first (blob uploads,
+    the deduplicated store) put them in work_dir, and each one is removed
+    once the next repository is requested. close() removes work_dir.
+    """
+
+    def __init__(self, manifest: dict, open_shard: Callable[[str], Iterable] = None, snapshot_dir: Optional[Path] = None,
+                 catalog=None, read_file: Callable[[str], bytes] = None, open_mirror: Callable[[str], Path] = None,
+                 work_dir: Optional[Path] = None):
+        self.manifest = manifest
+        self.snapshot_dir = snapshot_dir
+        self.catalog = catalog
+        self.work_dir = work_dir
+        self._open_shard = open_shard or self._local_shard
+        self._read_file = read_file or self._local_file
+        self._open_mirror = open_mirror or self._local_mirror
+        self.logger = logging.getLogger(__name__)
+
+    def close(self):
+        if self.work_dir is not None:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    @classmethod
+    def from_local(cls, manifest_path="backups/latest_backup.json", storage=None):
+        manifest_path = Path(manifest_path)
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Backup file not found at {manifest_path}")
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+        metadata = manifest.get("metadata", {})
+        snapshot = metadata.get("snapshot")
+        snapshot_dir = Path(snapshot) if snapshot else manifest_path.parent
+        if "store" in metadata and not (snapshot_dir / "shards").is_dir():
+            # Pruned after being committed to the store
+            return cls.from_store(cls._committed_store(metadata["store"], snapshot_dir, storage), manifest)
+        return cls(manifest, snapshot_dir=snapshot_dir)
+
+    @classmethod
+    def from_blob(cls, storage, blob_name="latest_backup.json", container_name="backups"):
+        manifest = json.loads(storage.download_backup(f"{container_name}/{blob_name}"))
+        if "store" in manifest.get("metadata", {}):
+            return cls.from_store(cls._committed_store(manifest["metadata"]["store"], None, storage), manifest)
+        if "archive" in manifest.get("metadata", {}):
+            archive = manifest["metadata"]["archive"]
+            with storage.open_blob(archive["blob"], container_name) as stream:
+                return cls.from_archive(stream, manifest, codec=archive.get("codec", "gzip"))
+        prefix = manifest.get("metadata", {}).get("date", "")
+        work_dir = Path(tempfile.mkdtemp(prefix="adobackup-restore-"))
+
+        def open_shard(relative):
+            return storage.iter_blob_lines(f"{prefix}/{relative}", container_name=container_name)
+
+        def read_file(relative):
+            return storage.download_backup(f"{container_name}/{prefix}/{relative}")
+
+        def open_mirror(relative):
+            return storage.download_mirror(prefix, relative, work_dir / relative, container_name)
+
+        return cls(manifest, open_shard, read_file=read_file, open_mirror=open_mirror, work_dir=work_dir)
+
+    @staticmethod
+    def _committed_store(store: dict, snapshot_dir: Optional[Path], storage=None):
+        """The ChunkStore a snapshot was committed to, as recorded in its manifest"""
+        from adobackup.core.chunk_store import ChunkStore, LocalObjectBackend
+
+        backend = store.get("backend")
+        if backend is None:
+            # Recorded before the backend was: blob backups used the default container, local ones the
+            # store next to the snapshots
+            if storage is not None:
+                return storage.chunk_store()
+            return ChunkStore(LocalObjectBackend(snapshot_dir.parent / "store"))
+        if backend["type"] == "blob":
+            if storage is None:
+                from adobackup.core.storage_manager import StorageManager
+                storage = StorageManager()
+            return storage.chunk_store(backend["container"])
+        return ChunkStore(LocalObjectBackend(backend["root"]))
+
+    @classmethod
+    def from_archive(cls, fileobj, manifest: dict, codec: str = "gzip"):
+        """Read a snapshot from a SnapshotArchiver archive, unpacked into a work directory first"""
+        work_dir = Path(tempfile.mkdtemp(prefix="adobackup-restore-"))
+        try:
+            extract_archive(fileobj, work_dir, codec)
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        return cls(manifest, snapshot_dir=work_dir / manifest["metadata"]["date"], work_dir=work_dir)
+
+    @classmethod
+    def from_store(cls, store, manifest: dict):
+        """Read a snapshot committed to a ChunkStore: shards and files from their chunks, mirrors rebuilt on demand"""
+        name = manifest["metadata"]["store"]["snapshot"]
+        snapshot = store.load_snapshot(name)
+        work_dir = Path(tempfile.mkdtemp(prefix="adobackup-restore-"))
+
+        def open_shard(relative):
+            return iter_lines(store.iter_file(snapshot, relative))
+
+        def read_file(relative):
+            return b"".join(store.iter_file(snapshot, relative))
+
+        def open_mirror(relative):
+            store.restore_snapshot(name, work_dir, prefix=relative, manifest=snapshot)
+            return restore_layout(work_dir / relative)
+
+        return cls(manifest, open_shard, read_file=read_file, open_mirror=open_mirror, work_dir=work_dir)
+
+    def read_file(self, relative: str) -> bytes:
+        """Contents of a file of the snapshot, by its path relative to the snapshot"""
+        return self._read_file(relative)
+
+    def mirror(self, relative: str) -> Path:
+        """Local directory holding the git mirror stored at relative"""
+        return self._open_mirror(relative)
+
+    def _local_shard(self, relative: str):
+        with open(self.snapshot_dir / relative, "rb") as f:
+            yield from f
+
+    def _local_file(self, relative: str) -> bytes:
+        if self.snapshot_dir is None:
+            raise FileNotFoundError(f"Cannot read {relative}: this backup source has no snapshot directory")
+        with open(self.snapshot_dir / relative, "rb") as f:
+            return f.read()
+
+    def _local_mirror(self, relative: str) -> Path:
+        if self.snapshot_dir is None:
+            raise FileNotFoundError(f"Cannot resolve mirror {relative}: this backup source has no snapshot directory")
+        return self.snapshot_dir / relative
+
+    def records(self, component: str, kind: Optional[str] = None, scope=None) -> Iterator[dict]:
+        """Yield the records of one component, optionally only those of a given type and in scope"""
+        entry = self.manifest.get("data", {}).get(component)
+        if not entry:
+            return
+        if isinstance(entry, dict) and "shard" in entry:
+            ranges = self._ranges(entry["shard"], kind, scope)
+            if ranges is not None:
+                source = iter_records(self._read_ranges(entry["shard"], ranges))
+            else:
+                source = iter_records(self._open_shard(entry["shard"]))
+        else:
+            source = self._legacy_records(component, entry)
+        narrow = scope is not None and scope.narrow
+        for record in source:
+            if (kind is None or record.get("type") == kind) and (not narrow or scope.matches(record)):
+                yield record
+
+    def _ranges(self, shard: str, kind: Optional[str], scope):
+        """Catalog offsets of the records to read, or None to scan the whole shard"""
+        if self.catalog is None or self.snapshot_dir is None or kind is None:
+            return None
+        snapshot = self.manifest.get("metadata", {}).get("date") or self.snapshot_dir.name
+        if scope is None:
+            return self.catalog.ranges(snapshot, shard, kind)
+        return self.catalog.ranges(snapshot, shard, kind, projects=scope.projects, ids=scope.ids)
+
+    def _read_ranges(self, shard: str, ranges) -> Iterator[bytes]:
+        with open(self.snapshot_dir / shard, "rb") as f:
+            for offset, length in ranges:
+                f.seek(offset)
+                yield f.read(length)
+
+    def projects(self, scope=None) -> Iterator[dict]:
+        yield from self.records("boards", "project", scope)
+
+    def iterations(self, scope=None) -> Iterator[dict]:
+        yield from self.records("boards", "iteration", scope)
+
+    def work_items(self, scope=None) -> Iterator[dict]:
+        yield from self.records("boards", "work_item", scope)
+
+    def repos(self, scope=None) -> Iterator[dict]:
+        for repo in self.records("repos", "repo", scope):
+            if repo.get("status") == "success" and "path" in repo and "local_path" not in repo:
+                repo["local_path"] = str(self.mirror(repo["path"]))
+            yield repo
+            if self.work_dir is not None and "local_path" in repo:
+                # Pushed by now: a downloaded mirror is not needed any more
+                shutil.rmtree(repo["local_path"], ignore_errors=True)
+
+    def pipelines(self, scope=None) -> Iterator[dict]:
+        """Pipeline records with their stored definition, plus inline (pre-shard) build and release definitions"""
+        for record in self.records("pipelines", scope=scope):
+            kind = record.get("type")
+            if kind == "pipeline" and record.get("status") == "success":
+                record["definition"] = self.pipeline_definition(record)
+            if kind in ("pipeline", "build", "release"):
+                yield record
+
+    def pipeline_definition(self, record: dict) -> dict:
+        """The definition PipelinesModule stored beside the shards for a pipeline record"""
+        return json.loads(self.read_file(f"pipelines/{record['project_id']}/{record['id']}.json"))
+
+    def artifacts(self, scope=None) -> Iterator[dict]:
+        yield from self.records("artifacts", "artifact", scope)
+
+    @staticmethod
+    def _legacy_records(component, entry):
+        """Translate inline (pre-shard) manifest data into typed records"""
+        if component == "boards" and isinstance(entry, dict):
+            for project in entry.get("projects", []):
+                yield {"type": "project", **project}
+            for project_name, iterations in entry.get("iterations", {}).items():
+                for iteration in iterations:
+                    yield {"type": "iteration", "project": project_name, **iteration}
+            for wi in entry.get("work_items", []):
+                yield {"type": "work_item", **wi}
+        elif component == "pipelines" and isinstance(entry, dict):
+            for build in entry.get("builds", []):
+                yield {"type": "build", **build}
+            for release in entry.get("releases", []):
+                yield {"type": "release", **release}
+        elif isinstance(entry, list):
+            kinds = {"repos": "repo", "artifacts": "artifact", "wikis": "wiki"}
+            for item in entry:
+                if isinstance(item, dict):
+                    yield {"type": kinds.get(component, component), **item}
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from pathlib import Path
+
+DEFAULT_CATALOG = "backups/catalog.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    organization TEXT,
+    components TEXT,
+    errors TEXT,
+    entities INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entities (
+    snapshot TEXT NOT NULL REFERENCES snapshots(name) ON DELETE CASCADE,
+    component TEXT NOT NULL,
+    type TEXT NOT NULL,
+    project TEXT NOT NULL DEFAULT '',
+    entity_id TEXT NOT NULL,
+    name TEXT,
+    hash TEXT NOT NULL,
+    shard TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (snapshot, type, project, entity_id)
+);
+CREATE INDEX IF NOT EXISTS entities_by_id ON entities (type, entity_id, project);
+"""
+
+# Per-run timings that would make every record look changed
+VOLATILE = ("seconds", "duration_seconds")
+
+
+def content_hash(record: dict) -> str:
+    """SHA-256 of a record's canonical JSON, ignoring per-run timings"""
+    content = {key: value for key, value in record.items() if key not in VOLATILE}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+def entity_key(record: dict):
+    """(type, project, id, name) identifying a shard record across snapshots, or None if it is not an entity"""
+    kind = record.get("type")
+    if not kind or record.get("status") == "failed":
+        return None
+    if kind == "project":
+        # Projects are looked up by name, which is what users and the other records refer to
+        return kind, record.get("name") or "", record.get("name"), record.get("name")
+    entity_id = record.get("id", record.get("plan_id", record.get("name")))
+    if entity_id is None:
+        return None
+    return kind, record.get("project") or "", str(entity_id), record.get("name")
+
+
+class SnapshotCatalog:
+    """SQLite index of the entities in every local snapshot.
+
+    Each shard record that names an entity (project, repo, work item,
+    pipeline, test plan...) gets a row keyed by snapshot, type, project and
+    ID with the SHA-256 of its line and the line's byte offset in the
+    shard (timings are left out of the hash, so an unchanged entity keeps
+    its hash from run to run). Listing snapshots, an entity's history across snapshots and
+    loading one record are indexed lookups and a single seek, instead of
+    parsing every manifest and shard.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_details):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def add_snapshot(self, snapshot_path, manifest: dict = None) -> int:
+        """Index a snapshot's shards, replacing any earlier rows for it; returns the entity count"""
+        snapshot_path = Path(snapshot_path)
+        if manifest is None:
+            with open(snapshot_path / "backup_manifest.json") as f:
+                manifest = json.load(f)
+        metadata = manifest.get("metadata", {})
+        name = metadata.get("date") or snapshot_path.name
+
+        with self._db:
+            self._db.execute("DELETE FROM snapshots WHERE name = ?", (name,))
+            self._db.execute(
+                "INSERT INTO snapshots (name, path, organization, components, errors) VALUES (?, ?, ?, ?, ?)",
+                (name, str(snapshot_path.resolve()), metadata.get("organization"),
+                 json.dumps(metadata.get("components", [])), json.dumps(metadata.get("errors", {})))
+            )
+            for component, entry in manifest.get("data", {}).items():
+                if isinstance(entry, dict) and "shard" in entry:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        self._rows(name, component, snapshot_path, entry["shard"])
+                    )
+            count = self._db.execute("SELECT COUNT(*) FROM entities WHERE snapshot = ?", (name,)).fetchone()[0]
+            self._db.execute("UPDATE snapshots SET entities = ? WHERE name = ?", (count, name))
+        self.logger.info(f"Cataloged {count} entities of snapshot {name}")
+        return count
+
+    @staticmethod
+    def _rows(name, component, snapshot_path, shard):
+        offset = 0
+        with open(snapshot_path / shard, "rb") as f:
+            for line in f:
+                record = json.loads(line) if line.strip() else None
+                key = entity_key(record) if isinstance(record, dict) else None
+                if key is not None:
+                    kind, project, entity_id, entity_name = key
+                    yield (name, component, kind, project, entity_id, entity_name, content_hash(record), shard,
+                           offset, len(line))
+                offset += len(line)
+
+    def rebuild(self, backup_dir="backups") -> list:
+        """Index every snapshot under backup_dir that has a manifest but is not cataloged yet"""
+        known = {row["name"] for row in self._db.execute("SELECT name FROM snapshots")}
+        added = []
+        for manifest_path in sorted(Path(backup_dir).glob("*/backup_manifest.json")):
+            if manifest_path.parent.name not in known:
+                self.add_snapshot(manifest_path.parent)
+                added.append(manifest_path.parent.name)
+        return added
+
+    def snapshots(self) -> list:
+        """Cataloged snapshots, newest first"""
+        rows = self._db.execute("SELECT * FROM snapshots ORDER BY name DESC")
+        return [
+            {**dict(row), "components": json.loads(row["components"]), "errors": json.loads(row["errors"])}
+            for row in rows
+        ]
+
+    def history(self, kind: str, entity_id, project: str = None) -> list:
+        """Every cataloged version of an entity, oldest first, with "changed" set where its hash differs"""
+        query = "SELECT * FROM entities WHERE type = ? AND entity_id = ?"
+        params = [kind, str(entity_id)]
+        if project is not None:
+            query += " AND project = ?"
+            params.append(project)
+        rows = [dict(row) for row in self._db.execute(query + " ORDER BY project, snapshot", params)]
+        previous = {}
+        for row in rows:
+            row["changed"] = previous.get(row["project"]) != row["hash"]
+            previous[row["project"]] = row["hash"]
+        return rows
+
+    def locate(self, kind: str, entity_id, project: str = None, snapshot: str = None):
+        """The entity's row in snapshot, or in the newest snapshot that has it; None when not cataloged"""
+        query = "SELECT entities.*, snapshots.path FROM entities JOIN snapshots ON snapshots.name = entities.snapshot " \
+                "WHERE type = ? AND entity_id = ?"
+        params = [kind, str(entity_id)]
+        if project is not None:
+            query += " AND project = ?"
+            params.append(project)
+        if snapshot is not None:
+            query += " AND snapshot = ?"
+            params.append(snapshot)
+        row = self._db.execute(query + " ORDER BY snapshot DESC LIMIT 1", params).fetchone()
+        return dict(row) if row is not None else None
+
+    def ranges(self, snapshot: str, shard: str, kind: str = None, projects=None, ids=None):
+        """(offset, length) of a shard's matching records in file order, or None if the snapshot is not cataloged.
+
+        Project records match on name only, whatever ids says.
+        """
+        if self._db.execute("SELECT 1 FROM snapshots WHERE name = ?", (snapshot,)).fetchone() is None:
+            return None
+        query = "SELECT offset, length FROM entities WHERE snapshot = ? AND shard = ?"
+        params = [snapshot, shard]
+        if kind is not None:
+            query += " AND type = ?"
+            params.append(kind)
+        if projects is not None:
+            query += f" AND project IN ({', '.join('?' * len(projects))})"
+            params.extend(projects)
+        if ids is not None:
+            query += f" AND (type = 'project' OR entity_id IN ({', '.join('?' * len(ids))}))"
+            params.extend(str(i) for i in ids)
+        return [(row["offset"], row["length"]) for row in self._db.execute(query + " ORDER BY offset", params)]
+
+    @staticmethod
+    def load(location: dict, read_file=None) -> dict:
+        """Read the record a locate() row points to, checking it against the cataloged hash.
+
+        read_file(shard) -> bytes reads the shard from elsewhere, e.g. the
+        store, when the local copy of the snapshot has been pruned.
+        """
+        if read_file is not None:
+            line = read_file(location["shard"])[location["offset"]:location["offset"] + location["length"]]
+        else:
+            with open(Path(location["path"]) / location["shard"], "rb") as f:
+                f.seek(location["offset"])
+                line = f.read(location["length"])
+        record = json.loads(line)
+        if content_hash(record) != location["hash"]:
+            raise ValueError(f"{location['shard']} in snapshot {location['snapshot']} changed since it was cataloged")
+        return record
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from pathlib import Path
+
+from azure.core.exceptions import ResourceNotFoundError
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+TEXT_SUFFIXES = (".json", ".ndjson")
+
+
+class LocalObjectBackend:
+    """Keeps store objects as files below a local directory"""
+
+    def __init__(self, root="backups/store"):
+        self.root = Path(root)
+
+    def location(self) -> dict:
+        return {"type": "local", "root": self.root.as_posix()}
+
+    def has(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def put(self, key: str, data: bytes):
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key: str) -> bytes:
+        with open(self.root / key, "rb") as f:
+            return f.read()
+
+    def delete(self, key: str):
+        try:
+            (self.root / key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str):
+        base = self.root / prefix
+        if not base.exists():
+            return
+        for path in base.rglob("*"):
+            if path.is_file() and not path.name.endswith(".tmp"):
+                yield path.relative_to(self.root).as_posix()
+
+
+class BlobObjectBackend:
+    """Keeps store objects as blobs in one container"""
+
+    def __init__(self, container_client):
+        self.container = container_client
+
+    def location(self) -> dict:
+        return {"type": "blob", "container": self.container.container_name}
+
+    def has(self, key: str) -> bool:
+        try:
+            self.container.get_blob_client(key).get_blob_properties()
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    def put(self, key: str, data: bytes):
+        self.container.get_blob_client(key).upload_blob(data, overwrite=True)
+
+    def get(self, key: str) -> bytes:
+        return self.container.get_blob_client(key).download_blob().readall()
+
+    def delete(self, key: str):
+        try:
+            self.container.get_blob_client(key).delete_blob()
+        except ResourceNotFoundError:
+            pass
+
+    def list(self, prefix: str):
+        for blob in self.container.list_blobs(name_starts_with=prefix):
+            yield blob.name
+
+
+def iter_chunks(path, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Split a file into content-defined chunks.
+
+    JSON and NDJSON files are cut on line boundaries chosen by the hash of
+    the line itself, so a changed or inserted record only alters the chunk
+    it lives in. Other files (git packs, bundles) use fixed-size chunks.
+    """
+    with open(path, "rb") as f:
+        if not str(path).endswith(TEXT_SUFFIXES):
+            yield from iter(lambda: f.read(chunk_size), b"")
+            return
+
+        pending = []
+        pending_size = 0
+        for line in f:
+            pending.append(line)
+            pending_size += len(line)
+            boundary = hashlib.sha256(line).digest()[0] < 16
+            if boundary or pending_size >= chunk_size:
+                yield b"".join(pending)
+                pending, pending_size = [], 0
+        if pending:
+            yield b"".join(pending)
+
+
+class ChunkStore:
+    """Content-addressed, deduplicated snapshot store.
+
+    Files are split into chunks stored once under objects/<sha256>; each
+    snapshot is a small manifest under snapshots/<name>.json listing the
+    chunk hashes of every file. Chunks already referenced by an existing
+    snapshot are neither looked up in the backend nor uploaded again.
+    """
+
+    def __init__(self, backend, chunk_size: int = DEFAULT_CHUNK_SIZE, max_workers: int = 8):
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _object_key(digest: str) -> str:
+        return f"objects/{digest[:2]}/{digest}"
+
+    @staticmethod
+    def _snapshot_key(name: str) -> str:
+        return f"snapshots/{name}.json"
+
+    def list_snapshots(self) -> list:
+        names = [key[len("snapshots/"):-len(".json")] for key in self.backend.list("snapshots/") if key.endswith(".json")]
+        return sorted(names)
+
+    def load_snapshot(self, name: str) -> dict:
+        return json.loads(self.backend.get(self._snapshot_key(name)))
+
+    def _referenced(self, names) -> set:
+        digests = set()
+        for name in names:
+            for entry in self.load_snapshot(name)["files"].values():
+                digests.update(entry["chunks"])
+        return digests
+
+    def put_snapshot(self, snapshot_path, name: str = None) -> dict:
+        """Store a snapshot directory, uploading only chunks the store has not seen"""
+        snapshot_path = Path(snapshot_path)
+        name = name or snapshot_path.name
+        started = time.perf_counter()
+        known = self._referenced(self.list_snapshots())
+        counters = {"chunks": 0, "new_chunks": 0, "bytes": 0, "new_bytes": 0}
+
+        def store(digest, data):
+            if not self.backend.has(self._object_key(digest)):
+                self.backend.put(self._object_key(digest), data)
+
+        files = {}
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for path in sorted(p for p in snapshot_path.rglob("*") if p.is_file()):
+                chunks = []
+                for data in iter_chunks(path, self.chunk_size):
+                    digest = hashlib.sha256(data).hexdigest()
+                    chunks.append(digest)
+                    counters["chunks"] += 1
+                    counters["bytes"] += len(data)
+                    if digest in known:
+                        continue
+                    known.add(digest)
+                    counters["new_chunks"] += 1
+                    counters["new_bytes"] += len(data)
+                    in_flight.add(pool.submit(store, digest, data))
+                    if len(in_flight) >= 2 * self.max_workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                files[path.relative_to(snapshot_path).as_posix()] = {
+                    "size": path.stat().st_size,
+                    "chunks": chunks
+                }
+            for future in in_flight:
+                future.result()
+
+        manifest = {
+            "name": name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "files": files
+        }
+        self.backend.put(self._snapshot_key(name), json.dumps(manifest, separators=(",", ":")).encode())
+
+        summary = {"snapshot": name, "files": len(files), **counters,
+                   "seconds": round(time.perf_counter() - started, 3), "backend": self.backend.location()}
+        self.logger.info(
+            f"Stored snapshot {name}: {summary['files']} files, "
+            f"{summary['new_chunks']}/{summary['chunks']} new chunks, {summary['new_bytes']} new bytes"
+        )
+        return summary
+
+    def iter_file(self, manifest: dict, relative: str):
+        """Yield the chunks of one file of a loaded snapshot manifest, in order"""
+        entry = manifest["files"].get(relative)
+        if entry is None:
+            raise FileNotFoundError(f"{relative} is not in snapshot {manifest['name']}")
+        for digest in entry["chunks"]:
+            yield self.backend.get(self._object_key(digest))
+
+    def restore_snapshot(self, name: str, target_dir, paths=None, prefix: str = None, manifest: dict = None):
+        """Rebuild a snapshot (or only the given relative paths, or those below prefix) into target_dir"""
+        target_dir = Path(target_dir)
+        manifest = manifest or self.load_snapshot(name)
+        for relative in manifest["files"]:
+            if paths is not None and relative not in paths:
+                continue
+            if prefix is not None and not relative.startswith(prefix.rstrip("/") + "/"):
+                continue
+            path = target_dir / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                for data in self.iter_file(manifest, relative):
+                    f.write(data)
+        return target_dir
+
+    def delete_snapshot(self, name: str):
+        self.backend.delete(self._snapshot_key(name))
+
+    def expire(self, keep_last: int) -> dict:
+        """Drop all but the newest keep_last snapshots, then collect garbage"""
+        names = self.list_snapshots()
+        expired = names[:-keep_last] if keep_last > 0 else names
+        for name in expired:
+            self.delete_snapshot(name)
+        summary = self.gc()
+        summary["expired"] = expired
+        return summary
+
+    def gc(self) -> dict:
+        """Delete every object no remaining snapshot references (mark and sweep)"""
+        live = self._referenced(self.list_snapshots())
+        removed = 0
+        for key in list(self.backend.list("objects/")):
+            if key.rsplit("/", 1)[-1] not in live:
+                self.backend.delete(key)
+                removed += 1
+        self.logger.info(f"Garbage collection removed {removed} objects, {len(live)} live")
+        return {"removed": removed, "live": len(live)}
@@ -2,33 +2,44 @@ import json
 import os
 import subprocess
 import logging
+import requests
+from itertools import groupby
 from pathlib import Path
-from typing import Optional, Callable
-
-from azure.devops.connection import Connection
-from azure.devops.v7_1.git import GitClient
-from azure.devops.v7_1.build import BuildClient
-from azure.devops.v7_1.release import ReleaseClient
-from azure.devops.v7_1.work_item_tracking import WorkItemTrackingClient
-from azure.devops.v7_1.work import WorkClient
-from azure.devops.v7_1.core.models import TeamProjectReference
+from typing import Optional, Callable, Iterable
+from urllib.parse import quote, urlsplit, urlunsplit
+
+from azure.devops.v7_1.core.models import TeamProject
 from azure.devops.v7_1.work.models import TeamContext
 from azure.core.exceptions import AzureError
-from azure.storage.blob import BlobServiceClient
-from msrest.authentication import BasicAuthentication
-from adobackup.core.storage_manager import StorageManager
+from adobackup.modules.git_mirror import directory_size, run_git
+from adobackup.modules.http_client import PooledConnection
+from adobackup.modules.metrics import Metrics
+from adobackup.modules.pipelines import PIPELINES_API_VERSION
+from adobackup.core.backup_reader import BackupReader
+from adobackup.core.catalog import DEFAULT_CATALOG, SnapshotCatalog
+from adobackup.core.scope import RestoreScope
+from adobackup.core.target_index import TargetStateIndex
+from adobackup.core.work_item_restore import WorkItemBatchRestorer, WorkItemIdMap
 
 
 class RestoreEngine:
     """Handles complete restoration of Azure DevOps components from backups"""
 
-    def __init__(self, target_org: str, target_pat: str):
+    def __init__(self, target_org: str, target_pat: str, batch_size: int = 200, max_workers: int = 4,
+                 id_map_path: str = None, prometheus_path: str = None, base_url: str = None):
         self.target_org = target_org
         self.target_pat = target_pat
-        self.connection = Connection(
-            base_url=f"https://dev.azure.com/{target_org}",
-            creds=BasicAuthentication("", target_pat)
-        )
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.id_map_path = id_map_path or f"backups/restore_{target_org}_id_map.json"
+        self.metrics_path = Path(self.id_map_path).with_name(f"restore_{target_org}_metrics.json")
+        self.prometheus_path = prometheus_path
+        self.report = {}
+        self.metrics = Metrics()
+        self.connection = PooledConnection(base_url or f"https://dev.azure.com/{target_org}", target_pat,
+                                           metrics=self.metrics)
+        self.index = TargetStateIndex(self.connection)
+        self._repo_ids = {}
         self.logger = logging.getLogger(__name__)
         self._progress_callback = None
         self.logger.info(f"Initialized restore engine for {target_org}")
@@ -40,27 +51,68 @@ class RestoreEngine:
         if self._progress_callback:
             self._progress_callback(percent, message)
 
-    def restore_all(self, backup_source: str) -> bool:
+    def restore_all(self, backup_source: str, scope: RestoreScope = None, catalog_path: str = None,
+                    delta: bool = False, dry_run: bool = False) -> bool:
+        """Restore the latest backup, or only the part of it inside scope.
+
+        Sections outside scope are skipped without reading their shards or
+        calling their APIs. For a local backup that is in the snapshot
+        catalog (catalog_path, default backups/catalog.sqlite), scoped
+        records are read by offset rather than by scanning each shard.
+
+        With delta, work items already restored are compared with the
+        target and only created, updated or relinked where they differ;
+        the plan and its API call estimate are reported before anything is
+        written. dry_run (implies delta) stops after the plan.
+        """
+        delta = delta or dry_run
+        scope = scope or RestoreScope()
+        catalog = None
+        reader = None
         try:
             self._update_progress(0, "Starting restore process...")
-            data = self._load_backup_data(backup_source)
+            with self.metrics.phase("load"):
+                reader = self._load_backup_data(backup_source)
+                catalog = self._open_catalog(reader, scope, catalog_path)
+                reader.catalog = catalog
+            self.report["scope"] = scope.describe()
             self._update_progress(10, "Backup data loaded")
 
-            self._restore_projects(data.get("projects", []))
-            self._update_progress(20, "Projects restored")
-
-            self._restore_repos(data.get("repos", []))
-            self._update_progress(40, "Repositories restored")
+            if dry_run:
+                if scope.includes("boards"):
+                    with self.metrics.phase("plan"):
+                        self._plan_work_items(reader.work_items(scope))
+                self._update_progress(100, "Dry run completed, nothing written")
+                return True
 
-            self._restore_boards(data.get("boards", {}))
-            self._update_progress(60, "Boards and work items restored")
-
-            self._restore_pipelines(data.get("pipelines", {}))
-            self._update_progress(80, "Pipelines restored")
-
-            self._restore_artifacts(data.get("artifacts", []))
-            self._update_progress(90, "Artifacts restored")
+            with self.metrics.phase("projects"):
+                self._restore_projects(reader.projects(scope))
+            self._update_progress(20, "Projects restored")
 
+            if scope.includes("repos"):
+                with self.metrics.phase("repos"):
+                    self._restore_repos(reader.repos(scope))
+                self._update_progress(40, "Repositories restored")
+
+            if scope.includes("boards"):
+                with self.metrics.phase("boards"):
+                    self._restore_boards(reader.iterations(scope), reader.work_items(scope), delta=delta)
+                self._update_progress(60, "Boards and work items restored")
+
+            if scope.includes("pipelines"):
+                with self.metrics.phase("pipelines"):
+                    self._restore_pipelines(reader.pipelines(scope))
+                self._update_progress(80, "Pipelines restored")
+
+            if scope.includes("artifacts"):
+                with self.metrics.phase("artifacts"):
+                    self._restore_artifacts(reader.artifacts(scope))
+                self._update_progress(90, "Artifacts restored")
+
+            self.logger.info(
+                f"Target index: {self.index.lookups} lookups, "
+                f"{self.index.stats()['api_calls_saved']} API calls saved"
+            )
             self._update_progress(100, "Restore completed successfully")
             self.logger.info("Restore completed successfully")
             return True
@@ -73,23 +125,89 @@ class RestoreEngine:
             self.logger.error(f"Restore failed: {str(e)}")
             self._update_progress(-1, f"Restore failed: {str(e)}")
             raise
-
-    def _load_backup_data(self, source: str) -> dict:
+        finally:
+            if catalog is not None:
+                catalog.close()
+            if reader is not None:
+                reader.close()
+            self.write_metrics()
+
+    def _open_catalog(self, reader: BackupReader, scope: RestoreScope, catalog_path: str = None):
+        """The snapshot catalog, for scoped restores of local snapshots that have one"""
+        path = Path(catalog_path or DEFAULT_CATALOG)
+        if (scope.components is None and not scope.narrow) or reader.snapshot_dir is None or not path.exists():
+            return None
+        return SnapshotCatalog(path)
+
+    def restore_entity(self, kind: str, entity_id, project: str = None, snapshot: str = None,
+                       catalog_path: str = None) -> dict:
+        """Restore one cataloged entity (project, repo, iteration, work item or pipeline).
+
+        The record is found through the snapshot catalog and read with a
+        single seek into its shard; snapshot defaults to the newest one
+        that contains the entity. Returns the restored record.
+        """
+        if kind in ("test_plan", "wiki"):
+            raise ValueError(f"Restoring {kind} records is not supported: they are backed up and cataloged, but never restored")
+        reader = None
+        try:
+            with SnapshotCatalog(catalog_path or DEFAULT_CATALOG) as catalog:
+                location = catalog.locate(kind, entity_id, project=project, snapshot=snapshot)
+            if location is None:
+                raise ValueError(f"No {kind} {entity_id} in the snapshot catalog")
+            reader = BackupReader.from_local(Path(location["path"]) / "backup_manifest.json")
+            # A snapshot pruned after its commit to the store has no local shards to seek into
+            record = SnapshotCatalog.load(location, reader.read_file if reader.snapshot_dir is None else None)
+            self.logger.info(f"Restoring {kind} {entity_id} from snapshot {location['snapshot']}")
+
+            with self.metrics.phase(kind):
+                if kind == "project":
+                    self._restore_projects([record])
+                elif kind == "repo":
+                    self._restore_repos([{**record, "local_path": str(reader.mirror(record["path"]))}])
+                elif kind == "iteration":
+                    self._restore_boards([record], [])
+                elif kind == "work_item":
+                    self._restore_boards([], [record])
+                elif kind == "pipeline":
+                    self._restore_pipelines([{**record, "definition": reader.pipeline_definition(record)}])
+                else:
+                    raise ValueError(f"Restoring {kind} records is not supported")
+            return record
+        finally:
+            if reader is not None:
+                reader.close()
+            self.write_metrics()
+
+    def write_metrics(self) -> dict:
+        """Fill self.report and write it, with timings and API metrics, to restore_<org>_metrics.json"""
+        self.report["index"] = self.index.stats()
+        self.report["http"] = self.connection.session.stats()
+        self.report["rate_limit"] = self.connection.session.limiter.stats()
+        self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        report = self.metrics.write_json(self.metrics_path, organization=self.target_org, **self.report)
+        if self.prometheus_path:
+            self.metrics.write_prometheus(
+                self.prometheus_path,
+                prefix="adobackup_restore",
+                http_retries_total=self.report["http"]["retries"],
+                http_throttled_seconds_total=self.report["http"]["throttled_seconds"],
+                index_api_calls_saved_total=self.report["index"]["api_calls_saved"]
+            )
+        return report
+
+    def _load_backup_data(self, source: str) -> BackupReader:
+        """Open the backup manifest; component records are read lazily from its shards"""
         try:
             if source == "Local Storage":
-                backup_path = Path("backups/latest_backup.json")
-                if not backup_path.exists():
-                    raise FileNotFoundError(f"Backup file not found at {backup_path}")
-
                 self.logger.info("Loading backup from local storage...")
-                with open(backup_path, 'r') as f:
-                    return json.load(f)
+                return BackupReader.from_local("backups/latest_backup.json")
 
             elif source == "Azure Blob Storage":
-                self.logger.info("Downloading backup from Azure Blob Storage...")
-                download_path = StorageManager().download_to_file()
-                with open(download_path, 'r') as f:
-                    return json.load(f)
+                from adobackup.core.storage_manager import StorageManager
+
+                self.logger.info("Streaming backup from Azure Blob Storage...")
+                return BackupReader.from_blob(StorageManager())
 
             else:
                 raise ValueError(f"Unknown backup source: {source}")
@@ -98,43 +216,43 @@ class RestoreEngine:
             self.logger.error(f"Failed to load backup data: {str(e)}")
             raise
 
-    def _restore_projects(self, projects: list[dict]):
+    def _restore_projects(self, projects: Iterable[dict]):
         core_client = self.connection.clients.get_core_client()
-        existing_projects = {p.name: p for p in core_client.get_projects()}
 
         for project in projects:
-            if project["name"] not in existing_projects:
+            if not self.index.exists("projects", project["name"]):
                 try:
                     self.logger.info(f"Creating project {project['name']}")
                     core_client.queue_create_project(
-                        TeamProjectReference(
+                        TeamProject(
                             name=project["name"],
                             description=project.get("description", ""),
                             capabilities=project.get("capabilities", {})
                         )
                     )
+                    self.index.add("projects", project["name"])
                 except AzureError as e:
                     if "already exists" not in str(e):
                         raise
 
-    def _restore_repos(self, repos: list[dict]):
+    def _restore_repos(self, repos: Iterable[dict]):
         git_client = self.connection.clients.get_git_client()
 
         for repo in repos:
+            if "local_path" not in repo:
+                self.logger.warning(f"Skipping repo {repo['name']}: no local mirror in this backup")
+                continue
             try:
-                existing_repos = git_client.get_repositories(repo["project"])
-                if not any(r.name == repo["name"] for r in existing_repos):
-                    git_client.create_repository(
-                        {"name": repo["name"], "project": repo["project"]},
-                        repo["project"]
-                    )
+                if not self.index.exists("repos", repo["name"], repo["project"]):
+                    git_client.create_repository({"name": repo["name"]}, repo["project"])
+                    self.index.add("repos", repo["name"], repo["project"])
                     self.logger.info(f"Created repository {repo['name']}")
 
                 self.logger.info(f"Mirroring repository {repo['name']}...")
-                subprocess.run([
-                    "git", "push", "--mirror",
-                    f"https://{self.target_pat}@dev.azure.com/{self.target_org}/{repo['project']}/_git/{repo['name']}"
-                ], cwd=repo["local_path"], check=True)
+                # Size of the mirror pushed, not bytes on the wire: git does not report those
+                self.metrics.add("git_pushed_mirror_bytes", directory_size(repo["local_path"]))
+                run_git("push", "--mirror", self._push_url(repo["project"], repo["name"]),
+                        cwd=repo["local_path"], remote=True, limiter=self.connection.session.limiter)
 
                 self.logger.info(f"Successfully restored repo {repo['name']}")
 
@@ -145,60 +263,130 @@ class RestoreEngine:
                 self.logger.error(f"Azure operation failed for {repo['name']}: {str(e)}")
                 raise
 
-    def _restore_boards(self, boards_data: dict):
-        wit_client = self.connection.clients.get_work_item_tracking_client()
+    def _push_url(self, project: str, name: str) -> str:
+        """Git remote of a target repository, with the PAT as credentials"""
+        parts = urlsplit(self.connection.base_url)
+        return urlunsplit((
+            parts.scheme, f"{self.target_pat}@{parts.netloc}",
+            f"{parts.path.rstrip('/')}/{quote(project)}/_git/{quote(name)}", "", ""
+        ))
+
+    def _work_item_restorer(self) -> WorkItemBatchRestorer:
+        return WorkItemBatchRestorer(
+            self.connection.base_url,
+            self.target_pat,
+            WorkItemIdMap(self.id_map_path),
+            batch_size=self.batch_size,
+            max_workers=self.max_workers,
+            session=self.connection.session
+        )
+
+    def _plan_work_items(self, work_items: Iterable[dict]) -> WorkItemBatchRestorer:
+        """Plan a delta work item restore and report its estimate; returns the restorer holding the plan"""
+        restorer = self._work_item_restorer()
+        plan = restorer.plan(work_items)
+        self.report["plan"] = plan
+        self._update_progress(50, f"Planned {plan['create'] + plan['update']} work item writes")
+        return restorer
+
+    def _restore_boards(self, iterations: Iterable[dict], work_items: Iterable[dict], delta: bool = False):
         work_client = self.connection.clients.get_work_client()
 
-        for project_name, iterations in boards_data.get("iterations", {}).items():
+        for project_name, project_iterations in groupby(iterations, key=lambda i: i["project"]):
             try:
                 team_context = TeamContext(project=project_name)
-                existing_iterations = {i.name: i for i in work_client.get_team_iterations(team_context)}
 
-                for iteration in iterations:
-                    if iteration["name"] not in existing_iterations:
+                for iteration in project_iterations:
+                    if not self.index.exists("iterations", iteration["name"], project_name):
                         work_client.post_team_iteration(iteration, team_context)
+                        self.index.add("iterations", iteration["name"], project_name)
                         self.logger.info(f"Created iteration {iteration['name']}")
             except AzureError as e:
                 self.logger.error(f"Failed to restore iterations for {project_name}: {str(e)}")
                 raise
 
-        for wi in boards_data.get("work_items", []):
+        if delta:
+            summary = self._plan_work_items(work_items).apply()
+            self.metrics.add("work_items", summary["updated"], outcome="updated")
+            self.metrics.add("work_items", summary["skipped"], outcome="skipped")
+        else:
+            summary = self._work_item_restorer().restore(work_items)
+        self.report["work_items"] = summary
+        self.metrics.add("work_items", summary["created"], outcome="created")
+        self.metrics.add("work_items", summary["failed"], outcome="failed")
+        self.metrics.add("work_item_links", summary["linked"])
+        for failure in summary["failures"]:
+            self.logger.error(f"Failed to process work item {failure['id']}: {failure['error']}")
+
+    def _restore_pipelines(self, pipelines: Iterable[dict]):
+        """Create the pipelines the target lacks, by name; build and release records come from inline manifests.
+
+        A pipeline that cannot be created (say its repository is missing from
+        the target) is collected in report["pipelines"] and the rest go on.
+        """
+        failures = []
+        for record in pipelines:
             try:
-                wit_client.create_work_item(
-                    document=wi["fields"],
-                    project=wi["project"],
-                    type=wi["type"]
-                )
-                self.logger.info(f"Created work item {wi['id']} ({wi['type']})")
-            except AzureError as e:
-                self.logger.error(f"Failed to process work item {wi['id']}: {str(e)}")
-                raise
-
-    def _restore_pipelines(self, pipelines_data: dict):
-        build_client = self.connection.clients.get_build_client()
-        release_client = self.connection.clients.get_release_client()
-
-        for build_def in pipelines_data.get("builds", []):
-            try:
-                existing_defs = build_client.get_definitions(build_def["project"])
-                if not any(d.name == build_def["name"] for d in existing_defs):
-                    build_client.create_definition(build_def, project=build_def["project"])
-                    self.logger.info(f"Created build pipeline {build_def['name']}")
-            except AzureError as e:
-                self.logger.error(f"Failed to restore build pipeline {build_def['name']}: {str(e)}")
-                raise
-
-        for release_def in pipelines_data.get("releases", []):
-            try:
-                existing_defs = release_client.get_release_definitions(release_def["project"])
-                if not any(d.name == release_def["name"] for d in existing_defs):
-                    release_client.create_definition(release_def, project=release_def["project"])
-                    self.logger.info(f"Created release pipeline {release_def['name']}")
-            except AzureError as e:
-                self.logger.error(f"Failed to restore release pipeline {release_def['name']}: {str(e)}")
-                raise
+                if record["type"] == "pipeline":
+                    self._restore_pipeline(record)
+                else:
+                    self._restore_definition(record)
+            except (requests.RequestException, ValueError, AzureError) as e:
+                failures.append({"type": record["type"], "project": record["project"], "name": record["name"],
+                                 "error": str(e)})
+        self.report["pipelines"] = {"failed": len(failures), "failures": failures}
+
+    def _restore_pipeline(self, record: dict):
+        name, project = record["name"], record["project"]
+        if "definition" not in record:
+            self.logger.warning(f"Skipping pipeline {name}: it failed to back up")
+            return
+        if self.index.exists("pipelines", name, project):
+            return
+        definition = record["definition"]
+        configuration = dict(definition.get("configuration") or {})
+        repository = configuration.get("repository")
+        try:
+            if repository and repository.get("name"):
+                # Repository IDs differ between organizations: point at the target's repository of that name
+                target_id = self._target_repo_ids(project).get(repository["name"])
+                if target_id is None:
+                    raise ValueError(f"repository {repository['name']} does not exist in {project}")
+                configuration["repository"] = {**repository, "id": target_id}
+            response = self.connection.session.post(
+                f"{self.connection.base_url}/{quote(project)}/_apis/pipelines",
+                params={"api-version": PIPELINES_API_VERSION},
+                json={"name": name, "folder": definition.get("folder"), "configuration": configuration}
+            )
+            response.raise_for_status()
+        except (requests.RequestException, ValueError) as e:
+            self.logger.error(f"Failed to restore pipeline {name}: {str(e)}")
+            raise
+        self.index.add("pipelines", name, project)
+        self.metrics.add("pipelines", 1, outcome="created")
+        self.logger.info(f"Created pipeline {name}")
+
+    def _target_repo_ids(self, project: str) -> dict:
+        """{name: ID} of the target project's repositories, listed once"""
+        if project not in self._repo_ids:
+            git_client = self.connection.clients.get_git_client()
+            self._repo_ids[project] = {repo.name: repo.id for repo in git_client.get_repositories(project)}
+        return self._repo_ids[project]
+
+    def _restore_definition(self, definition: dict):
+        kind = "builds" if definition["type"] == "build" else "releases"
+        clients = self.connection.clients
+        client = clients.get_build_client() if kind == "builds" else clients.get_release_client()
+        try:
+            if not self.index.exists(kind, definition["name"], definition["project"]):
+                client.create_definition(definition, project=definition["project"])
+                self.index.add(kind, definition["name"], definition["project"])
+                self.logger.info(f"Created {definition['type']} pipeline {definition['name']}")
+        except AzureError as e:
+            self.logger.error(f"Failed to restore {definition['type']} pipeline {definition['name']}: {str(e)}")
+            raise
 
-    def _restore_artifacts(self, artifacts: list[dict]):
+    def _restore_artifacts(self, artifacts: Iterable[dict]):
         self.logger.warning("Artifact restoration not yet implemented")
 
 
@@ -0,0 +1,56 @@
+from typing import Iterable, Optional
+
+from adobackup.core.catalog import entity_key
+
+# Components a restore knows how to write back, by manifest key
+RESTORABLE = ("boards", "repos", "pipelines", "artifacts")
+
+
+def _names(values) -> Optional[frozenset]:
+    if values is None:
+        return None
+    names = frozenset(str(v) for v in values if str(v))
+    return names or None
+
+
+class RestoreScope:
+    """Which part of a backup a restore should touch.
+
+    components are manifest keys ("boards", "repos", ...); projects are
+    project names; ids are entity IDs as the catalog keys them (work item
+    and pipeline IDs, repo names...). Any of them left as None means no
+    restriction. Projects themselves are only filtered by name: a project
+    in scope is always ensured, since everything restored into it needs it.
+    """
+
+    def __init__(self, components: Iterable[str] = None, projects: Iterable[str] = None, ids: Iterable = None):
+        self.components = _names(c.lower().replace(" ", "") for c in components) if components is not None else None
+        unknown = sorted((self.components or set()) - set(RESTORABLE))
+        if unknown:
+            raise ValueError(f"Cannot restore component(s): {', '.join(unknown)}")
+        self.projects = _names(projects)
+        self.ids = _names(ids)
+
+    @property
+    def narrow(self) -> bool:
+        """True when records are filtered individually, not just whole components"""
+        return self.projects is not None or self.ids is not None
+
+    def includes(self, component: str) -> bool:
+        return self.components is None or component in self.components
+
+    def matches(self, record: dict) -> bool:
+        key = entity_key(record)
+        if key is None:
+            return False
+        kind, project, entity_id, _ = key
+        if self.projects is not None and project not in self.projects:
+            return False
+        return self.ids is None or kind == "project" or entity_id in self.ids
+
+    def describe(self) -> dict:
+        return {
+            "components": sorted(self.components) if self.components is not None else None,
+            "projects": sorted(self.projects) if self.projects is not None else None,
+            "ids": sorted(self.ids) if self.ids is not None else None
+        }
@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+
+class ShardWriter:
+    """Appends records to a newline-delimited JSON shard.
+
+    Records are written as they arrive, so memory use does not grow with the
+    size of the component; running record and byte counters are kept for
+    the manifest.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.records = 0
+        self.bytes = 0
+        self._file = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "wb")
+        return self
+
+    def __exit__(self, *exc_details):
+        self.close()
+
+    def write(self, record: dict):
+        line = json.dumps(record, default=str, separators=(",", ":")).encode("utf-8") + b"\n"
+        self._file.write(line)
+        self.records += 1
+        self.bytes += len(line)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self, relative_to=None) -> dict:
+        path = self.path.relative_to(relative_to) if relative_to else self.path
+        return {
+            "shard": path.as_posix(),
+            "records": self.records,
+            "bytes": self.bytes
+        }
+
+
+def read_shard(path):
+    """Yield the records of an NDJSON shard one at a time"""
+    with open(path, "rb") as f:
+        yield from iter_records(f)
+
+
+def iter_records(lines):
+    """Yield records from an iterable of NDJSON lines (bytes or str)"""
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_lines(chunks):
+    """Re-split a stream of byte chunks into lines (the last one may lack its newline)"""
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        yield from lines
+    if pending:
+        yield pending
@@ -1,14 +1,26 @@
 from azure.storage.blob import BlobServiceClient
-from azure.core.exceptions import AzureError
+from azure.core.exceptions import AzureError, ResourceNotFoundError
 from configparser import ConfigParser
+from adobackup.core.transfer import BlobTransfer, DEFAULT_CHUNK_SIZE
+from adobackup.core.chunk_store import ChunkStore, BlobObjectBackend
+from adobackup.core.archive import ChunkReader, SnapshotArchiver
+from adobackup.core.shards import iter_lines
+from adobackup.modules.git_mirror import is_git_mirror, create_bundle, clone_bundle, restore_layout
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import io
 import logging
 import os
 import json
+import shutil
+import subprocess
+import tempfile
+import time
 
 class StorageManager:
     """Manages Azure Blob Storage operations for backups"""
 
-    def __init__(self, connection_string=None):
+    def __init__(self, connection_string=None, chunk_size: int = DEFAULT_CHUNK_SIZE, max_concurrency: int = 4):
         self.logger = logging.getLogger(__name__)
         self.connection_string = (
             connection_string or 
@@ -20,6 +32,7 @@ class StorageManager:
             raise ValueError("Azure Storage connection string not configured")
 
         self.client = BlobServiceClient.from_connection_string(self.connection_string)
+        self.transfer = BlobTransfer(self.client, chunk_size=chunk_size, max_concurrency=max_concurrency)
 
     def _load_from_config(self):
         """Load connection string from config/settings.ini"""
@@ -31,31 +44,138 @@ class StorageManager:
             self.logger.warning(f"Failed to load config: {str(e)}")
             return None
 
-    def upload_file_to_blob(self, file_path: str, blob_name: str = "latest_backup.json", container_name: str = "backups"):
-        """Uploads a file to Azure Blob Storage"""
+    def upload_file_to_blob(self, file_path: str, blob_name: str = "latest_backup.json", container_name: str = "backups",
+                            skip_unchanged: bool = True):
+        """Uploads a file to Azure Blob Storage in parallel blocks, returning transfer stats"""
         try:
-            container_client = self.client.get_container_client(container_name)
-            if not container_client.exists():
-                container_client.create_container()
-
-            with open(file_path, "rb") as f:
-                blob_client = container_client.get_blob_client(blob_name)
-                blob_client.upload_blob(f, overwrite=True)
-
+            stats = self.transfer.upload_file(file_path, blob_name, container_name, skip_unchanged=skip_unchanged)
             self.logger.info(f"Uploaded file to blob {blob_name} in container {container_name}")
-            return True
+            return stats
 
         except AzureError as e:
             self.logger.error(f"Upload failed: {str(e)}")
             raise
 
+    def upload_snapshot(self, snapshot_path, prefix: str = None, container_name: str = "backups", max_workers: int = 4):
+        """Upload a whole snapshot directory under <prefix>/ (default: the snapshot's name)
+
+        Git mirrors are packed with `git bundle` and uploaded as a single
+        <mirror>.bundle blob each instead of as thousands of loose files.
+        """
+        snapshot_path = Path(snapshot_path)
+        prefix = prefix or snapshot_path.name
+        mirrors, files = self._collect_snapshot(snapshot_path)
+        started = time.perf_counter()
+
+        with tempfile.TemporaryDirectory() as bundle_dir, ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(self._upload_mirror, mirror, snapshot_path, prefix, container_name, Path(bundle_dir))
+                for mirror in mirrors
+            ]
+            futures += [
+                pool.submit(self.transfer.upload_file, path, f"{prefix}/{path.relative_to(snapshot_path).as_posix()}", container_name)
+                for path in files
+            ]
+            transfers = []
+            for future in futures:
+                result = future.result()
+                transfers.extend(result if isinstance(result, list) else [result])
+
+        summary = {
+            "prefix": prefix,
+            "blobs": len(transfers),
+            "bytes": sum(t["bytes"] for t in transfers),
+            "skipped": sum(1 for t in transfers if t["skipped"]),
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+        self.logger.info(
+            f"Uploaded snapshot {snapshot_path.name} to {container_name}/{prefix}: "
+            f"{summary['blobs']} blobs, {summary['bytes']} bytes, {summary['skipped']} unchanged"
+        )
+        return summary
+
+    @staticmethod
+    def _collect_snapshot(snapshot_path):
+        """Split a snapshot into git mirror directories and plain files"""
+        mirrors, files = [], []
+        for root, dirs, names in os.walk(snapshot_path):
+            for name in list(dirs):
+                if is_git_mirror(Path(root) / name):
+                    mirrors.append(Path(root) / name)
+                    dirs.remove(name)
+            files.extend(Path(root) / name for name in names)
+        return sorted(mirrors), sorted(files)
+
+    def _upload_mirror(self, mirror, snapshot_path, prefix, container_name, bundle_dir):
+        relative = mirror.relative_to(snapshot_path).as_posix()
+        bundle = bundle_dir / f"{relative.replace('/', '__')}.bundle"
+        try:
+            create_bundle(mirror, bundle)
+        except subprocess.CalledProcessError as e:
+            # Empty repositories cannot be bundled; ship their (tiny) files as-is
+            self.logger.warning(f"Could not bundle {relative}, uploading loose files: {e.stderr.decode().strip()}")
+            return [
+                self.transfer.upload_file(path, f"{prefix}/{path.relative_to(snapshot_path).as_posix()}", container_name)
+                for path in sorted(p for p in mirror.rglob("*") if p.is_file())
+            ]
+        try:
+            return self.transfer.upload_file(bundle, f"{prefix}/{relative}.bundle", container_name)
+        finally:
+            bundle.unlink()
+
+    def download_mirror(self, prefix: str, relative: str, dest, container_name: str = "backups") -> Path:
+        """Rebuild a git mirror stored by upload_snapshot into dest.
+
+        The mirror is cloned from its <relative>.bundle blob, or, for
+        repositories too empty to bundle, assembled from its loose files.
+        """
+        dest = Path(dest)
+        if dest.exists():
+            shutil.rmtree(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory() as bundle_dir:
+            bundle = Path(bundle_dir) / "mirror.bundle"
+            try:
+                self.transfer.download_file(f"{prefix}/{relative}.bundle", container_name, bundle, skip_unchanged=False)
+            except ResourceNotFoundError:
+                pass
+            else:
+                clone_bundle(bundle, dest)
+                self.logger.info(f"Restored mirror {relative} from its bundle")
+                return dest
+
+        loose_prefix = f"{prefix}/{relative}/"
+        names = [blob.name for blob in self.transfer.container(container_name).list_blobs(name_starts_with=loose_prefix)]
+        if not names:
+            raise FileNotFoundError(f"No mirror of {relative} in {container_name}/{prefix}")
+        for name in names:
+            self.transfer.download_file(name, container_name, dest / name[len(loose_prefix):], skip_unchanged=False)
+        return restore_layout(dest)
+
+    def upload_archive(self, snapshot_path, blob_name: str = None, container_name: str = "backups", codec: str = "gzip",
+                       max_workers: int = None):
+        """Compress a snapshot directory and stream it into a single blob, with no local archive"""
+        try:
+            archiver = SnapshotArchiver(codec=codec, max_workers=max_workers)
+            blob_name = blob_name or f"{Path(snapshot_path).name}{archiver.suffix}"
+            blob_client = self.transfer.container(container_name).get_blob_client(blob_name)
+            summary = archiver.archive_to_blob(snapshot_path, blob_client)
+            summary["blob"] = blob_name
+            self.logger.info(f"Uploaded archive {blob_name} ({summary['ratio']}x compression)")
+            return summary
+
+        except AzureError as e:
+            self.logger.error(f"Archive upload failed: {str(e)}")
+            raise
+
+    def chunk_store(self, container_name: str = "backup-store", max_workers: int = 8) -> ChunkStore:
+        """Content-addressed snapshot store kept in its own container"""
+        return ChunkStore(BlobObjectBackend(self.transfer.container(container_name)), max_workers=max_workers)
+
     def upload_backup(self, container_name: str, blob_name: str, data: str):
         """(Legacy-compatible) Upload raw string backup data"""
         try:
-            container_client = self.client.get_container_client(container_name)
-            if not container_client.exists():
-                container_client.create_container()
-
+            container_client = self.transfer.container(container_name)
             blob_client = container_client.get_blob_client(blob_name)
             blob_client.upload_blob(data, overwrite=True)
             self.logger.info(f"Uploaded backup to {blob_name}")
@@ -77,13 +197,9 @@ class StorageManager:
             raise
 
     def download_to_file(self, blob_name: str = "latest_backup.json", container_name: str = "backups", download_path: str = "backups/latest_backup.json"):
-        """Download blob and write it to a local file"""
+        """Download blob in parallel ranges and write it to a local file"""
         try:
-            blob_client = self.client.get_blob_client(container=container_name, blob=blob_name)
-            stream = blob_client.download_blob()
-            os.makedirs(os.path.dirname(download_path), exist_ok=True)
-            with open(download_path, "wb") as f:
-                f.write(stream.readall())
+            self.transfer.download_file(blob_name, container_name, download_path)
             self.logger.info(f"Downloaded blob to local path: {download_path}")
             return download_path
 
@@ -91,6 +207,21 @@ class StorageManager:
             self.logger.error(f"Download to file failed: {str(e)}")
             raise
 
+    def open_blob(self, blob_name: str, container_name: str = "backups"):
+        """A sequential binary stream over a blob as it downloads"""
+        blob_client = self.transfer.container(container_name).get_blob_client(blob_name)
+        return io.BufferedReader(ChunkReader(blob_client.download_blob().chunks()))
+
+    def iter_blob_lines(self, blob_name: str, container_name: str = "backups"):
+        """Yield the lines of a blob as it downloads, without buffering the whole blob"""
+        try:
+            blob_client = self.client.get_blob_client(container=container_name, blob=blob_name)
+            yield from iter_lines(blob_client.download_blob().chunks())
+
+        except AzureError as e:
+            self.logger.error(f"Streaming download failed: {str(e)}")
+            raise
+
     def save_locally(self, results: dict, path: str = "backups/latest_backup.json"):
         """Save dict as a JSON file locally"""
         os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -0,0 +1,80 @@
+import logging
+import threading
+
+from azure.devops.v7_1.work.models import TeamContext
+
+from adobackup.modules.paging import all_projects, paged
+
+KINDS = ("projects", "repos", "pipelines", "builds", "releases", "iterations")
+
+
+class TargetStateIndex:
+    """Name index of what already exists in the restore target.
+
+    Each (kind, project) listing is fetched once, on first use, and kept as
+    a set so existence checks are O(1). Entities created during the restore
+    are added to the index; refresh() drops a listing so the next check
+    reloads it. Lookups that would have been a listing call per entity are
+    counted as API calls saved.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.logger = logging.getLogger(__name__)
+        self._names = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.api_calls = 0
+
+    def _list(self, kind: str, project: str) -> list:
+        clients = self.connection.clients
+        if kind == "projects":
+            return [p.name for p in all_projects(clients.get_core_client())]
+        if kind == "repos":
+            # Not a paged API: one call returns every repository of the project
+            return [r.name for r in clients.get_git_client().get_repositories(project)]
+        if kind == "pipelines":
+            return [p.name for p in paged(self.connection, clients.get_pipelines_client().list_pipelines, project)]
+        if kind == "builds":
+            return [d.name for d in paged(self.connection, clients.get_build_client().get_definitions, project)]
+        if kind == "releases":
+            return [d.name for d in paged(self.connection, clients.get_release_client().get_release_definitions,
+                                          project)]
+        if kind == "iterations":
+            return [i.name for i in clients.get_work_client().get_team_iterations(TeamContext(project=project))]
+        raise ValueError(f"Unknown index kind: {kind}")
+
+    def _entry(self, kind: str, project: str) -> set:
+        key = (kind, project)
+        with self._lock:
+            names = self._names.get(key)
+            if names is None:
+                names = set(self._list(kind, project))
+                self._names[key] = names
+                self.api_calls += 1
+                self.logger.debug(f"Indexed {len(names)} {kind} for {project or 'organization'}")
+            return names
+
+    def exists(self, kind: str, name: str, project: str = None) -> bool:
+        names = self._entry(kind, project)
+        with self._lock:
+            self.lookups += 1
+        return name in names
+
+    def add(self, kind: str, name: str, project: str = None):
+        """Record an entity the restore just created"""
+        self._entry(kind, project).add(name)
+
+    def refresh(self, kind: str = None, project: str = None):
+        """Forget cached listings (all, one kind, or one kind in one project)"""
+        with self._lock:
+            for key in list(self._names):
+                if (kind is None or key[0] == kind) and (project is None or key[1] == project):
+                    del self._names[key]
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "api_calls": self.api_calls,
+            "api_calls_saved": max(self.lookups - self.api_calls, 0)
+        }
@@ -0,0 +1,151 @@
+import base64
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.storage.blob import BlobBlock, ContentSettings
+from adobackup.core.exceptions import StorageError
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def file_md5(path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> bytes:
+    """MD5 digest of a file, read in chunks"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _stats(blob_name, size, started, skipped=False) -> dict:
+    seconds = time.perf_counter() - started
+    return {
+        "blob": blob_name,
+        "bytes": 0 if skipped else size,
+        "seconds": round(seconds, 3),
+        "throughput_mb_s": round(size / seconds / (1024 * 1024), 2) if seconds > 0 and not skipped else 0.0,
+        "skipped": skipped
+    }
+
+
+class BlobTransfer:
+    """Chunked, parallel blob uploads and downloads.
+
+    Uploads are staged as blocks on a thread pool and committed in order;
+    downloads fetch byte ranges in parallel and write them in place. Files
+    whose MD5 already matches the remote Content-MD5 are skipped, and
+    containers known to exist are cached so they are only checked once.
+    Works against any object exposing the BlobServiceClient surface, such
+    as an Azurite endpoint or an in-memory stand-in.
+    """
+
+    def __init__(self, service_client, chunk_size: int = DEFAULT_CHUNK_SIZE, max_concurrency: int = 4):
+        if chunk_size < 1 or max_concurrency < 1:
+            raise ValueError("chunk_size and max_concurrency must be positive.")
+        self.client = service_client
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.logger = logging.getLogger(__name__)
+        self._containers = set()
+        self._lock = threading.Lock()
+
+    def container(self, container_name: str):
+        """Return a container client, creating the container on first use"""
+        container_client = self.client.get_container_client(container_name)
+        with self._lock:
+            if container_name in self._containers:
+                return container_client
+            if not container_client.exists():
+                try:
+                    container_client.create_container()
+                except ResourceExistsError:
+                    pass
+            self._containers.add(container_name)
+        return container_client
+
+    def remote_md5(self, blob_client):
+        try:
+            return blob_client.get_blob_properties().content_settings.content_md5
+        except ResourceNotFoundError:
+            return None
+
+    def upload_file(self, file_path, blob_name: str, container_name: str = "backups", skip_unchanged: bool = True) -> dict:
+        started = time.perf_counter()
+        size = os.path.getsize(file_path)
+        digest = file_md5(file_path, self.chunk_size)
+        blob_client = self.container(container_name).get_blob_client(blob_name)
+
+        if skip_unchanged:
+            remote = self.remote_md5(blob_client)
+            if remote is not None and bytes(remote) == digest:
+                self.logger.info(f"Skipped unchanged blob {blob_name}")
+                return _stats(blob_name, size, started, skipped=True)
+
+        content_settings = ContentSettings(content_md5=bytearray(digest))
+        if size <= self.chunk_size:
+            with open(file_path, "rb") as f:
+                blob_client.upload_blob(f.read(), overwrite=True, content_settings=content_settings)
+        else:
+            block_ids = self._stage_blocks(blob_client, file_path)
+            blob_client.commit_block_list([BlobBlock(block_id=b) for b in block_ids], content_settings=content_settings)
+
+        stats = _stats(blob_name, size, started)
+        self.logger.info(f"Uploaded {blob_name}: {size} bytes at {stats['throughput_mb_s']} MB/s")
+        return stats
+
+    def _stage_blocks(self, blob_client, file_path) -> list:
+        """Stage the file as blocks, keeping at most 2 x max_concurrency chunks in memory"""
+        block_ids = []
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool, open(file_path, "rb") as f:
+            for index, chunk in enumerate(iter(lambda: f.read(self.chunk_size), b"")):
+                block_id = base64.b64encode(f"{index:08d}".encode()).decode()
+                block_ids.append(block_id)
+                in_flight.add(pool.submit(blob_client.stage_block, block_id, chunk, length=len(chunk)))
+                if len(in_flight) >= 2 * self.max_concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            for future in in_flight:
+                future.result()
+        return block_ids
+
+    def download_file(self, blob_name: str, container_name: str, download_path, skip_unchanged: bool = True) -> dict:
+        started = time.perf_counter()
+        blob_client = self.client.get_blob_client(container=container_name, blob=blob_name)
+        properties = blob_client.get_blob_properties()
+        size = properties.size
+        remote = properties.content_settings.content_md5
+
+        if skip_unchanged and remote is not None and os.path.exists(download_path):
+            if os.path.getsize(download_path) == size and file_md5(download_path, self.chunk_size) == bytes(remote):
+                self.logger.info(f"Skipped unchanged download {blob_name}")
+                return _stats(blob_name, size, started, skipped=True)
+
+        os.makedirs(os.path.dirname(os.path.abspath(download_path)), exist_ok=True)
+        write_lock = threading.Lock()
+        with open(download_path, "wb") as f:
+            f.truncate(size)
+
+            def fetch(offset):
+                length = min(self.chunk_size, size - offset)
+                data = blob_client.download_blob(offset=offset, length=length).readall()
+                with write_lock:
+                    f.seek(offset)
+                    f.write(data)
+
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                for future in [pool.submit(fetch, offset) for offset in range(0, size, self.chunk_size)]:
+                    future.result()
+
+        if remote is not None and file_md5(download_path, self.chunk_size) != bytes(remote):
+            raise StorageError(f"MD5 mismatch after downloading {blob_name}")
+
+        stats = _stats(blob_name, size, started)
+        self.logger.info(f"Downloaded {blob_name}: {size} bytes at {stats['throughput_mb_s']} MB/s")
+        return stats
@@ -0,0 +1,545 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+from urllib.parse import quote
+
+import requests
+
+from adobackup.core.backup_reader import batched
+from adobackup.modules.http_client import ThrottledSession
+
+API_VERSION = "7.1"
+BATCH_LIMIT = 200
+
+# Fields the service computes itself and rejects (or ignores) on create
+READ_ONLY_FIELDS = {
+    "System.Id", "System.Rev", "System.Watermark", "System.TeamProject", "System.AreaId",
+    "System.IterationId", "System.NodeName", "System.ChangedDate", "System.ChangedBy",
+    "System.AuthorizedDate", "System.AuthorizedAs", "System.RevisedDate", "System.PersonId",
+    "System.CommentCount", "System.BoardColumn", "System.BoardColumnDone", "System.BoardLane",
+    "System.WorkItemType", "System.Parent", "System.ExternalLinkCount", "System.HyperLinkCount",
+    "System.AttachedFileCount", "System.RelatedLinkCount", "System.RemoteLinkCount",
+}
+READ_ONLY_PREFIXES = ("System.AreaLevel", "System.IterationLevel", "WEF_")
+# Writable fields the service fills in or rewrites itself, so they never match the backup
+UNCOMPARED_FIELDS = {
+    "System.CreatedDate", "System.CreatedBy", "System.History", "System.Reason",
+    "Microsoft.VSTS.Common.StateChangeDate", "Microsoft.VSTS.Common.ActivatedDate",
+    "Microsoft.VSTS.Common.ActivatedBy", "Microsoft.VSTS.Common.ResolvedDate", "Microsoft.VSTS.Common.ResolvedBy",
+    "Microsoft.VSTS.Common.ClosedDate", "Microsoft.VSTS.Common.ClosedBy",
+}
+WORK_ITEM_URL = re.compile(r"/_apis/wit/workItems/(\d+)$", re.IGNORECASE)
+
+
+class WorkItemIdMap:
+    """Persistent source -> target work item ID map.
+
+    The file is an append-only log of [source, target] lines: save() writes
+    only the pairs set since the last save, so each batch costs its own size
+    rather than a rewrite of the whole map. A torn last line is ignored, and
+    a map saved as a single JSON object by earlier versions still loads.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._map = {}
+        self._unsaved = []
+        # Start appending on a fresh line after an old-format map or a torn last line
+        self._separator = ""
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    self._separator = "" if line.endswith("\n") else "\n"
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict):
+                        self._map.update((int(k), v) for k, v in entry.items())
+                    else:
+                        self._map[entry[0]] = entry[1]
+
+    def __contains__(self, source_id) -> bool:
+        return source_id in self._map
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def get(self, source_id):
+        return self._map.get(source_id)
+
+    def set(self, source_id, target_id):
+        with self._lock:
+            self._map[source_id] = target_id
+            self._unsaved.append((source_id, target_id))
+
+    def save(self):
+        with self._lock:
+            if not self._unsaved:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(self._separator + "".join(json.dumps(pair) + "\n" for pair in self._unsaved))
+                f.flush()
+                os.fsync(f.fileno())
+            self._unsaved.clear()
+            self._separator = ""
+
+
+def writable_fields(fields: dict) -> dict:
+    """A work item's fields as a restore writes them: read-only ones dropped, identities as unique names"""
+    writable = {}
+    for name, value in fields.items():
+        if name in READ_ONLY_FIELDS or name.startswith(READ_ONLY_PREFIXES):
+            continue
+        if isinstance(value, dict):
+            # Identity fields come back as objects; the API accepts the unique name
+            value = value.get("uniqueName") or value.get("displayName")
+        writable[name] = value
+    return writable
+
+
+def create_operations(fields: dict) -> list:
+    """JSON patch operations that recreate a work item's writable fields"""
+    return [{"op": "add", "path": f"/fields/{name}", "value": value} for name, value in writable_fields(fields).items()]
+
+
+def normalized(fields: dict, names=None) -> dict:
+    """The writable fields a delta restore compares, optionally only the given names (missing ones as None)"""
+    compared = {name: value for name, value in writable_fields(fields).items() if name not in UNCOMPARED_FIELDS}
+    if names is not None:
+        compared = {name: compared.get(name) for name in names}
+    return compared
+
+
+def fingerprint(fields: dict) -> str:
+    """SHA-256 of normalized fields, independent of field order"""
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+class WorkItemBatchRestorer:
+    """Restores work items through the work item $batch endpoint.
+
+    Pass one creates items in batches of up to 200 on a bounded pool and
+    records each source -> target ID in a persistent map, so an interrupted
+    run resumes where it stopped. Pass two rewires parent/child and other
+    work item links using the map. Failures are collected per item instead
+    of aborting the run.
+
+    plan() and apply() are the delta alternative to restore(): items the
+    target already has are compared first and only the differences are
+    written, so running the same restore again costs reads only.
+    """
+
+    def __init__(self, base_url: str, pat: str, id_map: WorkItemIdMap, batch_size: int = BATCH_LIMIT,
+                 max_workers: int = 4, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.id_map = id_map
+        self.batch_size = min(batch_size, BATCH_LIMIT)
+        self.max_workers = max_workers
+        self.session = session or ThrottledSession(pat=pat)
+        self.auth = ("", pat)
+        self.logger = logging.getLogger(__name__)
+        self.failures = []
+        self._created = set()
+        self._relations_path = self.id_map.path.with_name(self.id_map.path.stem + ".relations.ndjson")
+        self._plan_path = self.id_map.path.with_name(self.id_map.path.stem + ".plan.ndjson")
+
+    def restore(self, work_items: Iterable[dict]) -> dict:
+        created = self._create_all(work_items)
+        linked = self._link_all()
+        summary = {
+            "created": created,
+            "linked": linked,
+            "mapped": len(self.id_map),
+            "failed": len(self.failures),
+            "failures": self.failures
+        }
+        self.logger.info(
+            f"Work item restore: {created} created, {linked} linked, {len(self.failures)} failed"
+        )
+        return summary
+
+    def plan(self, work_items: Iterable[dict]) -> dict:
+        """Compare work items with the target and spool a create/update/skip plan; returns its cost estimate.
+
+        Items already in the ID map are read back from the target, 200 per
+        request, and the normalized writable fields of both sides hashed:
+        equal hashes are skipped, the others get a patch of just the fields
+        that differ. Items never restored, or deleted from the target since,
+        are created. Links the target already has are kept in the plan so
+        apply() only adds missing ones.
+        """
+        counts = {"create": 0, "update": 0, "skip": 0}
+        reads = 0
+        create_ids = set()
+        in_flight = deque()
+        self._plan_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self._plan_path, "w") as plan_file, ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def drain():
+                nonlocal reads
+                batch_reads, entries = in_flight.popleft().result()
+                reads += batch_reads
+                for entry in entries:
+                    counts[entry["action"]] += 1
+                    if entry["action"] == "create":
+                        create_ids.add(entry["id"])
+                    plan_file.write(json.dumps(entry, default=str) + "\n")
+
+            for batch in batched(work_items, self.batch_size):
+                in_flight.append(pool.submit(self._plan_batch, batch))
+                if len(in_flight) >= 2 * self.max_workers:
+                    drain()
+            while in_flight:
+                drain()
+
+        link_items, link_operations = self._count_links(create_ids)
+        api_calls = {
+            "read": reads,
+            "create": -(-counts["create"] // self.batch_size),
+            "update": -(-counts["update"] // self.batch_size),
+            "link": -(-link_items // self.batch_size)
+        }
+        estimate = {**counts, "links": link_operations, "api_calls": api_calls, "total_api_calls": sum(api_calls.values())}
+        self.logger.info(
+            f"Work item plan: {counts['create']} to create, {counts['update']} to update, {counts['skip']} unchanged, "
+            f"{link_operations} links to add; about {estimate['total_api_calls']} API calls"
+        )
+        return estimate
+
+    def apply(self) -> dict:
+        """Execute the plan written by plan(): creates, then field updates, then missing links"""
+        created = self._create_all(self._planned("create"), planned=True)
+        updated = self._update_all(self._planned("update"))
+        with open(self._relations_path, "w") as relations_file:
+            for entry in self._planned():
+                if entry["relations"]:
+                    relations_file.write(json.dumps({
+                        "id": entry["id"], "relations": entry["relations"], "existing": entry.get("existing", [])
+                    }) + "\n")
+        linked = self._link_all()
+        summary = {
+            "created": created,
+            "updated": updated,
+            "skipped": sum(1 for _ in self._planned("skip")),
+            "linked": linked,
+            "mapped": len(self.id_map),
+            "failed": len(self.failures),
+            "failures": self.failures
+        }
+        self.logger.info(
+            f"Work item delta restore: {created} created, {updated} updated, {summary['skipped']} unchanged, "
+            f"{linked} linked, {len(self.failures)} failed"
+        )
+        return summary
+
+    def _planned(self, action: str = None) -> Iterable[dict]:
+        with open(self._plan_path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if action is None or entry["action"] == action:
+                    yield entry
+
+    def _plan_batch(self, batch: list):
+        """(target reads made, plan entries) for one batch of backed-up work items"""
+        mapped = {wi["id"]: self.id_map.get(wi["id"]) for wi in batch if wi["id"] in self.id_map}
+        targets = self._get_targets(list(mapped.values())) if mapped else {}
+        entries = []
+        for wi in batch:
+            entry = {"id": wi["id"], "relations": wi.get("relations") or []}
+            target = targets.get(mapped.get(wi["id"]))
+            if target is None:
+                entries.append({**entry, "action": "create", "project": wi["project"],
+                                "work_item_type": wi.get("work_item_type"), "fields": wi["fields"]})
+                continue
+            source = normalized(wi["fields"])
+            current = normalized(target.get("fields") or {}, names=source)
+            entry.update(target=target["id"], existing=self._existing_links(target))
+            if fingerprint(source) == fingerprint(current):
+                entries.append({**entry, "action": "skip"})
+                continue
+            operations = [
+                {"op": "add", "path": f"/fields/{name}", "value": value} if value is not None
+                else {"op": "remove", "path": f"/fields/{name}"}
+                for name, value in source.items() if current[name] != value
+            ]
+            entries.append({**entry, "action": "update", "operations": operations})
+        return -(-len(mapped) // BATCH_LIMIT), entries
+
+    def _get_targets(self, ids: list) -> dict:
+        """The target's current work items (with relations) by ID, read 200 per request; deleted ones are left out"""
+        targets = {}
+        for chunk in batched(ids, BATCH_LIMIT):
+            response = self.session.get(
+                f"{self.base_url}/_apis/wit/workitems",
+                params={"ids": ",".join(str(i) for i in chunk), "$expand": "Relations", "errorPolicy": "Omit",
+                        "api-version": API_VERSION},
+                auth=self.auth
+            )
+            response.raise_for_status()
+            targets.update((item["id"], item) for item in response.json().get("value", []) if item)
+        return targets
+
+    @staticmethod
+    def _existing_links(target: dict) -> list:
+        """[rel, other target ID] of each work item link the target item already has"""
+        links = []
+        for relation in target.get("relations") or []:
+            match = WORK_ITEM_URL.search(relation.get("url") or "")
+            if match:
+                links.append([relation["rel"], int(match.group(1))])
+        return links
+
+    def _count_links(self, create_ids: set):
+        """(items needing links, link operations) the plan will add once its creates are mapped"""
+        items = operations = 0
+        for entry in self._planned():
+            existing = {tuple(link) for link in entry.get("existing", [])}
+            count = 0
+            for relation, other in self._link_targets(entry["id"], entry["relations"]):
+                target_other = self.id_map.get(other)
+                if target_other is None and other not in create_ids:
+                    continue
+                if target_other is not None and (relation["rel"], target_other) in existing:
+                    continue
+                count += 1
+            items += 1 if count else 0
+            operations += count
+        return items, operations
+
+    def _update_all(self, entries: Iterable[dict]) -> int:
+        updated = 0
+
+        def build(batch):
+            return [
+                {
+                    "method": "PATCH",
+                    "uri": f"/_apis/wit/workitems/{entry['target']}?api-version={API_VERSION}",
+                    "headers": {"Content-Type": "application/json-patch+json"},
+                    "body": entry["operations"]
+                }
+                for entry in batch
+            ]
+
+        def handle(batch, responses):
+            nonlocal updated
+            for entry, response in zip(batch, responses):
+                if response.get("code") == 200:
+                    updated += 1
+                else:
+                    self.failures.append({
+                        "id": entry["id"], "code": response.get("code"),
+                        "error": f"update failed: {self._message(self._body(response))}"
+                    })
+
+        self._run_batches(batched(entries, self.batch_size), build, handle)
+        return updated
+
+    def _send_batch(self, requests_body: list) -> list:
+        response = self.session.post(
+            f"{self.base_url}/_apis/wit/$batch?api-version={API_VERSION}",
+            json=requests_body,
+            auth=self.auth,
+            headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+        return response.json().get("value", [])
+
+    def _run_batches(self, batches, build, handle):
+        """Send batches concurrently, handing each (batch, responses or error) back in order"""
+        in_flight = deque()
+
+        def drain():
+            batch, future = in_flight.popleft()
+            try:
+                responses = future.result()
+            except Exception as e:
+                for item in batch:
+                    self.failures.append({"id": item["id"], "error": str(e)})
+                return
+            handle(batch, responses)
+            self.id_map.save()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch in batches:
+                in_flight.append((batch, pool.submit(self._send_batch, build(batch))))
+                if len(in_flight) >= 2 * self.max_workers:
+                    drain()
+            while in_flight:
+                drain()
+
+    def _create_all(self, work_items: Iterable[dict], planned: bool = False) -> int:
+        """Create work items not in the ID map, spooling their links for pass two.
+
+        planned items come from a delta plan: each one is created, mapped or
+        not (its target was deleted), and apply() spools the links itself.
+        """
+        created = 0
+        self._relations_path.parent.mkdir(parents=True, exist_ok=True)
+        relations_file = open(self._relations_path, "w") if not planned else None
+
+        def pending():
+            for wi in work_items:
+                if planned:
+                    yield wi
+                    continue
+                if wi.get("relations"):
+                    relations_file.write(json.dumps({"id": wi["id"], "relations": wi["relations"]}) + "\n")
+                if wi["id"] not in self.id_map:
+                    yield wi
+
+        def build(batch):
+            return [
+                {
+                    "method": "PATCH",
+                    "uri": f"/{quote(wi['project'])}/_apis/wit/workitems/"
+                           f"${quote(wi.get('work_item_type') or wi['fields'].get('System.WorkItemType'))}"
+                           f"?api-version={API_VERSION}",
+                    "headers": {"Content-Type": "application/json-patch+json"},
+                    "body": create_operations(wi["fields"])
+                }
+                for wi in batch
+            ]
+
+        def handle(batch, responses):
+            nonlocal created
+            for wi, response in zip(batch, responses):
+                body = self._body(response)
+                if response.get("code") == 200 and "id" in body:
+                    self.id_map.set(wi["id"], body["id"])
+                    self._created.add(wi["id"])
+                    created += 1
+                else:
+                    self.failures.append({"id": wi["id"], "code": response.get("code"), "error": self._message(body)})
+
+        try:
+            self._run_batches(batched(pending(), self.batch_size), build, handle)
+        finally:
+            if relations_file is not None:
+                relations_file.close()
+        return created
+
+    def _link_all(self) -> int:
+        """Second pass: re-create work item links between restored items"""
+        linked = 0
+
+        def updates():
+            with open(self._relations_path) as f:
+                for entries in batched(map(json.loads, f), self.batch_size):
+                    yield from self._link_updates(entries)
+
+        def build(batch):
+            return [
+                {
+                    "method": "PATCH",
+                    "uri": f"/_apis/wit/workitems/{update['target']}?api-version={API_VERSION}",
+                    "headers": {"Content-Type": "application/json-patch+json"},
+                    "body": update["operations"]
+                }
+                for update in batch
+            ]
+
+        def handle(batch, responses):
+            nonlocal linked
+            for update, response in zip(batch, responses):
+                if response.get("code") == 200:
+                    linked += len(update["operations"])
+                else:
+                    self.failures.append({
+                        "id": update["id"], "code": response.get("code"),
+                        "error": f"linking failed: {self._message(self._body(response))}"
+                    })
+
+        if self._relations_path.exists():
+            self._run_batches(batched(updates(), self.batch_size), build, handle)
+        return linked
+
+    def _link_updates(self, entries: list):
+        """Link patches for a batch of spooled relations, without the links the target already has.
+
+        Delta plans record each item's existing links. Otherwise items this
+        run created have none yet, and the others (left by an earlier run)
+        are read back from the target before anything is added to them.
+        """
+        unread = {
+            self.id_map.get(entry["id"]) for entry in entries
+            if "existing" not in entry and entry["id"] not in self._created and entry["id"] in self.id_map
+            and self._link_operations(entry["id"], entry["relations"])
+        }
+        try:
+            targets = self._get_targets(sorted(unread)) if unread else {}
+        except requests.RequestException as e:
+            for entry in entries:
+                if self.id_map.get(entry["id"]) in unread:
+                    self.failures.append({"id": entry["id"], "error": f"linking failed: {str(e)}"})
+            return
+        for entry in entries:
+            target = self.id_map.get(entry["id"])
+            if target is None or target in unread and target not in targets:
+                # Not restored, or deleted from the target since
+                continue
+            existing = entry.get("existing")
+            if existing is None:
+                existing = self._existing_links(targets[target]) if target in targets else []
+            operations = self._link_operations(entry["id"], entry["relations"], {tuple(link) for link in existing})
+            if operations:
+                yield {"id": entry["id"], "target": target, "operations": operations}
+
+    @staticmethod
+    def _link_targets(source_id: int, relations: list):
+        """(relation, other source ID) of the work item links this end is responsible for adding.
+
+        Each link is stored on both ends, so only one side adds it: the
+        reverse end of directional links and the lower ID of symmetric ones.
+        """
+        for relation in relations:
+            match = WORK_ITEM_URL.search(relation.get("url") or "")
+            if not match:
+                continue
+            other = int(match.group(1))
+            rel = relation["rel"]
+            if rel.endswith("-Forward") or (not rel.endswith("-Reverse") and other < source_id):
+                continue
+            yield relation, other
+
+    def _link_operations(self, source_id: int, relations: list, existing=frozenset()) -> list:
+        """Patch operations for links whose other end was restored too and the target lacks"""
+        operations = []
+        for relation, other in self._link_targets(source_id, relations):
+            rel = relation["rel"]
+            target_other = self.id_map.get(other)
+            if target_other is None or (rel, target_other) in existing:
+                continue
+            operations.append({
+                "op": "add",
+                "path": "/relations/-",
+                "value": {
+                    "rel": rel,
+                    "url": f"{self.base_url}/_apis/wit/workItems/{target_other}",
+                    "attributes": {k: v for k, v in (relation.get("attributes") or {}).items() if k == "comment"}
+                }
+            })
+        return operations
+
+    @staticmethod
+    def _body(response: dict) -> dict:
+        body = response.get("body")
+        if isinstance(body, str):
+            try:
+                return json.loads(body)
+            except ValueError:
+                return {"message": body}
+        return body or {}
+
+    @staticmethod
+    def _message(body: dict) -> str:
+        return body.get("message", "") if isinstance(body, dict) else str(body)
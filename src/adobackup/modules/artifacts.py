@@ -7,6 +7,10 @@ class ArtifactsModule:
         self.connection = connection
     
     def backup(self, backup_path):
+        return list(self.stream(backup_path))
+
+    def stream(self, backup_path):
+        """Yield one record per universal package"""
         artifacts_path = backup_path / "artifacts"
         artifacts_path.mkdir(exist_ok=True)
         
@@ -20,7 +24,11 @@ class ArtifactsModule:
             artifacts = json.loads(result.stdout)
             with open(artifacts_path / "packages.json", "w") as f:
                 json.dump(artifacts, f)
-            
-            return artifacts
         except Exception as e:
-            return {"error": str(e)}
\ No newline at end of file
+            yield {"type": "artifact", "error": str(e)}
+            return
+
+        if isinstance(artifacts, dict):
+            artifacts = [artifacts]
+        for artifact in artifacts:
+            yield {"type": "artifact", **artifact}
\ No newline at end of file
@@ -1,4 +1,11 @@
+import heapq
+import json
 import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import List, Dict
 from azure.devops.connection import Connection
 from azure.core.exceptions import AzureError
@@ -7,91 +14,345 @@ from azure.devops.v7_1.work_item_tracking import WorkItemTrackingClient
 from azure.devops.v7_1.work import WorkClient
 from azure.devops.v7_1.core import CoreClient
 from azure.devops.v7_1.work.models import TeamContext
+from adobackup.modules.paging import all_projects
+from adobackup.modules.rate_limit import submit
+from adobackup.modules.snapshots import find_previous
+
+WIQL_LIMIT = 20000
+WORK_ITEM_BATCH = 200
 
 class BoardsModule:
     """Handles Azure DevOps Boards operations and full backup."""
 
-    def __init__(self, connection: Connection):
+    def __init__(self, connection: Connection, incremental: bool = False, max_workers: int = 4,
+                 project_workers: int = 4, journal=None):
         self.logger = logging.getLogger(__name__)
         self.connection = connection
+        self.incremental = incremental
+        self.journal = journal
+        self.max_workers = max_workers
+        self.project_workers = project_workers
         self.core_client: CoreClient = connection.clients.get_core_client()
         self.wit_client: WorkItemTrackingClient = connection.clients.get_work_item_tracking_client()
         self.work_client: WorkClient = connection.clients.get_work_client()
         self.logger.info("BoardsModule initialized.")
 
     def backup(self, backup_path):
+        """Collect the record stream into the projects/iterations/work_items dict"""
         data = {
             "projects": [],
             "iterations": {},
             "work_items": []
         }
+        for record in self.stream(backup_path):
+            kind = record.pop("type")
+            if kind == "project":
+                data["projects"].append(record)
+            elif kind == "iteration":
+                data["iterations"].setdefault(record.pop("project"), []).append(record)
+            elif kind == "work_item":
+                data["work_items"].append(record)
+        return data
+
+    def stream(self, backup_path):
+        """Yield project, iteration and work item records, project by project in listing order.
+
+        Up to project_workers projects are fetched concurrently (teams,
+        iterations, the WIQL query and the work item batches); their records
+        are still emitted in the order get_projects returned them, each
+        project record carrying the seconds spent on that project.
+        """
+        boards_path = backup_path / "boards"
+        boards_path.mkdir(exist_ok=True)
+        previous = self._load_previous(backup_path)
+        state = {}
 
         try:
-            projects = self.core_client.get_projects()
+            projects = all_projects(self.core_client)
         except Exception as e:
             self.logger.error(f"Failed to fetch projects: {str(e)}")
-            return data
-
-        for project in projects:
-            data["projects"].append({"id": project.id, "name": project.name})
-
-            # Fetch all iterations
-            try:
-                # Ensure project has teams
-                teams = self.core_client.get_teams(project.id)
-                if teams:
-                    default_team = teams[0].name
-                    team_context = TeamContext(project=project.name, team=default_team)
-
-                    iterations = self.work_client.get_team_iterations(team_context)
-                    self.logger.info(f"✅ Fetched {len(iterations)} iterations for {project.name}")
-                    data["iterations"][project.name] = [
-                        {
-                            "id": it.id,
-                            "name": it.name,
-                            "path": it.path,
-                            "start": str(it.attributes.start_date) if it.attributes.start_date else None,
-                            "end": str(it.attributes.finish_date) if it.attributes.finish_date else None
-                        }
-                        for it in iterations
-                    ]
-                else:
-                    self.logger.warning(f"⚠️ No teams found for project {project.name}")
-            except Exception as e:
-                self.logger.warning(f"⚠️ Iterations failed for {project.name}: {str(e)}")
-
-            # Fetch all work items
-            try:
-                wiql = Wiql(query="""
-                    SELECT [System.Id] 
-                    FROM WorkItems 
-                    WHERE [System.WorkItemType] <> '' 
-                    AND [System.State] <> ''
-                    ORDER BY [System.ChangedDate] DESC
-                """)
-                result = self.wit_client.query_by_wiql(wiql, project=project.name)
-
-                if not result.work_items:
-                    self.logger.warning(f"⚠️ No work items found in {project.name}")
-                else:
-                    self.logger.info(f"✅ Found {len(result.work_items)} work items in {project.name}")
-
-                ids = [wi.id for wi in result.work_items]
-                self.logger.info(f"📋 Work Item IDs: {ids}")
-
-                if ids:
-                    for i in range(0, len(ids), 200):
-                        batch = ids[i:i + 200]
-                        items = self.wit_client.get_work_items(
-                            batch, fields=["System.Id", "System.Title", "System.State"]
-                        )
-                        for item in items:
-                            data["work_items"].append({
-                                "id": item.id,
-                                "fields": item.fields,
-                                "project": project.name
-                            })
-            except Exception as e:
-                self.logger.warning(f"⚠️ Work items failed for {project.name}: {str(e)}")
-
-        return data
\ No newline at end of file
+            return
+
+        for project, iterations, items_path, elapsed in self._backup_projects(projects, boards_path, previous, state):
+            yield {"type": "project", "id": project.id, "name": project.name, "seconds": round(elapsed, 3)}
+            yield from iterations
+            if items_path is not None:
+                for wi in self._read_items(boards_path, project.id):
+                    yield {"type": "work_item", **wi}
+
+        with open(boards_path / "state.json", "w") as f:
+            json.dump({p.id: state[p.id] for p in projects if p.id in state}, f, indent=2)
+
+    def _backup_projects(self, projects, boards_path, previous, state):
+        """Yield each project's (project, iteration records, work items path, seconds) in order, fetching concurrently"""
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.project_workers) as pool:
+            for project in projects:
+                in_flight.append(submit(pool, self._backup_project, project, boards_path, previous, state))
+                if len(in_flight) >= 2 * self.project_workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _backup_project(self, project, boards_path, previous, state):
+        started = time.perf_counter()
+        iterations = []
+        try:
+            # Ensure project has teams
+            teams = self.core_client.get_teams(project.id)
+            if teams:
+                default_team = teams[0].name
+                team_context = TeamContext(project=project.name, team=default_team)
+
+                iterations = self.work_client.get_team_iterations(team_context)
+                self.logger.info(f"✅ Fetched {len(iterations)} iterations for {project.name}")
+            else:
+                self.logger.warning(f"⚠️ No teams found for project {project.name}")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Iterations failed for {project.name}: {str(e)}")
+
+        records = [
+            {
+                "type": "iteration",
+                "project": project.name,
+                "id": it.id,
+                "name": it.name,
+                "path": it.path,
+                "start": str(it.attributes.start_date) if it.attributes.start_date else None,
+                "end": str(it.attributes.finish_date) if it.attributes.finish_date else None
+            }
+            for it in iterations
+        ]
+
+        # Fetch work items (only those changed since the watermark when incremental)
+        try:
+            items_path = self._backup_work_items(project, boards_path, previous, state)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Work items failed for {project.name}: {str(e)}")
+            items_path = self._carry_forward(project, boards_path, previous, state)
+
+        elapsed = time.perf_counter() - started
+        self.logger.info(f"⏱️ {project.name} done in {elapsed:.1f}s")
+        return project, records, items_path, elapsed
+
+    def _load_previous(self, backup_path):
+        """Return (snapshot boards dir, state) of the last run that wrote a watermark"""
+        if not self.incremental:
+            return None, {}
+        state_path = find_previous(backup_path, "boards/state.json")
+        if state_path is None:
+            return None, {}
+        with open(state_path) as f:
+            return state_path.parent, json.load(f)
+
+    def _backup_work_items(self, project, boards_path, previous, state):
+        """Fetch a project's work items into boards/work_items/<project id>.ndjson and return its path"""
+        items_dir = boards_path / "work_items"
+        items_dir.mkdir(exist_ok=True)
+        path = items_dir / f"{project.id}.ndjson"
+        if self.journal is not None and self.journal.done(project.id) and path.exists():
+            state[project.id] = self.journal.get(project.id)
+            self.logger.info(f"⏭️ Work items for {project.name} already complete")
+            return path
+
+        previous_dir, previous_state = previous
+        watermark = previous_state.get(project.id, {}).get("watermark")
+        started = time.perf_counter()
+
+        ids, run_started = self._work_item_ids(project, items_dir, watermark)
+        if not ids:
+            self.logger.info(f"No {'changed ' if watermark else ''}work items in {project.name}")
+        else:
+            self.logger.info(f"✅ Found {len(ids)} {'changed ' if watermark else ''}work items in {project.name}")
+        self.logger.debug(f"Work item IDs for {project.name}: {ids}")
+
+        spool, count = self._fetch_to_spool(ids, project, items_dir)
+        removed = []
+        if watermark:
+            deleted = {ref.id for ref in self.wit_client.get_deleted_work_item_shallow_references(project.id) or []}
+            changed = set(ids)
+
+            def carried():
+                for wi in self._read_items(previous_dir, project.id):
+                    if wi["id"] in deleted:
+                        removed.append(wi["id"])
+                    elif wi["id"] not in changed:
+                        yield wi
+
+            fetched = (wi for wi in self._read_ndjson(spool) if wi["id"] not in deleted)
+            items = heapq.merge(carried(), fetched, key=lambda wi: wi["id"])
+            path, count = self._write_items(boards_path, project.id, items)
+            spool.unlink()
+        else:
+            os.replace(spool, path)
+
+        elapsed = time.perf_counter() - started
+        state[project.id] = {
+            "name": project.name,
+            "watermark": run_started,
+            "count": count,
+            "changed": len(ids),
+            "deleted": len(removed),
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(len(ids) / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        if self.journal is not None:
+            self.journal.record(project.id, state[project.id])
+            (items_dir / f"{project.id}.ids.json").unlink(missing_ok=True)
+        self.logger.info(
+            f"✅ {project.name}: fetched {len(ids)} work items in {elapsed:.1f}s "
+            f"({state[project.id]['items_per_second']}/s), {len(removed)} deleted, {count} in snapshot"
+        )
+        return path
+
+    def _work_item_ids(self, project, items_dir, watermark):
+        """IDs to fetch and the run start time; a resumed run reuses the interrupted run's list"""
+        ids_path = items_dir / f"{project.id}.ids.json"
+        checkpoint = self.journal.get(f"{project.id}/ids") if self.journal is not None else None
+        if checkpoint is not None and ids_path.exists():
+            with open(ids_path) as f:
+                return json.load(f), checkpoint["run_started"]
+
+        run_started = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        ids = self._query_ids(project, watermark)
+        if self.journal is not None:
+            with open(ids_path, "w") as f:
+                json.dump(ids, f)
+            self.journal.record(f"{project.id}/ids", {"run_started": run_started, "count": len(ids)})
+        return ids, run_started
+
+    def _fetch_to_spool(self, ids, project, items_dir):
+        """Fetch work items into <project id>.fetched.ndjson in ID order, checkpointing every batch.
+
+        A resumed run truncates the spool to the last checkpointed batch and
+        fetches only the batches after it. Returns (spool path, item count).
+        """
+        spool = items_dir / f"{project.id}.fetched.ndjson"
+        unit = f"{project.id}/fetched"
+        progress = {"batches": 0, "offset": 0, "count": 0}
+        if self.journal is not None and spool.exists():
+            checkpoint = self.journal.get(unit)
+            if checkpoint is not None and spool.stat().st_size >= checkpoint["offset"]:
+                progress = checkpoint
+                self.logger.info(f"Resuming {project.name} work items after batch {progress['batches']}")
+
+        batches = [ids[i:i + WORK_ITEM_BATCH] for i in range(0, len(ids), WORK_ITEM_BATCH)]
+        count = progress["count"]
+        with open(spool, "r+b" if progress["offset"] else "wb") as f:
+            f.seek(progress["offset"])
+            f.truncate()
+            for index, items in enumerate(self._fetch_batches(batches[progress["batches"]:], project.name),
+                                          start=progress["batches"] + 1):
+                f.write(b"".join((json.dumps(wi, default=str) + "\n").encode() for wi in items))
+                count += len(items)
+                if self.journal is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self.journal.record(unit, {"batches": index, "offset": f.tell(), "count": count})
+        return spool, count
+
+    def _query_ids(self, project, watermark=None):
+        """All matching work item IDs in ascending order, paged by ID range past the WIQL result cap"""
+        team_context = TeamContext(project=project.name)
+        ids = []
+        last_id = 0
+        while True:
+            query = f"""
+                SELECT [System.Id]
+                FROM WorkItems
+                WHERE [System.TeamProject] = @project
+                AND [System.WorkItemType] <> ''
+                AND [System.State] <> ''
+                AND [System.Id] > {last_id}
+            """
+            if watermark:
+                query += f"AND [System.ChangedDate] >= '{watermark}'\n"
+            query += "ORDER BY [System.Id] ASC"
+
+            result = self.wit_client.query_by_wiql(
+                Wiql(query=query), team_context=team_context, time_precision=True, top=WIQL_LIMIT
+            )
+            page = [wi.id for wi in result.work_items or []]
+            ids.extend(page)
+            if len(page) < WIQL_LIMIT:
+                return ids
+            last_id = page[-1]
+
+    def _fetch_batches(self, batches, project_name):
+        """Yield each batch's full work items (all fields and relations) in order, fetching concurrently"""
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch in batches:
+                in_flight.append(submit(pool, self._fetch_batch, batch, project_name))
+                if len(in_flight) >= 2 * self.max_workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _fetch_batch(self, batch, project_name):
+        fetched = self.wit_client.get_work_items(batch, expand="All", error_policy="Omit")
+        items = [
+            {
+                "id": item.id,
+                "rev": item.rev,
+                "work_item_type": (item.fields or {}).get("System.WorkItemType"),
+                "fields": item.fields,
+                "relations": [
+                    {"rel": r.rel, "url": r.url, "attributes": r.attributes}
+                    for r in item.relations or []
+                ],
+                "project": project_name
+            }
+            for item in fetched if item is not None
+        ]
+        return sorted(items, key=lambda wi: wi["id"])
+
+    def _carry_forward(self, project, boards_path, previous, state):
+        """Keep the previous snapshot and watermark for a project whose fetch failed"""
+        previous_dir, previous_state = previous
+        if project.id not in previous_state:
+            return None
+        items_path, _ = self._write_items(boards_path, project.id, self._read_items(previous_dir, project.id))
+        state[project.id] = previous_state[project.id]
+        return items_path
+
+    @staticmethod
+    def _read_ndjson(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @classmethod
+    def _read_items(cls, boards_dir, project_id):
+        """Yield a snapshot's work items for a project (NDJSON, or the older JSON list)"""
+        if boards_dir is None:
+            return
+        path = boards_dir / "work_items" / f"{project_id}.ndjson"
+        if path.exists():
+            yield from cls._read_ndjson(path)
+            return
+        legacy = boards_dir / "work_items" / f"{project_id}.json"
+        if legacy.exists():
+            with open(legacy) as f:
+                yield from json.load(f)
+
+    @staticmethod
+    def _write_items(boards_path, project_id, work_items):
+        """Stream work items to <project id>.ndjson; the file only appears once complete"""
+        items_dir = boards_path / "work_items"
+        items_dir.mkdir(exist_ok=True)
+        path = items_dir / f"{project_id}.ndjson"
+        partial = items_dir / f"{project_id}.ndjson.partial"
+        count = 0
+        try:
+            with open(partial, "w") as f:
+                for wi in work_items:
+                    f.write(json.dumps(wi, default=str) + "\n")
+                    count += 1
+            os.replace(partial, path)
+        except Exception:
+            if partial.exists():
+                partial.unlink()
+            raise
+        return path, count
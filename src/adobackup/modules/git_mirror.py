@@ -0,0 +1,210 @@
+import logging
+import os
+import random
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from adobackup.modules.rate_limit import submit
+
+
+def directory_size(path) -> int:
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def read_refs(output: str) -> dict:
+    """Parse `<sha> <ref>` lines (ls-remote / for-each-ref) into {ref: sha}"""
+    refs = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) != 2:
+            continue
+        sha, ref = parts
+        if ref == "HEAD" or ref.endswith("^{}"):
+            continue
+        refs[ref] = sha
+    return refs
+
+
+class MirrorScheduler:
+    """Runs `git clone --mirror` jobs on a bounded thread pool.
+
+    Each job is a dict with at least "name", "url" and "dest" keys and an
+    optional "size" hint; the biggest jobs are started first so a single
+    large repository does not end up running alone at the tail of the run.
+    Results are returned in the order the jobs were given.
+
+    A job may also carry a "previous" mirror from an earlier snapshot. It is
+    then cloned locally (objects are hardlinked, so they cost no extra disk)
+    and only fetched from the remote when `git ls-remote` reports refs that
+    differ from the previous mirror.
+
+    With a limiter, every git process that talks to the remote holds one of
+    its slots, so clones share the org-wide budget with the API calls. A
+    remote command answered with HTTP 429 gives its slot back, backs off and
+    is retried up to max_retries times before the job is failed.
+
+    With a journal, jobs also need a "unit" key. A "<unit>:started" checkpoint
+    is recorded before each clone, and an existing dest is only cleared when
+    that checkpoint says this unit left it behind; any other existing dest
+    fails the job instead of being deleted.
+    """
+
+    def __init__(self, max_workers: int = 4, limiter=None, max_retries: int = 3, backoff: float = 2.0,
+                 max_backoff: float = 60.0, sleep=time.sleep):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        self.max_workers = max_workers
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, jobs: list, on_result=None, journal=None) -> list:
+        """Mirror every job; on_result(job, result) is called as each one finishes"""
+        order = sorted(range(len(jobs)), key=lambda i: jobs[i].get("size") or 0, reverse=True)
+        results = [None] * len(jobs)
+
+        def clone(job):
+            result = self._clone(job, journal)
+            if on_result is not None:
+                on_result(job, result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {i: submit(pool, clone, jobs[i]) for i in order}
+            for i, future in futures.items():
+                results[i] = future.result()
+
+        return results
+
+    def _clone(self, job: dict, journal=None) -> dict:
+        dest = Path(job["dest"])
+        started = time.perf_counter()
+        marker = f"{job['unit']}:started" if journal is not None else None
+        if dest.exists():
+            if marker is None or (journal.get(marker) or {}).get("dest") != str(dest):
+                self.logger.warning(f"Not mirroring {job['name']}: {dest} already exists")
+                return {"status": "failed", "duration_seconds": 0.0, "error": f"{dest} already exists"}
+            # Left behind by an interrupted run of this unit; git refuses to clone into it
+            shutil.rmtree(dest)
+        if marker is not None:
+            journal.record(marker, {"dest": str(dest)})
+        try:
+            if job.get("previous"):
+                mode = self._update_from_previous(job, dest)
+            else:
+                self._git("clone", "--mirror", job["url"], str(dest), remote=True, dest=dest)
+                mode = "clone"
+            duration = time.perf_counter() - started
+            size = directory_size(dest)
+            self.logger.info(f"Mirrored {job['name']} ({mode}, {size} bytes) in {duration:.1f}s")
+            return {
+                "status": "success",
+                "mode": mode,
+                "duration_seconds": round(duration, 3),
+                "bytes": size
+            }
+        except subprocess.CalledProcessError as e:
+            self.logger.warning(f"Mirror of {job['name']} failed")
+            return {
+                "status": "failed",
+                "duration_seconds": round(time.perf_counter() - started, 3),
+                "error": e.stderr.decode() if e.stderr else str(e)
+            }
+
+    def _update_from_previous(self, job: dict, dest: Path) -> str:
+        """Seed dest from the previous mirror and fetch only if refs moved"""
+        previous = str(job["previous"])
+        remote_refs = read_refs(self._git("ls-remote", job["url"], remote=True))
+        stored_refs = read_refs(self._git(
+            "-C", previous, "for-each-ref", "--format=%(objectname) %(refname)"
+        ))
+
+        self._git("clone", "--mirror", previous, str(dest))
+        self._git("-C", str(dest), "remote", "set-url", "origin", job["url"])
+
+        if remote_refs == stored_refs:
+            return "unchanged"
+
+        self._git("-C", str(dest), "fetch", "--prune", "origin", remote=True)
+        return "fetch"
+
+    def _git(self, *args, remote: bool = False, dest: Path = None) -> str:
+        return run_git(*args, limiter=self.limiter if remote else None, remote=remote, dest=dest,
+                       max_retries=self.max_retries, backoff=self.backoff, max_backoff=self.max_backoff,
+                       sleep=self._sleep)
+
+
+def run_git(*args, limiter=None, remote: bool = False, cwd=None, dest: Path = None, max_retries: int = 3,
+            backoff: float = 2.0, max_backoff: float = 60.0, sleep=time.sleep) -> str:
+    """Run git and return its stdout.
+
+    A remote command holds one of the limiter's git slots while it runs. If
+    the server answers HTTP 429 the slot is given back, the limiter told it
+    was throttled (which halves its budget, so the retry also waits for a
+    smaller share), and the command retried after a capped exponential
+    backoff; a partial dest left by a clone is cleared first.
+    """
+    for attempt in range(max_retries + 1):
+        slot = limiter.git_slot() if remote and limiter else nullcontext(lambda: None)
+        with slot as throttled:
+            try:
+                return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True).stdout.decode()
+            except subprocess.CalledProcessError as e:
+                if not (remote and e.stderr and b"429" in e.stderr):
+                    raise
+                throttled()
+                if attempt == max_retries:
+                    raise
+        delay = min(backoff * (2 ** attempt), max_backoff) * random.uniform(0.5, 1.0)
+        logging.getLogger(__name__).info(f"git {args[0]} throttled, retrying in {delay:.1f}s")
+        sleep(delay)
+        if dest is not None and Path(dest).exists():
+            shutil.rmtree(dest)
+
+
+def is_git_mirror(path) -> bool:
+    """True if path looks like a bare repository created by `git clone --mirror`"""
+    path = Path(path)
+    return path.is_dir() and (path / "HEAD").is_file() and (path / "objects").is_dir()
+
+
+def create_bundle(mirror_path, bundle_path) -> Path:
+    """Pack every ref of a mirror into a single `git bundle` file"""
+    subprocess.run([
+        "git", "-C", str(mirror_path), "bundle", "create",
+        str(Path(bundle_path).resolve()), "--all"
+    ], check=True, capture_output=True)
+    return Path(bundle_path)
+
+
+def clone_bundle(bundle_path, mirror_path) -> Path:
+    """Recreate a bare mirror from a bundle written by create_bundle"""
+    subprocess.run([
+        "git", "clone", "-q", "--mirror", str(Path(bundle_path).resolve()), str(mirror_path)
+    ], check=True, capture_output=True)
+    return Path(mirror_path)
+
+
+def restore_layout(mirror_path) -> Path:
+    """Recreate the directories git needs in a mirror rebuilt file by file (empty ones are never stored)"""
+    mirror_path = Path(mirror_path)
+    if not (mirror_path / "HEAD").is_file():
+        raise FileNotFoundError(f"No git mirror at {mirror_path}")
+    for directory in ("objects", "refs"):
+        (mirror_path / directory).mkdir(exist_ok=True)
+    return mirror_path
@@ -0,0 +1,251 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from azure.devops.connection import Connection
+from msrest.authentication import BasicAuthentication
+
+from adobackup.modules.rate_limit import AdaptiveLimiter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# The only statuses that promise the request was not applied, so safe to resend for any method
+REJECTED_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _route(url: str) -> str:
+    """Coarse endpoint key for latency tracking: the path below _apis, without IDs"""
+    path = urlsplit(url).path
+    parts = path.split("/_apis/", 1)[-1].split("/")
+    return "/".join(p for p in parts[:3] if p and not p.isdigit())
+
+
+def _retry_after(value) -> float:
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ThrottledSession(requests.Session):
+    """Pooled, keep-alive session that retries with throttling-aware backoff.
+
+    Retryable responses (429 and 5xx) wait for Retry-After when the service
+    sends it, or until X-RateLimit-Reset once X-RateLimit-Remaining hits 0,
+    and fall back to capped exponential backoff with jitter. A Retry-After
+    on a successful response pauses every thread sharing the session before
+    its next request. Non-idempotent methods (POST, PATCH) are only resent
+    on 429/503 or a throttling hint, since after a 500/502/504 or a dropped
+    connection the service may already have applied them. One session is
+    meant to be shared by all threads of a run.
+    """
+
+    def __init__(self, pat: str = None, pool_size: int = 32, max_retries: int = 5,
+                 backoff: float = 1.0, max_backoff: float = 60.0, sleep=time.sleep, limiter=None, metrics=None):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        if pat:
+            self.auth = ("", pat)
+        self.limiter = limiter
+        self.metrics = metrics
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self._local = threading.local()
+        self.logger = logging.getLogger(__name__)
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "throttled_seconds": 0.0, "errors": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def continuation_token(self):
+        """X-MS-ContinuationToken of the last response this thread received (the SDK drops it)"""
+        return getattr(self._local, "continuation_token", None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        return stats
+
+    def _wait_for_pause(self):
+        """Sleep out a shared throttling pause; the only place client-side throttled time is counted"""
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            self._count("throttled_seconds", delay)
+            self._sleep(delay)
+
+    def _pause(self, seconds: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _throttle_delay(self, response) -> float:
+        """Delay the service asked for, or None when it gave no hint"""
+        headers = response.headers
+        delay = _retry_after(headers.get("Retry-After"))
+        if delay is not None:
+            return delay
+        if headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+            try:
+                return max(float(headers["X-RateLimit-Reset"]) - time.time(), 0.0)
+            except ValueError:
+                return None
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff * (2 ** attempt), self.max_backoff) * random.uniform(0.5, 1.0)
+
+    def _send(self, method, url, *args, **kwargs):
+        """One attempt, gated by the limiter and recorded in the metrics when present"""
+        route = _route(url)
+        component = self.limiter.acquire() if self.limiter is not None else None
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            if self.metrics is not None:
+                self.metrics.observe_request(method, route, None, time.perf_counter() - started)
+            if self.limiter is not None:
+                self.limiter.release(component)
+            raise
+        latency = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.observe_request(method, route, response.status_code, latency)
+        if self.limiter is not None:
+            self.limiter.release(
+                component,
+                latency=latency,
+                throttled=self._is_throttled(response),
+                key=f"{method.upper()} {route}"
+            )
+        return response
+
+    def _is_throttled(self, response) -> bool:
+        headers = response.headers
+        if response.status_code == 429 or self._throttle_delay(response) is not None:
+            return True
+        try:
+            if float(headers.get("X-RateLimit-Delay") or 0) > 0:
+                return True
+            remaining, limit = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Limit")
+            return remaining is not None and limit is not None and float(remaining) < 0.1 * float(limit)
+        except ValueError:
+            return False
+
+    def request(self, method, url, *args, **kwargs):
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            self._count("requests")
+            throttled = False
+            try:
+                response = self._send(method, url, *args, **kwargs)
+            except requests.ConnectionError:
+                self._count("errors")
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                delay = self._throttle_delay(response)
+                server_delay = response.headers.get("X-RateLimit-Delay")
+                if server_delay:
+                    try:
+                        self._count("throttled_seconds", float(server_delay))
+                    except ValueError:
+                        pass
+                retryable = response.status_code in RETRY_STATUSES and (
+                    idempotent or response.status_code in REJECTED_STATUSES or delay is not None
+                )
+                if not retryable:
+                    if delay:
+                        # Throttled but served: slow every caller down before the next request
+                        self._count("throttled")
+                        self._pause(min(delay, self.max_backoff))
+                    self._local.continuation_token = response.headers.get("X-MS-ContinuationToken")
+                    return response
+                throttled = response.status_code == 429 or delay is not None
+                if throttled:
+                    self._count("throttled")
+                if attempt >= self.max_retries:
+                    return response
+                if delay is None:
+                    delay = self._backoff(attempt)
+                delay = min(delay, self.max_backoff)
+                response.close()
+
+            attempt += 1
+            self._count("retries")
+            self.logger.warning(f"Retrying {method} {url} in {delay:.1f}s (attempt {attempt}/{self.max_retries})")
+            if throttled:
+                # Every thread waits it out, this one included, in _wait_for_pause at the top of the loop
+                self._pause(delay)
+            else:
+                self._sleep(delay)
+
+    def attach(self, sdk_client):
+        """Route an azure-devops SDK client through this session.
+
+        msrest keeps one session per thread, closes it after every call and
+        retries blindly; instead every thread shares this pooled session,
+        keep-alive is enabled and retries are left to this class. This
+        relies on msrest internals (checked against msrest 0.7), so a
+        release that moves them fails here rather than silently bypassing
+        the session.
+        """
+        service = sdk_client._client
+        try:
+            driver = service.config.pipeline._sender.driver
+            driver._session_mapping
+        except AttributeError as e:
+            raise RuntimeError(
+                f"Cannot route {type(sdk_client).__name__} through the shared session: this msrest version "
+                f"does not expose the requests driver ({str(e)})"
+            ) from e
+        service.config.keep_alive = True
+        driver._session_mapping = SimpleNamespace(session=self)
+        return sdk_client
+
+
+class PooledConnection(Connection):
+    """azure-devops Connection whose clients all share one ThrottledSession (and its limiter)"""
+
+    def __init__(self, org_url: str, pat: str, session: ThrottledSession = None, metrics=None):
+        super().__init__(base_url=org_url, creds=BasicAuthentication("", pat))
+        self.session = session or ThrottledSession(pat=pat, limiter=AdaptiveLimiter(), metrics=metrics)
+
+    def _get_client_instance(self, client_class):
+        return self.session.attach(super()._get_client_instance(client_class))
+
+
+def session_for(connection) -> requests.Session:
+    """The shared session of a connection, or a new pooled one for plain connections"""
+    session = getattr(connection, "session", None)
+    if session is None:
+        session = ThrottledSession(pat=getattr(connection._creds, "password", None))
+    return session
+
+
+def limiter_for(connection):
+    """The org-wide limiter of a connection, if it has one"""
+    return getattr(getattr(connection, "session", None), "limiter", None)
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+
+class RunJournal:
+    """Append-only checkpoint log of a backup run (journal.ndjson in the snapshot).
+
+    Each line records one completed unit of work as {"component", "unit",
+    "data"}; the last record for a unit wins, so progress counters can be
+    recorded repeatedly. Lines are flushed and fsynced as they are written,
+    and a torn last line left by a crash is ignored on load, so a resumed
+    run sees exactly the units that finished.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._units = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._units[(entry["component"], entry["unit"])] = entry.get("data")
+            self.logger.info(f"Loaded {len(self._units)} checkpoints from {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a")
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def done(self, component: str, unit: str) -> bool:
+        return (component, unit) in self._units
+
+    def get(self, component: str, unit: str, default=None):
+        return self._units.get((component, unit), default)
+
+    def record(self, component: str, unit: str, data=None):
+        line = json.dumps({"component": component, "unit": unit, "data": data}, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._units[(component, unit)] = data
+
+    def scope(self, component: str) -> "JournalScope":
+        return JournalScope(self, component)
+
+    def close(self):
+        self._file.close()
+
+
+class JournalScope:
+    """A RunJournal view bound to one component, handed to that component's module"""
+
+    def __init__(self, journal: RunJournal, component: str):
+        self.journal = journal
+        self.component = component
+
+    def done(self, unit: str) -> bool:
+        return self.journal.done(self.component, unit)
+
+    def get(self, unit: str, default=None):
+        return self.journal.get(self.component, unit, default)
+
+    def record(self, unit: str, data=None):
+        self.journal.record(self.component, unit, data)
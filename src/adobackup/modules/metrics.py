@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+
+
+class Metrics:
+    """Thread-safe collector for one backup or restore run.
+
+    Holds per-phase wall times, labelled counters (bytes written, uploaded,
+    git transfer sizes, ...) and per-endpoint API call counts and latency
+    histograms. report() returns everything as a JSON-ready dict and
+    write_prometheus() renders it in the node_exporter textfile format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.phases = {}
+        self.counters = {}
+        self.requests = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block; repeated phases of the same name accumulate"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def add(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe_request(self, method: str, route: str, status, seconds: float):
+        """Record one API attempt; status is the HTTP code, or None when no response came back"""
+        key = (method.upper(), route)
+        with self._lock:
+            entry = self.requests.setdefault(key, {
+                "count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1)
+            })
+            entry["count"] += 1
+            if status is None or status >= 400:
+                entry["errors"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["buckets"][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def report(self, **extra) -> dict:
+        with self._lock:
+            report = {
+                "started": self.started,
+                "duration_seconds": round(time.time() - self.started, 3),
+                "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "api": [
+                    {
+                        "method": method,
+                        "route": route,
+                        "count": entry["count"],
+                        "errors": entry["errors"],
+                        "mean_seconds": round(entry["seconds"] / entry["count"], 4),
+                        "max_seconds": round(entry["max_seconds"], 4),
+                        "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], entry["buckets"]))
+                    }
+                    for (method, route), entry in sorted(self.requests.items())
+                ]
+            }
+        report["api_calls"] = sum(entry["count"] for entry in report["api"])
+        report.update(extra)
+        return report
+
+    def write_json(self, path, **extra) -> dict:
+        report = self.report(**extra)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        return report
+
+    def write_prometheus(self, path, prefix: str = "adobackup", **gauges):
+        """Write a Prometheus textfile atomically.
+
+        gauges adds flat {name: number} values; names ending in _total are
+        typed as counters, the rest as gauges.
+        """
+        lines = [f"# TYPE {prefix}_phase_seconds gauge"]
+        with self._lock:
+            for name, seconds in sorted(self.phases.items()):
+                lines.append(f"{prefix}_phase_seconds{{{_labels({'phase': name})}}} {seconds:.3f}")
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {prefix}_{name}_total counter")
+                    typed.add(name)
+                lines.append(f"{prefix}_{name}_total{{{_labels(dict(labels))}}} {value}")
+            lines.append(f"# TYPE {prefix}_api_request_seconds histogram")
+            for (method, route), entry in sorted(self.requests.items()):
+                labels = {"method": method, "route": route}
+                cumulative = 0
+                for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], entry["buckets"]):
+                    cumulative += count
+                    lines.append(f"{prefix}_api_request_seconds_bucket{{{_labels({**labels, 'le': bound})}}} {cumulative}")
+                lines.append(f"{prefix}_api_request_seconds_sum{{{_labels(labels)}}} {entry['seconds']:.4f}")
+                lines.append(f"{prefix}_api_request_seconds_count{{{_labels(labels)}}} {entry['count']}")
+            if self.requests:
+                lines.append(f"# TYPE {prefix}_api_errors_total counter")
+            for (method, route), entry in sorted(self.requests.items()):
+                labels = {"method": method, "route": route}
+                lines.append(f"{prefix}_api_errors_total{{{_labels(labels)}}} {entry['errors']}")
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE {prefix}_{name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{prefix}_{name} {value}")
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds {self.started:.0f}")
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+        return path
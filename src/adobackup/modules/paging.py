@@ -0,0 +1,33 @@
+from adobackup.modules.http_client import ThrottledSession
+
+PROJECT_PAGE = 100
+
+
+def paged(connection, fetch, *args, **kwargs):
+    """Yield every item of a paged SDK list call, following X-MS-ContinuationToken.
+
+    The SDK returns only the items of a page and drops the continuation
+    header, so the token is read back from the connection's shared session,
+    which keeps the last one each thread received. Connections without
+    such a session get the first page only.
+    """
+    session = getattr(connection, "session", None)
+    if not isinstance(session, ThrottledSession):
+        session = None
+    token = None
+    while True:
+        page = fetch(*args, continuation_token=token, **kwargs) or []
+        previous, token = token, session.continuation_token() if session is not None else None
+        yield from page
+        if not token or token == previous:
+            return
+
+
+def all_projects(core_client, page_size: int = PROJECT_PAGE) -> list:
+    """Every project of the organization; get_projects alone returns only the first page"""
+    projects = []
+    while True:
+        page = core_client.get_projects(top=page_size, skip=len(projects)) or []
+        projects.extend(page)
+        if len(page) < page_size:
+            return projects
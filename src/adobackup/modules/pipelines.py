@@ -1,36 +1,175 @@
-from azure.devops.v7_1.pipelines import PipelinesClient
 import json
+import logging
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from azure.devops.connection import Connection
+from azure.devops.v7_1.pipelines import PipelinesClient
+from adobackup.modules.http_client import session_for
+from adobackup.modules.paging import all_projects, paged
+from adobackup.modules.rate_limit import submit
+from adobackup.modules.snapshots import find_previous
+
+PIPELINES_API_VERSION = "7.1-preview.1"
+# Keys of a pipeline definition kept in its file; a restore recreates the pipeline from them
+PIPELINE_KEYS = ("id", "name", "folder", "revision", "url", "configuration")
+
 
 class PipelinesModule:
-    def __init__(self, connection):
-        self.client = connection.clients.get_pipelines_client()
-    
+    """Backs up pipeline definitions, one file per pipeline under its project."""
+
+    def __init__(self, connection: Connection, incremental: bool = False, max_workers: int = 4, journal=None):
+        self.logger = logging.getLogger(__name__)
+        self.connection = connection
+        self.incremental = incremental
+        self.max_workers = max_workers
+        self.journal = journal
+        self.core_client = connection.clients.get_core_client()
+        self.client: PipelinesClient = connection.clients.get_pipelines_client()
+        self.session = session_for(connection)
+        self._repo_names = {}
+        self._repo_lock = threading.Lock()
+
     def backup(self, backup_path):
+        return list(self.stream(backup_path))
+
+    def stream(self, backup_path):
+        """Yield one status record per pipeline, writing each definition to pipelines/<project id>/<id>.json.
+
+        Projects are listed concurrently and up to max_workers definitions
+        are fetched at once. When incremental, a definition whose revision
+        matches the previous snapshot's index.json is copied from that
+        snapshot instead of fetched; its record has mode "reused".
+        """
         pipelines_path = backup_path / "pipelines"
         pipelines_path.mkdir(exist_ok=True)
-        
-        pipelines = self.client.list_pipelines()
+        previous_dir, previous_index = self._load_previous(backup_path)
+        index = {}
         results = []
-        
-        for pipeline in pipelines:
-            try:
-                config = self.client.get_pipeline(pipeline.id)
-                with open(pipelines_path / f"{pipeline.id}.json", "w") as f:
-                    json.dump(config.__dict__, f)
-                results.append({
-                    "id": pipeline.id,
-                    "name": pipeline.name,
-                    "status": "success"
-                })
-            except Exception as e:
-                results.append({
-                    "id": pipeline.id,
-                    "name": pipeline.name,
-                    "status": "failed",
-                    "error": str(e)
-                })
-        
+
+        try:
+            projects = all_projects(self.core_client)
+        except Exception as e:
+            self.logger.error(f"Failed to fetch projects: {str(e)}")
+            return
+
+        for record in self._backup_pipelines(projects, pipelines_path, previous_dir, previous_index):
+            if record["status"] != "failed":
+                index.setdefault(record["project_id"], {})[str(record["id"])] = {
+                    "name": record["name"], "revision": record["revision"]
+                }
+            results.append(record)
+            yield record
+
+        counts = {
+            "fetched": sum(1 for r in results if r.get("mode") == "fetched"),
+            "reused": sum(1 for r in results if r.get("mode") == "reused"),
+            "failed": sum(1 for r in results if r["status"] == "failed")
+        }
+        self.logger.info(
+            f"✅ Pipelines: {counts['fetched']} fetched, {counts['reused']} reused, {counts['failed']} failed"
+        )
+        with open(pipelines_path / "index.json", "w") as f:
+            json.dump(index, f, indent=2)
         with open(pipelines_path / "summary.json", "w") as f:
-            json.dump(results, f, indent=2)
-        
-        return results
\ No newline at end of file
+            json.dump({**counts, "pipelines": results}, f, indent=2)
+
+    def _backup_pipelines(self, projects, pipelines_path, previous_dir, previous_index):
+        """Yield each pipeline's record in listing order, fetching definitions concurrently"""
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as list_pool, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as fetch_pool:
+            listings = [submit(list_pool, self._list_pipelines, project) for project in projects]
+            for project, listing in zip(projects, listings):
+                for pipeline in listing.result():
+                    in_flight.append(submit(fetch_pool, self._backup_pipeline, project, pipeline, pipelines_path,
+                                            previous_dir, previous_index))
+                    if len(in_flight) >= 2 * self.max_workers:
+                        yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _list_pipelines(self, project):
+        try:
+            pipelines = list(paged(self.connection, self.client.list_pipelines, project.name))
+        except Exception as e:
+            self.logger.warning(f"⚠️ Pipelines failed for {project.name}: {str(e)}")
+            return []
+        self.logger.info(f"✅ Found {len(pipelines)} pipelines in {project.name}")
+        return pipelines
+
+    def _backup_pipeline(self, project, pipeline, pipelines_path, previous_dir, previous_index):
+        unit = f"{project.id}/{pipeline.id}"
+        path = pipelines_path / project.id / f"{pipeline.id}.json"
+        if self.journal is not None and self.journal.done(unit) and path.exists():
+            return self.journal.get(unit)
+
+        record = {
+            "type": "pipeline",
+            "project": project.name,
+            "project_id": project.id,
+            "id": pipeline.id,
+            "name": pipeline.name,
+            "revision": pipeline.revision,
+            "status": "success"
+        }
+        path.parent.mkdir(exist_ok=True)
+        known = previous_index.get(project.id, {}).get(str(pipeline.id))
+        previous_path = previous_dir / project.id / f"{pipeline.id}.json" if previous_dir is not None else None
+        try:
+            if known is not None and known["revision"] == pipeline.revision and previous_path.exists():
+                shutil.copyfile(previous_path, path)
+                record["mode"] = "reused"
+            else:
+                with open(path, "w") as f:
+                    json.dump(self._get_definition(project, pipeline.id), f)
+                record["mode"] = "fetched"
+        except Exception as e:
+            self.logger.warning(f"⚠️ Pipeline {pipeline.name} in {project.name} failed: {str(e)}")
+            return {**record, "status": "failed", "error": str(e)}
+
+        if self.journal is not None:
+            self.journal.record(unit, record)
+        return record
+
+    def _get_definition(self, project, pipeline_id) -> dict:
+        """The pipeline's definition as the REST API returns it.
+
+        The SDK model only keeps configuration.type, dropping the YAML path
+        and repository a restore needs. Azure Repos repositories are
+        referenced by ID, so their name is added for the restore to map
+        them onto the target's repositories.
+        """
+        response = self.session.get(
+            f"{self.connection.base_url}/{quote(project.name)}/_apis/pipelines/{pipeline_id}",
+            params={"api-version": PIPELINES_API_VERSION}
+        )
+        response.raise_for_status()
+        definition = {key: value for key, value in response.json().items() if key in PIPELINE_KEYS}
+        repository = (definition.get("configuration") or {}).get("repository") or {}
+        if repository.get("id") and "name" not in repository:
+            repository["name"] = self._repository_names(project).get(repository["id"])
+        return definition
+
+    def _repository_names(self, project) -> dict:
+        """{repository ID: name} of a project, listed once per run"""
+        with self._repo_lock:
+            names = self._repo_names.get(project.id)
+            if names is None:
+                git_client = self.connection.clients.get_git_client()
+                names = self._repo_names[project.id] = {
+                    repo.id: repo.name for repo in git_client.get_repositories(project.name)
+                }
+            return names
+
+    def _load_previous(self, backup_path):
+        """Return (snapshot pipelines dir, revision index) of the last run that wrote an index"""
+        if not self.incremental:
+            return None, {}
+        index_path = find_previous(backup_path, "pipelines/index.json")
+        if index_path is None:
+            return None, {}
+        with open(index_path) as f:
+            return index_path.parent, json.load(f)
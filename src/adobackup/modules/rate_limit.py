@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+DEFAULT_WEIGHTS = {
+    "Boards": 3,
+    "Pipelines": 2,
+    "Test Plans": 2,
+    "Repos": 1,
+    "Wikis": 1,
+    "Artifacts": 1
+}
+
+current_component = ContextVar("current_component", default="default")
+
+
+@contextmanager
+def component_scope(name: str):
+    """Attribute every scheduled call made in this context to component name"""
+    token = current_component.set(name)
+    try:
+        yield
+    finally:
+        current_component.reset(token)
+
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit that carries the caller's component over to the worker thread"""
+    return pool.submit(copy_context().run, fn, *args, **kwargs)
+
+
+class AdaptiveLimiter:
+    """Org-wide concurrency budget shared by every module's API calls and git processes.
+
+    The number of calls in flight is capped by a limit that adapts AIMD
+    style: it grows by one after a full window of healthy calls, is halved
+    when Azure DevOps throttles us (429, Retry-After, X-RateLimit-Delay or
+    a nearly exhausted X-RateLimit-Remaining), and shrinks by one when the
+    latency of an endpoint climbs well above the best seen for it, which is
+    how server-side delaying shows up before an outright 429. Decreases are
+    spaced by a cooldown so one burst of throttled responses only counts
+    once.
+
+    Free slots go to the waiting component using the smallest share of its
+    weight (in flight / weight), so heavy components such as Repos cannot
+    starve lighter, higher-priority ones such as Boards. Git processes never
+    hold the last permit: an API call may always run beside them, even when
+    throttling has cut the limit to one.
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 64, weights: dict = None,
+                 latency_factor: float = 2.0, cooldown: float = 5.0, clock=time.monotonic):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial <= max_limit.")
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._active = defaultdict(int)
+        self._waiting = defaultdict(int)
+        self._waiting_git = defaultdict(int)
+        self._healthy = 0
+        self._best_latency = {}
+        self._avg_latency = {}
+        self._git = 0
+        self._last_decrease = None
+        self.logger = logging.getLogger(__name__)
+        self.counters = {"calls": 0, "throttled": 0, "increases": 0, "decreases": 0, "peak_limit": initial}
+        self.components = defaultdict(lambda: {"calls": 0, "wait_seconds": 0.0})
+
+    def _weight(self, component: str) -> float:
+        return self.weights.get(component, 1)
+
+    def _room(self, git: bool) -> bool:
+        if git:
+            return self._in_flight < self.limit and self._git < max(1, self.limit // 2)
+        # However many permits git holds, one is left for API calls
+        return self._in_flight < self.limit or self._in_flight == self._git
+
+    def _next_component(self) -> str:
+        git_room, api_room = self._room(True), self._room(False)
+        waiting = [
+            c for c, n in self._waiting.items()
+            if (git_room and self._waiting_git[c]) or (api_room and n > self._waiting_git[c])
+        ]
+        return min(waiting, key=lambda c: (self._active[c] / self._weight(c), -self._weight(c), c))
+
+    def acquire(self, component: str = None, git: bool = False):
+        component = component or current_component.get()
+        started = self._clock()
+        with self._cond:
+            self._waiting[component] += 1
+            self._waiting_git[component] += git
+            while not self._room(git) or self._next_component() != component:
+                self._cond.wait()
+            self._waiting[component] -= 1
+            self._waiting_git[component] -= git
+            self._git += git
+            self._active[component] += 1
+            self._in_flight += 1
+            self.counters["calls"] += 1
+            stats = self.components[component]
+            stats["calls"] += 1
+            stats["wait_seconds"] += self._clock() - started
+            # Another waiter may be eligible now that the fair-share order changed
+            self._cond.notify_all()
+        return component
+
+    def release(self, component: str, latency: float = None, throttled: bool = False, key: str = "",
+                git: bool = False):
+        with self._cond:
+            self._active[component] -= 1
+            self._in_flight -= 1
+            self._git -= git
+            if throttled:
+                self.counters["throttled"] += 1
+                self._decrease(self.limit // 2)
+            elif latency is not None:
+                self._observe(latency, key)
+            self._cond.notify_all()
+
+    @contextmanager
+    def git_slot(self, component: str = None):
+        """Hold a slot for a git process; yields a callback to report throttling.
+
+        Git processes run for minutes, so together they may hold at most half
+        of the budget, leaving API callers of every component room to run.
+        """
+        outcome = {"throttled": False}
+        component = self.acquire(component, git=True)
+        try:
+            yield lambda: outcome.update(throttled=True)
+        finally:
+            self.release(component, throttled=outcome["throttled"], git=True)
+
+    def _observe(self, latency: float, key: str):
+        best = self._best_latency.get(key)
+        self._best_latency[key] = latency if best is None else min(best, latency)
+        average = self._avg_latency.get(key)
+        self._avg_latency[key] = average = latency if average is None else 0.8 * average + 0.2 * latency
+        if average > self.latency_factor * self._best_latency[key]:
+            self._decrease(self.limit - 1)
+            return
+        self._healthy += 1
+        if self._healthy >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self._healthy = 0
+            self.counters["increases"] += 1
+            self.counters["peak_limit"] = max(self.counters["peak_limit"], self.limit)
+
+    def _decrease(self, new_limit: int):
+        now = self._clock()
+        if self._last_decrease is not None and now - self._last_decrease < self.cooldown:
+            return
+        new_limit = max(self.min_limit, new_limit)
+        if new_limit < self.limit:
+            self.logger.info(f"Reducing API concurrency from {self.limit} to {new_limit}")
+            self.limit = new_limit
+            self.counters["decreases"] += 1
+        self._last_decrease = now
+        self._healthy = 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.counters,
+                "limit": self.limit,
+                "components": {
+                    name: {"calls": s["calls"], "wait_seconds": round(s["wait_seconds"], 3)}
+                    for name, s in self.components.items()
+                }
+            }
@@ -1,40 +1,79 @@
-import subprocess
 from pathlib import Path
 from azure.devops.v7_1.git import GitClient
+from adobackup.modules.git_mirror import MirrorScheduler
+from adobackup.modules.http_client import limiter_for
+from adobackup.modules.snapshots import find_previous
 import json
 
 class ReposModule:
-    def __init__(self, connection):
+    def __init__(self, connection, max_workers: int = 4, incremental: bool = False, journal=None):
         self.client = connection.clients.get_git_client()
-    
+        self.scheduler = MirrorScheduler(max_workers=max_workers, limiter=limiter_for(connection))
+        self.incremental = incremental
+        self.journal = journal
+
     def backup(self, backup_path):
+        return list(self.stream(backup_path))
+
+    def stream(self, backup_path):
+        """Yield one record per mirrored repository"""
         repos_backup = backup_path / "repos"
         repos_backup.mkdir(exist_ok=True)
-        
-        results = []
+
         repos = self.client.get_repositories()
-        
-        for repo in repos:
-            repo_dir = repos_backup / f"{repo.name}.git"
-            try:
-                subprocess.run([
-                    "git", "clone", "--mirror",
-                    repo.remote_url,
-                    str(repo_dir)
-                ], check=True, capture_output=True)
-                results.append({
-                    "name": repo.name,
-                    "status": "success",
-                    "path": str(repo_dir.relative_to(backup_path))
-                })
-            except subprocess.CalledProcessError as e:
-                results.append({
-                    "name": repo.name,
-                    "status": "failed",
-                    "error": e.stderr.decode()
-                })
-        
+        jobs = [
+            {
+                "name": repo.name,
+                "project": repo.project.name if repo.project else None,
+                "url": repo.remote_url,
+                "dest": repos_backup / (repo.project.name if repo.project else "") / f"{repo.name}.git",
+                "size": repo.size
+            }
+            for repo in repos
+        ]
+        for job in jobs:
+            job["unit"] = f"{job['project']}/{job['name']}"
+        if self.incremental:
+            for job in jobs:
+                previous = find_previous(backup_path, job["dest"].relative_to(backup_path).as_posix())
+                if previous is not None and (previous / "HEAD").exists():
+                    job["previous"] = previous
+
+        def entry_for(job, outcome):
+            entry = {"type": "repo", "name": job["name"], "project": job["project"], "status": outcome["status"]}
+            if outcome["status"] == "success":
+                entry["path"] = job["dest"].relative_to(backup_path).as_posix()
+                entry["bytes"] = outcome["bytes"]
+                entry["mode"] = outcome["mode"]
+            else:
+                entry["error"] = outcome["error"]
+            entry["duration_seconds"] = outcome["duration_seconds"]
+            return entry
+
+        def checkpoint(job, outcome):
+            if outcome["status"] == "success":
+                self.journal.record(job["unit"], entry_for(job, outcome))
+
+        # Mirrors finished by an interrupted run of this snapshot are kept as they are
+        done = {}
+        if self.journal is not None:
+            done = {
+                job["unit"]: self.journal.get(job["unit"]) for job in jobs
+                if self.journal.done(job["unit"]) and Path(job["dest"]).exists()
+            }
+        pending = [job for job in jobs if job["unit"] not in done]
+        outcomes = dict(zip(
+            (job["unit"] for job in pending),
+            self.scheduler.run(pending, on_result=checkpoint if self.journal is not None else None,
+                               journal=self.journal)
+        ))
+
+        results = [
+            done[job["unit"]] if job["unit"] in done else entry_for(job, outcomes[job["unit"]])
+            for job in jobs
+        ]
+
         with open(repos_backup / "metadata.json", "w") as f:
             json.dump(results, f, indent=2)
-        
-        return results
\ No newline at end of file
+
+        yield from results
@@ -0,0 +1,67 @@
+from datetime import date, datetime
+
+from msrest.serialization import Model
+
+_SCALARS = {str, int, float, bool}
+_PLANS = {}
+
+
+def projection(*paths) -> dict:
+    """Compile dotted attribute paths ("owner.display_name") into a to_dict field tree"""
+    tree = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for part in parents:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[leaf] = True
+    return tree
+
+
+def _plan(cls, fields) -> list:
+    """(attribute, REST key, sub-projection) for each attribute of cls kept by fields, computed once"""
+    plans = _PLANS.get(id(fields))
+    if plans is None:
+        # The projection is kept alongside its plans so its id() cannot be reused
+        plans = _PLANS[id(fields)] = (fields, {})
+    plan = plans[1].get(cls)
+    if plan is None:
+        plan = plans[1][cls] = [
+            (attr, spec["key"], None if fields is None or fields[attr] is True else fields[attr])
+            for attr, spec in cls._attribute_map.items()
+            if fields is None or attr in fields
+        ]
+    return plan
+
+
+def to_dict(value, fields: dict = None):
+    """JSON-ready form of an msrest model, or of lists and dicts of them.
+
+    Only the attributes declared in each model's _attribute_map are read,
+    under their REST names (areaPath, not area_path), so private state and
+    additional_properties never leak into the output and None values are
+    left out. fields, built with projection(), limits which attributes are
+    kept at each level; a leaf keeps the whole value below it.
+    """
+    kind = type(value)
+    if kind in _SCALARS:
+        return value
+    if isinstance(value, Model):
+        result = {}
+        for attr, key, sub in _plan(kind, fields):
+            item = getattr(value, attr, None)
+            if item is None:
+                continue
+            result[key] = item if type(item) in _SCALARS else to_dict(item, sub)
+        return result
+    if isinstance(value, (list, tuple)):
+        return [item if type(item) in _SCALARS else to_dict(item, fields) for item in value]
+    if isinstance(value, dict):
+        return {key: item if type(item) in _SCALARS else to_dict(item) for key, item in value.items()}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
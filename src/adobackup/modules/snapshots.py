@@ -0,0 +1,25 @@
+import re
+from pathlib import Path
+
+SNAPSHOT_NAME = re.compile(r"^\d{8}_\d{6}$")
+
+
+def previous_snapshots(backup_path) -> list:
+    """Snapshot directories created before backup_path, newest first"""
+    backup_path = Path(backup_path)
+    if not backup_path.parent.exists():
+        return []
+    earlier = [
+        p for p in backup_path.parent.iterdir()
+        if p.is_dir() and SNAPSHOT_NAME.match(p.name) and p.name < backup_path.name
+    ]
+    return sorted(earlier, key=lambda p: p.name, reverse=True)
+
+
+def find_previous(backup_path, relative):
+    """Return relative resolved against the most recent earlier snapshot that has it"""
+    for snapshot in previous_snapshots(backup_path):
+        candidate = snapshot / relative
+        if candidate.exists():
+            return candidate
+    return None
@@ -1,36 +1,126 @@
-from azure.devops.v7_1.test import TestClient
 import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from azure.devops.connection import Connection
+from azure.devops.v7_1.test_plan import TestPlanClient
+from adobackup.modules.paging import all_projects, paged
+from adobackup.modules.rate_limit import submit
+from adobackup.modules.serialize import projection, to_dict
+
+IDENTITY = ("display_name", "unique_name", "id")
+
+# What is kept of each model: everything needed to recreate the plan tree,
+# with identities cut down to who they are and no _links or project references
+PLAN_FIELDS = projection(
+    "id", "name", "description", "state", "area_path", "iteration", "start_date", "end_date", "revision",
+    "build_id", "previous_build_id", "build_definition", "release_environment_definition",
+    "automated_test_environment", "automated_test_settings", "manual_test_environment", "manual_test_settings",
+    "test_outcome_settings", "root_suite.id", "root_suite.name", "updated_date",
+    *(f"{who}.{field}" for who in ("owner", "updated_by") for field in IDENTITY)
+)
+SUITE_FIELDS = projection(
+    "id", "name", "suite_type", "parent_suite.id", "parent_suite.name", "query_string", "requirement_id",
+    "inherit_default_configurations", "default_configurations", "has_children", "last_error",
+    "last_populated_date", "last_updated_date", "revision",
+    *(f"{who}.{field}" for who in ("default_testers", "last_updated_by") for field in IDENTITY)
+)
+CASE_FIELDS = projection(
+    "order", "work_item", "test_suite.id", "point_assignments.id", "point_assignments.configuration_id",
+    "point_assignments.configuration_name", *(f"point_assignments.tester.{field}" for field in IDENTITY)
+)
+
 
 class TestPlansModule:
-    def __init__(self, connection):
-        self.client = connection.clients.get_test_client()
-    
+    """Backs up test plans with their suites and test cases, one file per plan."""
+
+    def __init__(self, connection: Connection, max_workers: int = 4, journal=None):
+        self.logger = logging.getLogger(__name__)
+        self.connection = connection
+        self.max_workers = max_workers
+        self.journal = journal
+        self.core_client = connection.clients.get_core_client()
+        self.client: TestPlanClient = connection.clients.get_test_plan_client()
+
     def backup(self, backup_path):
+        return list(self.stream(backup_path))
+
+    def stream(self, backup_path):
+        """Yield one summary record per test plan, writing each plan to test_plans/plan_<id>.json.
+
+        Up to max_workers plans are fetched at once and each plan's suites
+        have their test cases fetched concurrently on a second pool; every
+        listing follows continuation tokens. Records come out in listing
+        order, project by project.
+        """
         test_path = backup_path / "test_plans"
         test_path.mkdir(exist_ok=True)
-        
-        plans = self.client.get_plans()
-        results = []
-        
-        for plan in plans:
-            plan_data = {
-                "plan": plan.__dict__,
-                "suites": self._get_test_suites(plan.id),
-                "cases": self._get_test_cases(plan.id)
-            }
-            with open(test_path / f"plan_{plan.id}.json", "w") as f:
-                json.dump(plan_data, f, default=lambda x: x.__dict__)
-            results.append({
-                "plan_id": plan.id,
-                "name": plan.name,
-                "suites": len(plan_data["suites"]),
-                "cases": len(plan_data["cases"])
-            })
-        
-        return results
-    
-    def _get_test_suites(self, plan_id):
-        return self.client.get_test_suites_for_plan(plan_id)
-    
-    def _get_test_cases(self, plan_id):
-        return self.client.get_test_cases(plan_id)
\ No newline at end of file
+
+        try:
+            projects = all_projects(self.core_client)
+        except Exception as e:
+            self.logger.error(f"Failed to fetch projects: {str(e)}")
+            return
+
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as plan_pool, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as suite_pool:
+            for project, plan in self._plans(projects):
+                in_flight.append(submit(plan_pool, self._backup_plan, project, plan, test_path, suite_pool))
+                if len(in_flight) >= 2 * self.max_workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _plans(self, projects):
+        """(project, plan) for every plan of every project"""
+        for project in projects:
+            try:
+                plans = list(paged(self.connection, self.client.get_test_plans, project.name))
+            except Exception as e:
+                self.logger.warning(f"⚠️ Test plans failed for {project.name}: {str(e)}")
+                continue
+            self.logger.info(f"✅ Found {len(plans)} test plans in {project.name}")
+            for plan in plans:
+                yield project, plan
+
+    def _backup_plan(self, project, plan, test_path, suite_pool):
+        unit = str(plan.id)
+        path = test_path / f"plan_{unit}.json"
+        if self.journal is not None and self.journal.done(unit) and path.exists():
+            return self.journal.get(unit)
+
+        started = time.perf_counter()
+        record = {"type": "test_plan", "project": project.name, "plan_id": plan.id, "name": plan.name}
+        try:
+            suites = list(paged(self.connection, self.client.get_test_suites_for_plan, project.name, plan.id))
+            # Cases are fetched on their own pool: waiting on them from this pool could deadlock it
+            cases = [submit(suite_pool, self._suite_cases, project.name, plan.id, suite.id) for suite in suites]
+            suite_data = [
+                {**to_dict(suite, SUITE_FIELDS), "testCases": future.result()}
+                for suite, future in zip(suites, cases)
+            ]
+            with open(path, "w") as f:
+                json.dump({"project": project.name, "plan": to_dict(plan, PLAN_FIELDS), "suites": suite_data}, f,
+                          separators=(",", ":"))
+        except Exception as e:
+            # Not journaled, so a resumed run tries the plan again
+            self.logger.warning(f"⚠️ Plan {plan.name} in {project.name} failed: {str(e)}")
+            return {**record, "status": "failed", "error": str(e)}
+
+        elapsed = time.perf_counter() - started
+        record.update({
+            "status": "success",
+            "suites": len(suite_data),
+            "cases": sum(len(suite["testCases"]) for suite in suite_data),
+            "seconds": round(elapsed, 3)
+        })
+        if self.journal is not None:
+            self.journal.record(unit, record)
+        self.logger.info(f"✅ Plan {plan.name}: {record['suites']} suites, {record['cases']} test cases")
+        return record
+
+    def _suite_cases(self, project_name, plan_id, suite_id):
+        return to_dict(list(paged(self.connection, self.client.get_test_case_list, project_name, plan_id, suite_id)),
+                       CASE_FIELDS)
@@ -1,13 +1,16 @@
-import requests
-import subprocess
 import base64
 from azure.devops.connection import Connection
+from adobackup.modules.git_mirror import MirrorScheduler
+from adobackup.modules.http_client import limiter_for, session_for
 
 class WikisModule:
-    def __init__(self, connection: Connection, pat: str):
+    def __init__(self, connection: Connection, pat: str, max_workers: int = 4, journal=None):
         self.connection = connection
+        self.journal = journal
         self.pat = pat
+        self.scheduler = MirrorScheduler(max_workers=max_workers, limiter=limiter_for(connection))
         self.base_url = connection.base_url
+        self.session = session_for(connection)
         self.headers = {
             "Authorization": f"Basic {self._encode_pat()}",
             "Content-Type": "application/json"
@@ -17,45 +20,73 @@ class WikisModule:
         return base64.b64encode(f":{self.pat}".encode()).decode()
 
     def backup(self, backup_path):
+        return list(self.stream(backup_path))
+
+    def stream(self, backup_path):
+        """Yield one record per wiki mirror (or per project that failed to list)"""
         wikis_path = backup_path / "wikis"
         wikis_path.mkdir(exist_ok=True)
 
         core_client = self.connection.clients.get_core_client()
         projects = core_client.get_projects()
-        results = []
+        jobs = []
 
         for project in projects:
             try:
                 url = f"{self.base_url}/{project.name}/_apis/wiki/wikis?api-version=7.1-preview.1"
-                response = requests.get(url, headers=self.headers)
+                response = self.session.get(url, headers=self.headers)
                 response.raise_for_status()
                 wikis = response.json().get("value", [])
 
                 for wiki in wikis:
-                    try:
-                        subprocess.run([
-                            "git", "clone", "--mirror",
-                            wiki["remoteUrl"],
-                            str(wikis_path / f"{wiki['name']}.git")
-                        ], check=True)
-                        results.append({
-                            "project": project.name,
-                            "name": wiki["name"],
-                            "status": "success"
-                        })
-                    except subprocess.CalledProcessError as e:
-                        results.append({
-                            "project": project.name,
-                            "name": wiki["name"],
-                            "status": "failed",
-                            "error": str(e)
-                        })
+                    jobs.append({
+                        "project": project.name,
+                        "name": wiki["name"],
+                        "url": wiki["remoteUrl"],
+                        "dest": wikis_path / project.name / f"{wiki['name']}.git"
+                    })
 
             except Exception as e:
-                results.append({
+                yield {
+                    "type": "wiki",
                     "project": project.name,
                     "status": "error",
                     "error": str(e)
-                })
+                }
+
+        def entry_for(job, outcome):
+            entry = {
+                "type": "wiki",
+                "project": job["project"],
+                "name": job["name"],
+                "status": outcome["status"],
+                "duration_seconds": outcome["duration_seconds"]
+            }
+            if outcome["status"] == "success":
+                entry["path"] = job["dest"].relative_to(backup_path).as_posix()
+                entry["bytes"] = outcome["bytes"]
+            else:
+                entry["error"] = outcome["error"]
+            return entry
+
+        def checkpoint(job, outcome):
+            if outcome["status"] == "success":
+                self.journal.record(job["unit"], entry_for(job, outcome))
+
+        for job in jobs:
+            job["unit"] = f"{job['project']}/{job['name']}"
+        done = {}
+        if self.journal is not None:
+            done = {
+                job["unit"]: self.journal.get(job["unit"]) for job in jobs
+                if self.journal.done(job["unit"]) and job["dest"].exists()
+            }
+        pending = [job for job in jobs if job["unit"] not in done]
+        outcomes = dict(zip(
+            (job["unit"] for job in pending),
+            self.scheduler.run(pending, on_result=checkpoint if self.journal is not None else None,
+                               journal=self.journal)
+        ))
 
-        return results
+        for job in jobs:
+            yield done[job["unit"]] if job["unit"] in done else entry_for(job, outcomes[job["unit"]])
@@ -1,4 +1,5 @@
 import pytest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
 @pytest.fixture(scope="module")
@@ -8,4 +9,97 @@ def test_config():
         "organization": "test_org",
         "storage_connection_string": "test_conn_str",
         "container_name": "test_container"
-    }
\ No newline at end of file
+    }
+
+class FakeBlob:
+    """In-memory stand-in for azure.storage.blob.BlobClient"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.staged = {}
+
+    def upload_blob(self, data, overwrite=False, content_settings=None, **kwargs):
+        data = data.encode() if isinstance(data, str) else bytes(data)
+        self.store.put(self.name, data, content_settings)
+
+    def stage_block(self, block_id, data, length=None, **kwargs):
+        self.store.calls.append(("stage_block", self.name))
+        self.staged[block_id] = bytes(data)
+
+    def commit_block_list(self, block_list, content_settings=None, **kwargs):
+        data = b"".join(self.staged.pop(block.id) for block in block_list)
+        self.store.put(self.name, data, content_settings)
+
+    def get_blob_properties(self, **kwargs):
+        from azure.core.exceptions import ResourceNotFoundError
+        if self.name not in self.store.blobs:
+            raise ResourceNotFoundError("blob not found")
+        data, settings = self.store.blobs[self.name]
+        return SimpleNamespace(size=len(data), content_settings=settings or SimpleNamespace(content_md5=None))
+
+    def download_blob(self, offset=None, length=None, **kwargs):
+        data, _ = self.store.blobs[self.name]
+        start = offset or 0
+        end = start + length if length is not None else len(data)
+        return FakeDownload(data[start:end])
+
+    def delete_blob(self, **kwargs):
+        self.store.blobs.pop(self.name, None)
+
+
+class FakeDownload:
+    def __init__(self, data):
+        self.data = data
+
+    def readall(self):
+        return self.data
+
+    def chunks(self):
+        for i in range(0, len(self.data), 7):
+            yield self.data[i:i + 7]
+
+
+class FakeContainer:
+    def __init__(self, store, container_name="backups"):
+        self.store = store
+        self.container_name = container_name
+
+    def exists(self):
+        self.store.calls.append(("exists", None))
+        return self.store.created
+
+    def create_container(self):
+        self.store.created = True
+
+    def get_blob_client(self, blob):
+        return FakeBlob(self.store, blob)
+
+    def list_blobs(self, name_starts_with=None, **kwargs):
+        for name in sorted(self.store.blobs):
+            if name_starts_with is None or name.startswith(name_starts_with):
+                yield SimpleNamespace(name=name, size=len(self.store.blobs[name][0]))
+
+
+class FakeBlobService:
+    """Azurite-style in-memory stand-in for BlobServiceClient (single container)"""
+
+    def __init__(self):
+        self.blobs = {}
+        self.calls = []
+        self.created = False
+
+    def put(self, name, data, content_settings):
+        self.calls.append(("put", name))
+        self.blobs[name] = (data, content_settings)
+
+    def get_container_client(self, container_name):
+        return FakeContainer(self, container_name)
+
+    def get_blob_client(self, container, blob):
+        return FakeBlob(self, blob)
+
+
+@pytest.fixture
+def blob_service():
+    return FakeBlobService()
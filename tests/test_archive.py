@@ -0,0 +1,51 @@
+import io
+import os
+import tarfile
+
+from adobackup.core.archive import ChunkReader, SnapshotArchiver, extract_archive
+
+
+def test_archive_is_a_readable_tar_gz_with_per_component_stats(tmp_path, blob_service):
+    snapshot = tmp_path / "20240101_000000"
+    (snapshot / "shards").mkdir(parents=True)
+    (snapshot / "shards" / "boards.ndjson").write_text('{"type":"work_item"}\n' * 5000)
+    (snapshot / "repos" / "r.git").mkdir(parents=True)
+    (snapshot / "repos" / "r.git" / "pack").write_bytes(os.urandom(3000))
+    (snapshot / "backup_manifest.json").write_text("{}")
+
+    archiver = SnapshotArchiver(block_size=4096, max_workers=3)
+    summary = archiver.archive_to_file(snapshot)
+
+    with tarfile.open(summary["path"], "r:gz") as tar:
+        names = tar.getnames()
+        assert tar.extractfile("20240101_000000/repos/r.git/pack").read() == (snapshot / "repos" / "r.git" / "pack").read_bytes()
+    assert sorted(names) == [
+        "20240101_000000/backup_manifest.json",
+        "20240101_000000/repos/r.git/pack",
+        "20240101_000000/shards/boards.ndjson",
+    ]
+    assert summary["components"]["shards"]["ratio"] > 10
+    assert set(summary["components"]) == {".", "repos", "shards"}
+
+    archiver.archive_to_blob(snapshot, blob_service.get_blob_client("backups", "snap.tar.gz"))
+    assert blob_service.blobs["snap.tar.gz"][0] == open(summary["path"], "rb").read()
+
+
+def test_archive_keeps_file_modes_and_extracts_from_a_chunk_stream(tmp_path):
+    snapshot = tmp_path / "20240101_000000"
+    hook = snapshot / "repos" / "P" / "r.git" / "hooks" / "post-update"
+    hook.parent.mkdir(parents=True)
+    hook.write_text("#!/bin/sh\n")
+    hook.chmod(0o755)
+    (snapshot / "shards").mkdir()
+    (snapshot / "shards" / "boards.ndjson").write_text('{"type":"work_item"}\n' * 500)
+
+    output = io.BytesIO()
+    SnapshotArchiver(block_size=1024, max_workers=2).write(snapshot, output)
+    data = output.getvalue()
+    chunks = (data[i:i + 100] for i in range(0, len(data), 100))
+
+    extract_archive(io.BufferedReader(ChunkReader(chunks)), tmp_path / "out")
+    restored = tmp_path / "out" / "20240101_000000"
+    assert (restored / "shards" / "boards.ndjson").read_bytes() == (snapshot / "shards" / "boards.ndjson").read_bytes()
+    assert os.stat(restored / "repos" / "P" / "r.git" / "hooks" / "post-update").st_mode & 0o777 == 0o755
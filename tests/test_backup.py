@@ -1,5 +1,8 @@
+import json
+import threading
+
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
 # Use absolute import path
 from src.adobackup.core.backup_engine import BackupEngine
@@ -7,7 +10,68 @@ from src.adobackup.core.backup_engine import BackupEngine
 @pytest.fixture
 def mock_engine():
     with patch('azure.devops.connection.Connection'):
-        yield BackupEngine(MagicMock())
+        yield BackupEngine("test_org", "dummy_pat")
 
 def test_backup_init(mock_engine):
-    assert isinstance(mock_engine, BackupEngine)
\ No newline at end of file
+    assert isinstance(mock_engine, BackupEngine)
+
+class _SlowModule:
+    # Set by a test to make every instance wait until all of them are running at once
+    barrier = None
+
+    def __init__(self, connection, **kwargs):
+        pass
+
+    def backup(self, backup_path):
+        if self.barrier is not None:
+            self.barrier.wait()
+        return [{"name": "slow", "status": "success"}]
+
+
+class _FailingModule:
+    def __init__(self, connection, **kwargs):
+        pass
+
+    def backup(self, backup_path):
+        raise RuntimeError("boom")
+
+
+def test_backup_all_concurrent_isolates_failures(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = BackupEngine("test_org", "dummy_pat")
+    engine.module_map = {"Boards": _FailingModule, "Repos": _SlowModule, "Wikis": _SlowModule}
+    # Breaks with an error unless Repos and Wikis really run at the same time
+    monkeypatch.setattr(_SlowModule, "barrier", threading.Barrier(2, timeout=5))
+
+    results, manifest_path = engine.backup_all(["Wikis", "Repos", "Boards"], max_workers=3)
+
+    assert list(results["metadata"]["timings"]) == ["Boards", "Repos", "Wikis"]
+    assert results["metadata"]["errors"] == {"Boards": "boom"}
+    assert list(results["data"]) == ["repos", "wikis"]
+    assert results["data"]["repos"] == {"shard": "shards/repos.ndjson", "records": 1, "bytes": 35}
+    assert (tmp_path / manifest_path).exists()
+    shard = tmp_path / results["metadata"]["snapshot"] / "shards" / "repos.ndjson"
+    assert [json.loads(line) for line in shard.read_text().splitlines()] == [{"name": "slow", "status": "success"}]
+
+
+def test_resume_reruns_only_unfinished_components(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = BackupEngine("test_org", "dummy_pat")
+    engine.module_map = {"Boards": _FailingModule, "Repos": _SlowModule}
+    results, _ = engine.backup_all(["Boards", "Repos"])
+    assert results["metadata"]["errors"] == {"Boards": "boom"}
+
+    runs = []
+
+    class _CountingModule(_SlowModule):
+        def backup(self, backup_path):
+            runs.append(backup_path)
+            return super().backup(backup_path)
+
+    engine.module_map = {"Boards": _CountingModule, "Repos": _CountingModule}
+    resumed, _ = engine.backup_all(["Boards", "Repos"], resume=results["metadata"]["date"])
+
+    assert resumed["metadata"]["resumed"] and resumed["metadata"]["errors"] == {}
+    assert resumed["metadata"]["snapshot"] == results["metadata"]["snapshot"]
+    assert len(runs) == 1
+    assert resumed["data"]["repos"] == results["data"]["repos"]
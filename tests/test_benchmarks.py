@@ -0,0 +1,155 @@
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from benchmarks.fake_ado import FakeAzureDevOps
+from benchmarks.synthetic import SyntheticOrg
+from adobackup import cli
+from adobackup.core.backup_engine import BackupEngine
+from adobackup.core.restore_engine import RestoreEngine
+from adobackup.core.scope import RestoreScope
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is required")
+
+
+def test_backup_and_restore_against_fake_org(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=2, repos=1, commits=3,
+                                   work_items=30, iterations=2, pipelines=1, test_plans=0, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target], page_size=10) as server:
+        engine = BackupEngine("src", "pat", base_url=server.org_url("src"))
+        results, _ = engine.backup_all(["Boards", "Repos", "Pipelines"])
+        engine.save_to_local(results)
+        assert results["metadata"]["errors"] == {}
+        assert results["data"]["boards"]["records"] == 2 + 4 + 60
+        assert server.stats()["calls"]["GET work_items"] == 2
+
+        restore = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        assert restore.restore_all("Local Storage")
+
+    assert target.size()["projects"] == 2
+    assert target.size()["repos"] == 2
+    assert target.size()["work_items"] == 60
+    assert sum(len(wi["relations"]) for wi in target.work_items.values()) == 58
+    for project in target.projects.values():
+        [pipeline] = project["pipelines"]
+        [repo] = project["repos"]
+        assert pipeline["configuration"]["path"] == f"/{pipeline['name']}.yml"
+        assert pipeline["configuration"]["repository"]["id"] == repo["id"]
+
+
+def test_scoped_restore_only_touches_one_projects_repos(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=3, repos=2, commits=2,
+                                   work_items=20, iterations=2, pipelines=0, test_plans=0, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target]) as server:
+        engine = BackupEngine("src", "pat", base_url=server.org_url("src"))
+        results, _ = engine.backup_all(["Boards", "Repos"])
+        engine.save_to_local(results)
+        server.reset_stats()
+
+        restore = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        assert restore.restore_all("Local Storage", scope=RestoreScope(components=["Repos"], projects=["Project002"]))
+        calls = server.stats()["calls"]
+
+    assert list(target.projects) == [target.project("Project002")["id"]]
+    assert [r["name"] for r in target.project("Project002")["repos"]] == ["Project002-repo01", "Project002-repo02"]
+    assert target.size()["work_items"] == 0
+    assert not any(route.endswith(("iterations", "work_item_batch", "wiql")) for route in calls)
+    assert restore.report["scope"]["projects"] == ["Project002"]
+
+
+def test_same_named_repos_in_two_projects_are_mirrored_separately(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=2, repos=0, work_items=0,
+                                   iterations=0, pipelines=0, test_plans=0, wikis=0)
+    for seed, project in enumerate(("Project001", "Project002"), start=1):
+        source.add_repo(project, "shared", commits=2, seed=seed)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target]) as server:
+        engine = BackupEngine("src", "pat", base_url=server.org_url("src"))
+        results, _ = engine.backup_all(["Boards", "Repos"])
+        engine.save_to_local(results)
+        restore = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        assert restore.restore_all("Local Storage")
+
+    assert (Path(results["metadata"]["snapshot"]) / "repos" / "Project001" / "shared.git").is_dir()
+    assert (Path(results["metadata"]["snapshot"]) / "repos" / "Project002" / "shared.git").is_dir()
+    shard = Path(results["metadata"]["snapshot"]) / results["data"]["repos"]["shard"]
+    # Posix separators on every platform: blob bundle and store lookups are keyed by them
+    assert [json.loads(line)["path"] for line in shard.read_text().splitlines()] == [
+        "repos/Project001/shared.git", "repos/Project002/shared.git"
+    ]
+    for project in ("Project001", "Project002"):
+        [source_repo] = source.project(project)["repos"]
+        [target_repo] = target.project(project)["repos"]
+        heads = [
+            subprocess.run(["git", "-C", str(repo["path"]), "rev-parse", "main"], capture_output=True, text=True).stdout
+            for repo in (source_repo, target_repo)
+        ]
+        assert heads[0] and heads[0] == heads[1]
+
+
+def test_a_pipeline_whose_repository_is_missing_fails_alone(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=2, repos=1, commits=1, work_items=0,
+                                   iterations=0, pipelines=1, test_plans=0, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target]) as server:
+        engine = BackupEngine("src", "pat", base_url=server.org_url("src"))
+        results, _ = engine.backup_all(["Boards", "Repos", "Pipelines"])
+        engine.save_to_local(results)
+        # The repositories are never restored, so no pipeline can point at one
+        code = cli.restore("dst", "pat", base_url=server.org_url("dst"), components=["Pipelines"])
+
+    assert code == 1
+    assert "2 failed pipelines" in capsys.readouterr().out
+    assert target.size()["projects"] == 2
+    assert target.size()["pipelines"] == 0
+
+
+def test_delta_restore_writes_only_what_differs(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=1, repos=0, work_items=10,
+                                   iterations=1, pipelines=0, test_plans=0, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target]) as server:
+        engine = BackupEngine("src", "pat", base_url=server.org_url("src"))
+        results, _ = engine.backup_all(["Boards"])
+        engine.save_to_local(results)
+        RestoreEngine("dst", "pat", base_url=server.org_url("dst")).restore_all("Local Storage")
+        links = sum(len(wi["relations"]) for wi in target.work_items.values())
+
+        edited = next(iter(target.work_items.values()))
+        edited["fields"]["System.Title"] = "Edited in target"
+        assert cli.restore("dst", "pat", base_url=server.org_url("dst"), dry_run=True) == 0
+        assert edited["fields"]["System.Title"] == "Edited in target"
+
+        server.reset_stats()
+        delta = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        assert delta.restore_all("Local Storage", delta=True)
+        server.reset_stats()
+        rerun = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        assert rerun.restore_all("Local Storage", delta=True)
+        calls = server.stats()["calls"]
+
+    assert "🧮 Work items: 0 to create, 1 to update, 9 unchanged, 0 links to add (about 2 API calls)" in capsys.readouterr().out
+    plan = delta.report["plan"]
+    assert (plan["create"], plan["update"], plan["skip"], plan["links"]) == (0, 1, 9, 0)
+    assert plan["total_api_calls"] == 2
+    assert delta.report["work_items"]["updated"] == 1
+    assert edited["fields"]["System.Title"] != "Edited in target"
+    assert (rerun.report["plan"]["create"], rerun.report["plan"]["update"], rerun.report["plan"]["skip"]) == (0, 0, 10)
+    assert target.size()["work_items"] == 10
+    assert sum(len(wi["relations"]) for wi in target.work_items.values()) == links
+    assert not any(route.endswith("work_item_batch") for route in calls)
@@ -0,0 +1,135 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from adobackup.modules.boards import BoardsModule
+
+
+def _item(item_id, title):
+    return SimpleNamespace(id=item_id, rev=1, fields={"System.Title": title, "System.WorkItemType": "Task"},
+                           relations=[SimpleNamespace(rel="System.LinkTypes.Hierarchy-Reverse", url="u", attributes={})])
+
+
+def _module(ids, items, deleted=()):
+    connection = MagicMock()
+    module = BoardsModule(connection, incremental=True)
+    module.core_client.get_projects.return_value = [SimpleNamespace(id="p1", name="Proj")]
+    module.core_client.get_teams.return_value = []
+    module.wit_client.query_by_wiql.return_value = SimpleNamespace(
+        work_items=[SimpleNamespace(id=i) for i in ids]
+    )
+    module.wit_client.get_work_items.return_value = items
+    module.wit_client.get_deleted_work_item_shallow_references.return_value = [
+        SimpleNamespace(id=i) for i in deleted
+    ]
+    return module
+
+
+def test_incremental_backup_merges_changes_and_deletions(tmp_path):
+    first = tmp_path / "20240101_000000"
+    first.mkdir()
+    full = _module([1, 2, 3], [_item(1, "a"), _item(2, "b"), _item(3, "c")])
+    full.backup(first)
+    first_query = full.wit_client.query_by_wiql.call_args[0][0].query
+    assert "System.ChangedDate] >=" not in first_query
+
+    second = tmp_path / "20240102_000000"
+    second.mkdir()
+    nightly = _module([2], [_item(2, "b2")], deleted=[3])
+    data = nightly.backup(second)
+
+    query = nightly.wit_client.query_by_wiql.call_args[0][0].query
+    assert "System.ChangedDate] >=" in query
+    assert [(wi["id"], wi["fields"]["System.Title"]) for wi in data["work_items"]] == [(1, "a"), (2, "b2")]
+
+    state = json.loads((second / "boards" / "state.json").read_text())
+    assert state["p1"]["changed"] == 1
+    assert state["p1"]["deleted"] == 1
+
+
+def test_work_item_ids_are_paged_past_the_wiql_cap(tmp_path):
+    from adobackup.modules import boards
+
+    module = _module([], [])
+    module.incremental = False
+    first_page = SimpleNamespace(work_items=[SimpleNamespace(id=i) for i in range(1, boards.WIQL_LIMIT + 1)])
+    last_page = SimpleNamespace(work_items=[SimpleNamespace(id=boards.WIQL_LIMIT + 1)])
+    module.wit_client.query_by_wiql.side_effect = [first_page, last_page]
+    module.wit_client.get_work_items.side_effect = lambda ids, **kwargs: [_item(i, "t") for i in ids]
+
+    data = module.backup(tmp_path)
+
+    assert len(data["work_items"]) == boards.WIQL_LIMIT + 1
+    second_query = module.wit_client.query_by_wiql.call_args_list[1][0][0].query
+    assert f"[System.Id] > {boards.WIQL_LIMIT}" in second_query
+    assert module.wit_client.get_work_items.call_args.kwargs["expand"] == "All"
+    assert data["work_items"][0]["relations"][0]["rel"] == "System.LinkTypes.Hierarchy-Reverse"
+
+
+def test_interrupted_work_item_fetch_resumes_after_last_batch(tmp_path, monkeypatch):
+    from adobackup.modules import boards
+    from adobackup.modules.journal import RunJournal
+
+    monkeypatch.setattr(boards, "WORK_ITEM_BATCH", 2)
+    calls = []
+
+    def flaky(ids, **kwargs):
+        calls.append(list(ids))
+        if ids == [5] and len(calls) < 4:
+            raise RuntimeError("connection reset")
+        return [_item(i, "t") for i in ids]
+
+    journal = RunJournal(tmp_path / "journal.ndjson")
+    module = _module([1, 2, 3, 4, 5], [])
+    module.incremental = False
+    module.journal = journal.scope("Boards")
+    module.wit_client.get_work_items.side_effect = flaky
+    assert module.backup(tmp_path)["work_items"] == []
+    journal.close()
+
+    journal = RunJournal(tmp_path / "journal.ndjson")
+    module.journal = journal.scope("Boards")
+    module.wit_client.query_by_wiql.reset_mock()
+    data = module.backup(tmp_path)
+
+    assert [wi["id"] for wi in data["work_items"]] == [1, 2, 3, 4, 5]
+    assert sorted(calls) == [[1, 2], [3, 4], [5], [5]]
+    module.wit_client.query_by_wiql.assert_not_called()
+    assert not (tmp_path / "boards" / "work_items" / "p1.ids.json").exists()
+
+
+def test_projects_run_concurrently_but_merge_in_listing_order(tmp_path):
+    import threading
+    import time
+
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow_teams(project_id):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        # Earlier projects finish last, so completion order is the reverse of listing order
+        time.sleep(0.05 * (5 - int(project_id[1:])))
+        with lock:
+            active[0] -= 1
+        return []
+
+    module = _module([], [])
+    module.incremental = False
+    module.project_workers = 3
+    module.core_client.get_projects.return_value = [SimpleNamespace(id=f"p{n}", name=f"Proj{n}") for n in range(5)]
+    module.core_client.get_teams.side_effect = slow_teams
+    module.wit_client.query_by_wiql.side_effect = lambda wiql, team_context, **kwargs: SimpleNamespace(
+        work_items=[SimpleNamespace(id=int(team_context.project[4:]) * 10 + i) for i in (1, 2)]
+    )
+    module.wit_client.get_work_items.side_effect = lambda ids, **kwargs: [_item(i, "t") for i in ids]
+
+    data = module.backup(tmp_path)
+
+    assert peak[0] == 3
+    assert [p["name"] for p in data["projects"]] == [f"Proj{n}" for n in range(5)]
+    assert all(p["seconds"] > 0 for p in data["projects"])
+    assert [wi["id"] for wi in data["work_items"]] == [1, 2, 11, 12, 21, 22, 31, 32, 41, 42]
+    state = json.loads((tmp_path / "boards" / "state.json").read_text())
+    assert list(state) == [f"p{n}" for n in range(5)]
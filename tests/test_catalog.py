@@ -0,0 +1,162 @@
+import datetime as dt
+import shutil
+import subprocess
+
+import pytest
+
+from benchmarks.fake_ado import FakeAzureDevOps
+from benchmarks.synthetic import SyntheticOrg
+from adobackup import cli
+from adobackup.core import backup_engine
+from adobackup.core.backup_reader import BackupReader
+from adobackup.core.catalog import SnapshotCatalog
+from adobackup.core.chunk_store import ChunkStore, LocalObjectBackend
+from adobackup.core.restore_engine import RestoreEngine
+
+
+class Clock(dt.datetime):
+    """datetime whose now() advances a day per call, so back-to-back runs get distinct snapshot names"""
+    calls = 0
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.calls += 1
+        return dt.datetime(2024, 1, cls.calls)
+
+
+def test_catalog_tracks_entity_history_and_restores_one_entity(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backup_engine, "datetime", Clock)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=2, repos=0, work_items=5,
+                                   iterations=1, pipelines=0, test_plans=0, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target]) as server:
+        engine = backup_engine.BackupEngine("src", "pat", base_url=server.org_url("src"))
+        engine.backup_all(["Boards"])
+        source.work_items[3]["rev"] = 2
+        source.work_items[3]["fields"]["System.Title"] = "Renamed"
+        engine.backup_all(["Boards"])
+
+        with SnapshotCatalog("backups/catalog.sqlite") as catalog:
+            snapshots = catalog.snapshots()
+            history = catalog.history("work_item", 3)
+            unchanged = catalog.history("work_item", 4)
+            project_history = catalog.history("project", "Project001")
+            location = catalog.locate("work_item", 3, snapshot=snapshots[1]["name"])
+            assert catalog.load(location)["fields"]["System.Title"] != "Renamed"
+
+        restore = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        restore.restore_entity("project", "Project001")
+        restored = restore.restore_entity("work_item", 3)
+
+    assert [s["name"] for s in snapshots] == ["20240102_000000", "20240101_000000"]
+    assert snapshots[0]["entities"] == 2 + 2 + 10
+    assert [v["changed"] for v in history] == [True, True]
+    assert [v["changed"] for v in unchanged] == [True, False]
+    assert [v["changed"] for v in project_history] == [True, False]
+    assert restored["fields"]["System.Title"] == "Renamed"
+    assert [wi["fields"]["System.Title"] for wi in target.work_items.values()] == ["Renamed"]
+
+    assert cli.main(["catalog", "history", "work_item", "3"]) == 0
+    assert "changed" in capsys.readouterr().out
+    (tmp_path / "backups" / "catalog.sqlite").unlink()
+    assert cli.main(["catalog", "rebuild"]) == 0
+    assert "2 snapshot(s)" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is required")
+def test_committed_snapshots_are_pruned_and_restored_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backup_engine, "datetime", Clock)
+    monkeypatch.setattr(Clock, "calls", 0)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=1, repos=1, commits=2, work_items=3,
+                                   iterations=1, pipelines=0, test_plans=0, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target]) as server:
+        store = ChunkStore(LocalObjectBackend("backups/store"))
+        engine = backup_engine.BackupEngine("src", "pat", base_url=server.org_url("src"), store=store)
+        engine.backup_all(["Boards", "Repos"])
+        engine.backup_all(["Boards", "Repos"])
+        first, second = tmp_path / "backups" / "20240101_000000", tmp_path / "backups" / "20240102_000000"
+
+        assert sorted(p.name for p in first.iterdir()) == ["backup_manifest.json", "backup_metrics.json"]
+        assert (second / "shards").is_dir()
+        reader = BackupReader.from_local(first / "backup_manifest.json")
+        assert reader.snapshot_dir is None
+        assert len(list(reader.work_items())) == 3
+        for repo in reader.repos():
+            subprocess.run(["git", "-C", repo["local_path"], "rev-parse", "HEAD"], check=True, capture_output=True)
+        reader.close()
+
+        restore = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        restore.restore_entity("project", "Project001", snapshot=first.name)
+        restore.restore_entity("repo", "Project001-repo01", snapshot=first.name)
+        restore.restore_entity("work_item", 2, snapshot=first.name)
+
+    assert [r["name"] for r in target.project("Project001")["repos"]] == ["Project001-repo01"]
+    assert len(target.work_items) == 1
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is required")
+def test_snapshots_pruned_under_a_blob_store_are_restored_from_it(tmp_path, monkeypatch, blob_service):
+    from adobackup.core import storage_manager
+    from adobackup.core.transfer import BlobTransfer
+
+    storage = storage_manager.StorageManager(
+        "DefaultEndpointsProtocol=https;AccountName=test;AccountKey=dGVzdA==;EndpointSuffix=core.windows.net"
+    )
+    storage.client = blob_service
+    storage.transfer = BlobTransfer(blob_service)
+    monkeypatch.setattr(storage_manager, "StorageManager", lambda *args, **kwargs: storage)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backup_engine, "datetime", Clock)
+    monkeypatch.setattr(Clock, "calls", 0)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=1, repos=1, commits=2, work_items=3,
+                                   iterations=1, pipelines=0, test_plans=0, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+
+    with FakeAzureDevOps([source, target]) as server:
+        engine = backup_engine.BackupEngine("src", "pat", base_url=server.org_url("src"),
+                                            store=storage.chunk_store("dedupe-store"))
+        engine.backup_all(["Boards", "Repos"])
+        engine.backup_all(["Boards", "Repos"])
+        first = tmp_path / "backups" / "20240101_000000"
+        assert sorted(p.name for p in first.iterdir()) == ["backup_manifest.json", "backup_metrics.json"]
+        assert not (tmp_path / "backups" / "store").exists()
+
+        restore = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        restore.restore_entity("project", "Project001", snapshot=first.name)
+        restore.restore_entity("repo", "Project001-repo01", snapshot=first.name)
+        restored = restore.restore_entity("work_item", 2, snapshot=first.name)
+
+    assert restored["id"] == 2
+    assert [r["name"] for r in target.project("Project001")["repos"]] == ["Project001-repo01"]
+    assert len(target.work_items) == 1
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is required")
+def test_restore_entity_recreates_one_pipeline_against_the_target_repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = SyntheticOrg.generate("src", tmp_path / "remote" / "src", projects=1, repos=1, commits=2, work_items=0,
+                                   iterations=0, pipelines=2, test_plans=1, suites=1, cases=1, wikis=0)
+    target = SyntheticOrg("dst", tmp_path / "remote" / "dst")
+    [_, second] = source.project("Project001")["pipelines"]
+
+    with FakeAzureDevOps([source, target]) as server:
+        engine = backup_engine.BackupEngine("src", "pat", base_url=server.org_url("src"))
+        results, _ = engine.backup_all(["Boards", "Repos", "Pipelines", "TestPlans"])
+        assert results["metadata"]["errors"] == {}
+
+        restore = RestoreEngine("dst", "pat", base_url=server.org_url("dst"))
+        restore.restore_entity("project", "Project001")
+        restore.restore_entity("repo", "Project001-repo01")
+        restored = restore.restore_entity("pipeline", second["id"])
+        with pytest.raises(ValueError, match="test_plan records is not supported"):
+            restore.restore_entity("test_plan", 1)
+
+    [pipeline] = target.project("Project001")["pipelines"]
+    [repo] = target.project("Project001")["repos"]
+    assert restored["name"] == pipeline["name"] == second["name"]
+    assert pipeline["configuration"]["repository"]["id"] == repo["id"]
@@ -0,0 +1,87 @@
+import json
+import sys
+
+import pytest
+
+from adobackup import cli
+
+
+def test_config_file_is_overridden_by_flags(tmp_path):
+    config = tmp_path / "adobackup.json"
+    config.write_text(json.dumps({"org": "contoso", "components": ["repos", "Boards"], "workers": 3, "archive": True}))
+
+    args = cli.build_parser().parse_args(["backup", "--config", str(config), "--workers", "2", "--no-archive"])
+    options = cli.load_options(args)
+
+    assert options["org"] == "contoso"
+    assert options["workers"] == 2
+    assert options["archive"] is False
+    assert options["incremental"] is True
+    assert cli.parse_components(options["components"]) == ["Repos", "Boards"]
+    assert cli.parse_components("all") == cli.COMPONENTS
+    with pytest.raises(ValueError):
+        cli.parse_components("Boards,Dashboards")
+
+
+def test_headless_backup_imports_only_what_it_uses(tmp_path):
+    import os
+    import subprocess
+    from pathlib import Path
+    from benchmarks.fake_ado import FakeAzureDevOps
+    from benchmarks.synthetic import SyntheticOrg
+
+    # A fresh interpreter, as in benchmarks/startup.py: this one has imported every module already
+    probe = (
+        "import sys\n"
+        "from adobackup import cli\n"
+        "code = cli.main(['backup', '--org', 'src', '--base-url', sys.argv[1], '--components', 'boards'])\n"
+        "print(code, ' '.join(m for m in ('questionary', 'adobackup.modules.boards', 'adobackup.modules.testplans')"
+        " if m in sys.modules))"
+    )
+    src = Path(cli.__file__).resolve().parent.parent
+    pythonpath = os.pathsep.join(filter(None, [str(src), os.environ.get("PYTHONPATH")]))
+    env = {**os.environ, "AZURE_DEVOPS_PAT": "pat", "PYTHONPATH": pythonpath}
+    org = SyntheticOrg.generate("src", tmp_path / "remote", projects=1, repos=0, work_items=5, wikis=0)
+
+    with FakeAzureDevOps([org]) as server:
+        result = subprocess.run([sys.executable, "-c", probe, server.org_url("src")], cwd=tmp_path, env=env,
+                                capture_output=True, text=True, check=True)
+
+    code, *imported = result.stdout.splitlines()[-1].split()
+    assert code == "0"
+    assert (tmp_path / "backups" / "latest_backup.json").exists()
+    assert imported == ["adobackup.modules.boards"]
+
+
+class _ReposModule:
+    # Set by a test to the status of the one repo this module backs up
+    status = "success"
+
+    def __init__(self, connection, **kwargs):
+        pass
+
+    def backup(self, backup_path):
+        return [{"type": "repo", "name": "shared", "status": self.status}]
+
+
+def test_backup_exits_nonzero_when_a_unit_failed(tmp_path, monkeypatch):
+    from adobackup.core.backup_engine import BackupEngine
+
+    monkeypatch.setenv("AZURE_DEVOPS_PAT", "pat")
+    monkeypatch.setattr(cli, "check_auth", lambda *args: True)
+    monkeypatch.setattr(BackupEngine, "module_map", {"Repos": _ReposModule})
+    argv = ["backup", "--org", "contoso", "--components", "repos"]
+
+    # Snapshots are named by the second, so each run gets its own directory
+    (tmp_path / "ok").mkdir()
+    monkeypatch.chdir(tmp_path / "ok")
+    assert cli.main(argv) == 0
+
+    # The component itself succeeded, but a repo is missing from the snapshot
+    (tmp_path / "failed").mkdir()
+    monkeypatch.chdir(tmp_path / "failed")
+    monkeypatch.setattr(_ReposModule, "status", "failed")
+    assert cli.main(argv) == 1
+    latest = json.loads((tmp_path / "failed" / "backups" / "latest_backup.json").read_text())
+    assert latest["metadata"]["errors"] == {}
+    assert latest["metadata"]["failed_units"] == {"Repos": 1}
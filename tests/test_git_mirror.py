@@ -0,0 +1,119 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from adobackup.modules.git_mirror import MirrorScheduler
+
+
+def _make_repo(path, files):
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    for name, content in files.items():
+        (path / name).write_text(content)
+    subprocess.run(["git", "-C", str(path), "add", "."], check=True)
+    subprocess.run([
+        "git", "-C", str(path), "-c", "user.name=t", "-c", "user.email=t@t",
+        "commit", "-q", "-m", "init"
+    ], check=True)
+
+
+def test_scheduler_mirrors_and_keeps_job_order(tmp_path):
+    small, big = tmp_path / "small", tmp_path / "big"
+    _make_repo(small, {"a.txt": "a"})
+    _make_repo(big, {"b.txt": "b" * 10000})
+    jobs = [
+        {"name": "small", "url": str(small), "dest": tmp_path / "out" / "small.git", "size": 1},
+        {"name": "big", "url": str(big), "dest": tmp_path / "out" / "big.git", "size": 10000},
+        {"name": "missing", "url": str(tmp_path / "nope"), "dest": tmp_path / "out" / "nope.git"},
+    ]
+
+    results = MirrorScheduler(max_workers=2).run(jobs)
+
+    assert [r["status"] for r in results] == ["success", "success", "failed"]
+    assert results[1]["bytes"] > 0
+    assert (tmp_path / "out" / "big.git" / "HEAD").exists()
+
+
+def test_scheduler_reuses_previous_mirror(tmp_path):
+    origin = tmp_path / "origin"
+    _make_repo(origin, {"a.txt": "a"})
+    scheduler = MirrorScheduler(max_workers=1)
+    first = tmp_path / "s1" / "r.git"
+    scheduler.run([{"name": "r", "url": str(origin), "dest": first}])
+
+    second = tmp_path / "s2" / "r.git"
+    [unchanged] = scheduler.run([{"name": "r", "url": str(origin), "dest": second, "previous": first}])
+    assert unchanged["mode"] == "unchanged"
+
+    (origin / "b.txt").write_text("b")
+    subprocess.run(["git", "-C", str(origin), "add", "."], check=True)
+    subprocess.run([
+        "git", "-C", str(origin), "-c", "user.name=t", "-c", "user.email=t@t",
+        "commit", "-q", "-m", "second"
+    ], check=True)
+
+    third = tmp_path / "s3" / "r.git"
+    [fetched] = scheduler.run([{"name": "r", "url": str(origin), "dest": third, "previous": second}])
+    assert fetched["mode"] == "fetch"
+    head = subprocess.run(["git", "-C", str(origin), "rev-parse", "HEAD"], capture_output=True, text=True).stdout
+    log = subprocess.run(["git", "-C", str(third), "log", "--all", "--format=%H"], capture_output=True, text=True).stdout
+    assert head.strip() in log
+
+
+def test_scheduler_only_clears_a_dest_its_journal_started(tmp_path):
+    from adobackup.modules.journal import RunJournal
+
+    origin = tmp_path / "origin"
+    _make_repo(origin, {"a.txt": "a"})
+    journal = RunJournal(tmp_path / "journal.ndjson").scope("repos")
+    foreign = tmp_path / "out" / "P" / "r.git"
+    foreign.mkdir(parents=True)
+    (foreign / "keep.txt").write_text("not ours")
+
+    [refused] = MirrorScheduler(max_workers=1).run(
+        [{"name": "r", "unit": "P/r", "url": str(origin), "dest": foreign}], journal=journal
+    )
+    assert refused["status"] == "failed"
+    assert (foreign / "keep.txt").exists()
+
+    partial = tmp_path / "out" / "Q" / "r.git"
+    journal.record("Q/r:started", {"dest": str(partial)})
+    partial.mkdir(parents=True)
+    (partial / "HEAD").write_text("torn")
+    [resumed] = MirrorScheduler(max_workers=1).run(
+        [{"name": "r", "unit": "Q/r", "url": str(origin), "dest": partial}], journal=journal
+    )
+    assert resumed["status"] == "success"
+    assert (partial / "objects").is_dir()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the fake git is a shell script")
+def test_throttled_clone_is_retried_after_backing_off(tmp_path, monkeypatch):
+    from adobackup.modules.rate_limit import AdaptiveLimiter
+
+    origin = tmp_path / "origin"
+    _make_repo(origin, {"a.txt": "a"})
+    fake = tmp_path / "bin" / "git"
+    fake.parent.mkdir()
+    fake.write_text(
+        "#!/bin/sh\n"
+        f'if [ "$1" = clone ] && [ ! -e "{tmp_path}/throttled" ]; then\n'
+        f'  touch "{tmp_path}/throttled"; mkdir -p "$4"\n'
+        "  echo 'fatal: The requested URL returned error: 429' >&2; exit 128\n"
+        "fi\n"
+        f'exec {shutil.which("git")} "$@"\n'
+    )
+    fake.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{fake.parent}{os.pathsep}{os.environ['PATH']}")
+    sleeps = []
+    limiter = AdaptiveLimiter(initial=4, max_limit=4)
+
+    [result] = MirrorScheduler(max_workers=1, limiter=limiter, sleep=sleeps.append).run(
+        [{"name": "r", "url": str(origin), "dest": tmp_path / "out" / "r.git"}]
+    )
+
+    assert result["status"] == "success"
+    assert len(sleeps) == 1 and sleeps[0] > 0
+    assert limiter.stats()["throttled"] == 1
+    assert (tmp_path / "out" / "r.git" / "HEAD").exists()
@@ -0,0 +1,112 @@
+import io
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from adobackup.modules.http_client import ThrottledSession
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Transport adapter answering from a list of (status, headers, body)"""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        status, headers, body = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = json.dumps(body).encode()
+        response.raw = io.BytesIO(response._content)
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def _session(script, **kwargs):
+    sleeps = []
+    session = ThrottledSession(pat="secret", sleep=sleeps.append, **kwargs)
+    adapter = ScriptedAdapter(script)
+    session.mount("https://", adapter)
+    return session, adapter, sleeps
+
+
+def test_retries_429_honouring_retry_after_and_counts():
+    session, adapter, sleeps = _session([
+        (429, {"Retry-After": "7"}, {}),
+        (200, {"X-RateLimit-Delay": "0.5"}, {"value": [1]}),
+    ])
+
+    response = session.get("https://dev.azure.com/org/_apis/projects")
+
+    assert response.json() == {"value": [1]}
+    assert len(adapter.sent) == 2
+    assert sleeps[0] == pytest.approx(7, abs=0.1)
+    stats = session.stats()
+    assert stats["requests"] == 2 and stats["retries"] == 1 and stats["throttled"] == 1
+    # The Retry-After wait plus the server-side delay, each counted once
+    assert stats["throttled_seconds"] == pytest.approx(7.5, abs=0.1)
+    assert adapter.sent[0].headers["Authorization"].startswith("Basic ")
+
+
+def test_exhausted_retries_return_last_response():
+    session, adapter, sleeps = _session([(503, {}, {})], max_retries=2, backoff=1, max_backoff=4)
+
+    response = session.get("https://dev.azure.com/org/_apis/projects")
+
+    assert response.status_code == 503
+    assert len(adapter.sent) == 3
+    assert all(0.5 <= s <= 4 for s in sleeps)
+    assert session.stats()["throttled"] == 0
+
+
+def test_post_is_not_resent_after_a_server_error():
+    session, adapter, sleeps = _session([(502, {}, {}), (200, {}, {})])
+
+    response = session.post("https://dev.azure.com/org/_apis/wit/$batch", json=[])
+
+    assert response.status_code == 502
+    assert len(adapter.sent) == 1
+    assert sleeps == [] and session.stats()["retries"] == 0
+
+
+def test_post_is_resent_when_rejected_by_throttling():
+    session, adapter, sleeps = _session([(503, {}, {}), (429, {"Retry-After": "2"}, {}), (200, {}, {})])
+
+    response = session.post("https://dev.azure.com/org/_apis/wit/$batch", json=[])
+
+    assert response.status_code == 200
+    assert len(adapter.sent) == 3
+    assert sleeps[1] == pytest.approx(2, abs=0.1)
+
+
+def test_sdk_clients_share_the_pooled_session():
+    from azure.devops.v7_1.core import CoreClient
+    from msrest.authentication import BasicAuthentication
+
+    session, adapter, _ = _session([(200, {}, {"count": 1, "value": [{"name": "P"}]})])
+    client = session.attach(CoreClient("https://dev.azure.com/org", BasicAuthentication("", "secret")))
+
+    assert client._client.config.pipeline._sender.driver.session is session
+    assert client._client.config.keep_alive
+
+
+def test_attach_fails_clearly_without_the_msrest_driver():
+    from azure.devops.v7_1.core import CoreClient
+    from msrest.authentication import BasicAuthentication
+
+    session, _, _ = _session([(200, {}, {})])
+    client = CoreClient("https://dev.azure.com/org", BasicAuthentication("", "secret"))
+    client._client.config.pipeline._sender = object()
+
+    with pytest.raises(RuntimeError, match="msrest"):
+        session.attach(client)
@@ -0,0 +1,63 @@
+import json
+
+from adobackup.modules.metrics import Metrics
+
+
+def test_report_and_prometheus_textfile(tmp_path):
+    metrics = Metrics()
+    with metrics.phase("Repos"):
+        pass
+    metrics.add("git_bytes", 100, component="Repos", mode="clone")
+    metrics.add("git_bytes", 50, component="Repos", mode="clone")
+    metrics.observe_request("get", "wit/workitems", 200, 0.07)
+    metrics.observe_request("get", "wit/workitems", 429, 3.0)
+    metrics.observe_request("post", "wit/$batch", None, 0.2)
+
+    report = metrics.write_json(tmp_path / "report.json", snapshot="s1")
+    assert json.loads((tmp_path / "report.json").read_text())["snapshot"] == "s1"
+    assert report["api_calls"] == 3
+    assert "Repos" in report["phases"]
+    assert report["counters"] == [{"name": "git_bytes", "labels": {"component": "Repos", "mode": "clone"}, "value": 150}]
+    workitems = next(a for a in report["api"] if a["route"] == "wit/workitems")
+    assert workitems["errors"] == 1 and workitems["max_seconds"] == 3.0
+    assert workitems["buckets"]["0.1"] == 1 and workitems["buckets"]["5.0"] == 1
+
+    text = metrics.write_prometheus(tmp_path / "adobackup.prom", snapshot_bytes=42).read_text()
+    assert 'adobackup_git_bytes_total{component="Repos",mode="clone"} 150' in text
+    assert 'adobackup_api_request_seconds_bucket{le="+Inf",method="GET",route="wit/workitems"} 2' in text
+    assert 'adobackup_api_errors_total{method="POST",route="wit/$batch"} 1' in text
+    assert "adobackup_snapshot_bytes 42" in text
+    assert text.count("# TYPE adobackup_git_bytes_total counter") == 1
+    assert "# TYPE adobackup_api_errors_total counter" in text
+    assert "# TYPE adobackup_snapshot_bytes gauge" in text
+    samples = {line.split("{")[0].split(" ")[0] for line in text.splitlines() if not line.startswith("#")}
+    types = {line.split()[2] for line in text.splitlines() if line.startswith("# TYPE")}
+    assert all(s in types or s.rsplit("_", 1)[0] in types for s in samples)
+    assert not (tmp_path / "adobackup.prom.tmp").exists()
+
+
+def test_backup_all_writes_metrics_next_to_manifest(tmp_path, monkeypatch):
+    from adobackup.core.backup_engine import BackupEngine
+
+    class _RepoModule:
+        def __init__(self, connection, **kwargs):
+            pass
+
+        def backup(self, backup_path):
+            return [{"type": "repo", "name": "r", "status": "success", "bytes": 1234, "mode": "fetch"}]
+
+    monkeypatch.chdir(tmp_path)
+    engine = BackupEngine("org", "pat", prometheus_path=tmp_path / "textfile" / "adobackup.prom")
+    engine.module_map = {"Repos": _RepoModule}
+    results, manifest_path = engine.backup_all(["Repos"])
+
+    report = json.loads((tmp_path / results["metadata"]["snapshot"] / "backup_metrics.json").read_text())
+    assert "Repos" in report["phases"]
+    assert {"name": "git_bytes", "labels": {"component": "Repos", "mode": "fetch"}, "value": 1234} in report["counters"]
+    assert report["http"]["requests"] == 0
+    assert (tmp_path / "textfile" / "adobackup.prom").exists()
+
+    walks = []
+    monkeypatch.setattr("adobackup.core.backup_engine.directory_size", lambda path: walks.append(path) or 0)
+    engine.write_metrics(results["metadata"]["snapshot"])
+    assert walks == []
@@ -0,0 +1,38 @@
+import json
+
+from benchmarks.fake_ado import FakeAzureDevOps
+from benchmarks.synthetic import SyntheticOrg
+from adobackup.modules.http_client import PooledConnection
+from adobackup.modules.pipelines import PipelinesModule
+
+
+def test_unchanged_revisions_are_reused_from_previous_snapshot(tmp_path):
+    org = SyntheticOrg.generate("src", tmp_path / "remote", projects=2, repos=0, work_items=0, wikis=0,
+                                test_plans=0, pipelines=3)
+    first, second = tmp_path / "backups" / "20240101_000000", tmp_path / "backups" / "20240102_000000"
+    first.mkdir(parents=True)
+    second.mkdir()
+
+    with FakeAzureDevOps([org], page_size=2) as server:
+        connection = PooledConnection(server.org_url("src"), "pat")
+        records = list(PipelinesModule(connection, incremental=True).stream(first))
+        assert [r["mode"] for r in records] == ["fetched"] * 6
+        assert server.stats()["calls"]["GET pipelines"] == 4 + 6
+
+        org.project("Project002")["pipelines"][0]["revision"] = 2
+        server.reset_stats()
+        records = list(PipelinesModule(connection, incremental=True).stream(second))
+        calls = server.stats()["calls"]
+
+    assert [r["id"] for r in records] == [1, 2, 3, 4, 5, 6]
+    assert [r["mode"] for r in records] == ["reused"] * 3 + ["fetched"] + ["reused"] * 2
+    # Two listing pages per project, then only the changed definition
+    assert calls["GET pipelines"] == 4 + 1
+    with open(second / "pipelines" / "summary.json") as f:
+        summary = json.load(f)
+    assert (summary["fetched"], summary["reused"], summary["failed"]) == (1, 5, 0)
+    project_id = records[0]["project_id"]
+    assert (second / "pipelines" / project_id / "1.json").read_text() == \
+        (first / "pipelines" / project_id / "1.json").read_text()
+    with open(second / "pipelines" / records[3]["project_id"] / "4.json") as f:
+        assert json.load(f)["revision"] == 2
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from adobackup.modules.rate_limit import AdaptiveLimiter, component_scope, current_component, submit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_limit_grows_on_healthy_calls_and_halves_once_per_cooldown_when_throttled():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(initial=4, max_limit=8, cooldown=5, clock=clock)
+
+    for _ in range(4):
+        limiter.release(limiter.acquire("Boards"), latency=0.1, key="GET wit")
+    assert limiter.limit == 5
+
+    limiter.release(limiter.acquire("Boards"), throttled=True)
+    limiter.release(limiter.acquire("Boards"), throttled=True)
+    assert limiter.limit == 2
+
+    clock.now = 10
+    for _ in range(5):
+        limiter.release(limiter.acquire("Boards"), latency=1.0, key="GET wit")
+    assert limiter.limit == 1
+    stats = limiter.stats()
+    assert stats["throttled"] == 2 and stats["decreases"] == 2 and stats["peak_limit"] == 5
+
+
+def test_free_slots_go_to_the_component_furthest_below_its_share():
+    limiter = AdaptiveLimiter(initial=2, max_limit=2, weights={"Repos": 1, "Boards": 3})
+    held = [limiter.acquire("Repos"), limiter.acquire("Repos")]
+    granted = []
+
+    def worker(component):
+        limiter.release(limiter.acquire(component))
+        granted.append(component)
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in ("Repos", "Repos", "Boards")]
+    for thread in threads:
+        thread.start()
+    while sum(limiter._waiting.values()) < 3:
+        time.sleep(0.01)
+
+    limiter.release(held.pop())
+    for thread in threads:
+        thread.join(timeout=5)
+    limiter.release(held.pop())
+    assert granted[0] == "Boards"
+
+
+def _hold_git_slot(limiter):
+    with limiter.git_slot("Repos"):
+        pass
+
+
+def test_git_processes_hold_at_most_half_the_budget():
+    limiter = AdaptiveLimiter(initial=4, max_limit=4)
+    blocked = threading.Thread(target=_hold_git_slot, args=(limiter,), daemon=True)
+    with limiter.git_slot("Repos"), limiter.git_slot("Repos"):
+        blocked.start()
+        blocked.join(timeout=0.2)
+        assert blocked.is_alive()
+        limiter.release(limiter.acquire("Boards"))
+    blocked.join(timeout=5)
+    assert not blocked.is_alive()
+
+
+def test_api_calls_keep_a_permit_when_git_holds_the_only_one():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    with limiter.git_slot("Repos"):
+        limiter.release(limiter.acquire("Boards"))
+
+    held = limiter.acquire("Boards")
+    blocked = threading.Thread(target=_hold_git_slot, args=(limiter,), daemon=True)
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+    limiter.release(held)
+    blocked.join(timeout=5)
+    assert not blocked.is_alive()
+    assert limiter.stats()["calls"] == 4
+
+
+def test_component_follows_work_onto_pool_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as pool, component_scope("Boards"):
+        assert submit(pool, current_component.get).result() == "Boards"
+        assert pool.submit(current_component.get).result() == "default"
@@ -0,0 +1,212 @@
+import json
+
+import pytest
+
+from adobackup.core.backup_reader import BackupReader, batched
+from adobackup.core.catalog import SnapshotCatalog
+from adobackup.core.scope import RestoreScope
+from adobackup.core.shards import ShardWriter
+
+
+def _write_snapshot(tmp_path):
+    snapshot = tmp_path / "backups" / "20240101_000000"
+    with ShardWriter(snapshot / "shards" / "boards.ndjson") as boards:
+        boards.write({"type": "project", "id": "p1", "name": "Proj"})
+        for i in range(5):
+            boards.write({"type": "work_item", "id": i, "fields": {}, "project": "Proj"})
+    with ShardWriter(snapshot / "shards" / "repos.ndjson") as repos:
+        repos.write({"type": "repo", "name": "r", "project": "Proj", "status": "success", "path": "repos/r.git"})
+    manifest = {
+        "metadata": {"date": "20240101_000000", "snapshot": str(snapshot)},
+        "data": {"boards": boards.summary(snapshot), "repos": repos.summary(snapshot)}
+    }
+    manifest_path = tmp_path / "backups" / "latest_backup.json"
+    manifest_path.write_text(json.dumps(manifest))
+    return snapshot, manifest_path
+
+
+def test_reader_streams_records_from_shards(tmp_path):
+    snapshot, manifest_path = _write_snapshot(tmp_path)
+    reader = BackupReader.from_local(manifest_path)
+
+    assert [p["name"] for p in reader.projects()] == ["Proj"]
+    assert [len(b) for b in batched(reader.work_items(), 2)] == [2, 2, 1]
+    [repo] = reader.repos()
+    assert repo["local_path"] == str(snapshot / "repos" / "r.git")
+
+
+def test_scoped_reader_seeks_to_cataloged_records(tmp_path):
+    snapshot, manifest_path = _write_snapshot(tmp_path)
+    manifest = json.loads(manifest_path.read_text())
+    with SnapshotCatalog(tmp_path / "catalog.sqlite") as catalog:
+        catalog.add_snapshot(snapshot, manifest)
+        reader = BackupReader.from_local(manifest_path)
+        scope = RestoreScope(components=["Boards"], projects=["Proj"], ids=[1, 3])
+        assert [wi["id"] for wi in reader.work_items(scope)] == [1, 3]
+
+        reader.catalog = catalog
+        reader._open_shard = None  # a scan would fail: records must come from catalog offsets
+        assert [wi["id"] for wi in reader.work_items(scope)] == [1, 3]
+        assert [p["name"] for p in reader.projects(scope)] == ["Proj"]
+        assert list(reader.work_items(RestoreScope(projects=["Other"]))) == []
+
+    assert not scope.includes("repos")
+    with pytest.raises(ValueError):
+        RestoreScope(components=["Wikis"])
+
+
+def test_reader_accepts_inline_legacy_manifest(tmp_path):
+    manifest_path = tmp_path / "latest_backup.json"
+    manifest_path.write_text(json.dumps({
+        "metadata": {},
+        "data": {"boards": {"projects": [{"id": "p1", "name": "Proj"}],
+                            "iterations": {"Proj": [{"name": "Sprint 1"}]},
+                            "work_items": [{"id": 1, "fields": {}, "project": "Proj"}]}}
+    }))
+    reader = BackupReader.from_local(manifest_path)
+
+    assert [i["project"] for i in reader.iterations()] == ["Proj"]
+    assert [wi["id"] for wi in reader.work_items()] == [1]
+
+
+class _FakeBatchSession:
+    def __init__(self, fail_ids=()):
+        self.calls = []
+        self.gets = []
+        self.relations = {}
+        self.next_id = 1000
+        self.fail_ids = fail_ids
+
+    def post(self, url, json=None, **kwargs):
+        from types import SimpleNamespace
+        self.calls.append(json)
+        responses = []
+        for request in json:
+            links = [op["value"] for op in request["body"] if op["path"] == "/relations/-"]
+            title = next((op["value"] for op in request["body"] if op["path"] == "/fields/System.Title"), None)
+            if links:
+                target = int(request["uri"].split("?")[0].rsplit("/", 1)[1])
+                self.relations[target].extend(links)
+                responses.append({"code": 200, "body": f'{{"id": {target}}}'})
+            elif title in self.fail_ids:
+                responses.append({"code": 400, "body": '{"message": "rule violation"}'})
+            else:
+                self.next_id += 1
+                self.relations[self.next_id] = []
+                responses.append({"code": 200, "body": f'{{"id": {self.next_id}}}'})
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: {"value": responses})
+
+    def get(self, url, params=None, **kwargs):
+        from types import SimpleNamespace
+        self.gets.append(params["ids"])
+        value = [{"id": int(i), "relations": self.relations[int(i)]} for i in params["ids"].split(",")]
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: {"value": value})
+
+
+def test_batch_restore_maps_ids_rewires_parents_and_collects_failures(tmp_path):
+    from adobackup.core.work_item_restore import WorkItemBatchRestorer, WorkItemIdMap
+
+    src = "https://dev.azure.com/src/_apis/wit/workItems"
+    items = [
+        {"id": 1, "work_item_type": "Epic", "project": "My Proj", "fields": {"System.Title": "1", "System.Rev": 3},
+         "relations": [{"rel": "System.LinkTypes.Hierarchy-Forward", "url": f"{src}/2"}]},
+        {"id": 2, "work_item_type": "User Story", "project": "My Proj", "fields": {"System.Title": "2"},
+         "relations": [{"rel": "System.LinkTypes.Hierarchy-Reverse", "url": f"{src}/1"}]},
+        {"id": 3, "work_item_type": "Task", "project": "My Proj", "fields": {"System.Title": "bad"}, "relations": []},
+    ]
+    session = _FakeBatchSession(fail_ids=("bad",))
+    id_map = WorkItemIdMap(tmp_path / "map.json")
+    restorer = WorkItemBatchRestorer("https://dev.azure.com/dst", "pat", id_map, batch_size=2, session=session)
+
+    summary = restorer.restore(iter(items))
+
+    assert summary["created"] == 2 and summary["linked"] == 1
+    assert [f["id"] for f in summary["failures"]] == [3]
+    assert WorkItemIdMap(tmp_path / "map.json").get(2) == 1002
+    create = session.calls[0][1]
+    assert create["uri"] == "/My%20Proj/_apis/wit/workitems/$User%20Story?api-version=7.1"
+    assert all(op["path"] != "/fields/System.Rev" for op in session.calls[0][0]["body"])
+    [link] = session.calls[-1]
+    assert link["uri"].startswith("/_apis/wit/workitems/1002")
+    assert link["body"][0]["value"]["url"] == "https://dev.azure.com/dst/_apis/wit/workItems/1001"
+    assert session.gets == []
+
+    calls = len(session.calls)
+    rerun = WorkItemBatchRestorer("https://dev.azure.com/dst", "pat", WorkItemIdMap(tmp_path / "map.json"),
+                                  batch_size=2, session=session).restore(iter(items[:2]))
+    assert rerun["linked"] == 0 and rerun["failures"] == []
+    assert len(session.calls) == calls
+    assert session.gets == ["1002"]
+    assert len(session.relations[1002]) == 1
+
+
+def test_target_reads_are_capped_at_200_ids_per_request(tmp_path):
+    from adobackup.core.work_item_restore import WorkItemBatchRestorer, WorkItemIdMap
+
+    session = _FakeBatchSession()
+    session.relations = {i: [] for i in range(1, 451)}
+    restorer = WorkItemBatchRestorer("https://dev.azure.com/dst", "pat", WorkItemIdMap(tmp_path / "map.json"),
+                                     session=session)
+
+    assert len(restorer._get_targets(list(range(1, 451)))) == 450
+    assert [len(ids.split(",")) for ids in session.gets] == [200, 200, 50]
+
+
+def test_id_map_appends_each_save_and_reads_the_old_format(tmp_path):
+    from adobackup.core.work_item_restore import WorkItemIdMap
+
+    (tmp_path / "map.json").write_text('{"1": 101}')
+    id_map = WorkItemIdMap(tmp_path / "map.json")
+    id_map.set(2, 102)
+    id_map.save()
+    id_map.set(3, 103)
+    id_map.save()
+    id_map.save()
+
+    assert (tmp_path / "map.json").read_text().splitlines() == ['{"1": 101}', "[2, 102]", "[3, 103]"]
+    assert [WorkItemIdMap(tmp_path / "map.json").get(i) for i in (1, 2, 3)] == [101, 102, 103]
+
+
+def test_target_index_lists_each_project_once_and_counts_saved_calls():
+    from types import SimpleNamespace
+    from adobackup.core.target_index import TargetStateIndex
+
+    calls = []
+
+    def get_repositories(project):
+        calls.append(project)
+        return [SimpleNamespace(name="existing")] if project == "A" else []
+
+    git = SimpleNamespace(get_repositories=get_repositories)
+    connection = SimpleNamespace(clients=SimpleNamespace(get_git_client=lambda: git))
+    index = TargetStateIndex(connection)
+
+    assert index.exists("repos", "existing", "A")
+    assert not index.exists("repos", "new", "A")
+    index.add("repos", "new", "A")
+    assert index.exists("repos", "new", "A")
+    assert not index.exists("repos", "existing", "B")
+    assert calls == ["A", "B"]
+    assert index.stats() == {"lookups": 4, "api_calls": 2, "api_calls_saved": 2}
+
+    index.refresh("repos", "A")
+    assert not index.exists("repos", "new", "A")
+    assert calls == ["A", "B", "A"]
+
+
+def test_target_index_follows_continuation_tokens(tmp_path):
+    from benchmarks.fake_ado import FakeAzureDevOps
+    from benchmarks.synthetic import SyntheticOrg
+    from adobackup.core.target_index import TargetStateIndex
+    from adobackup.modules.http_client import PooledConnection
+
+    org = SyntheticOrg.generate("dst", tmp_path / "remote", projects=3, repos=0, work_items=0, pipelines=3,
+                                test_plans=0, wikis=0)
+
+    with FakeAzureDevOps([org], page_size=2) as server:
+        index = TargetStateIndex(PooledConnection(server.org_url("dst"), "pat"))
+        # The last entry of each listing is on its second page
+        assert index.exists("projects", "Project003")
+        assert index.exists("builds", "build-003", "Project001")
+        assert index.exists("releases", "release-003", "Project001")
+        assert index.exists("pipelines", "pipeline-003", "Project001")
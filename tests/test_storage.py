@@ -0,0 +1,146 @@
+import os
+
+from adobackup.core.transfer import BlobTransfer
+
+
+def test_block_upload_roundtrip_and_skip_unchanged(tmp_path, blob_service):
+    source = tmp_path / "data.bin"
+    payload = os.urandom(10_000)
+    source.write_bytes(payload)
+    transfer = BlobTransfer(blob_service, chunk_size=1024, max_concurrency=3)
+
+    stats = transfer.upload_file(source, "snap/data.bin", "backups")
+    assert stats["bytes"] == 10_000 and not stats["skipped"]
+    assert blob_service.blobs["snap/data.bin"][0] == payload
+    assert sum(1 for call in blob_service.calls if call[0] == "stage_block") == 10
+
+    again = transfer.upload_file(source, "snap/data.bin", "backups")
+    assert again["skipped"]
+    assert sum(1 for call in blob_service.calls if call[0] == "exists") == 1
+
+    target = tmp_path / "restore" / "data.bin"
+    transfer.download_file("snap/data.bin", "backups", target)
+    assert target.read_bytes() == payload
+    assert transfer.download_file("snap/data.bin", "backups", target)["skipped"]
+
+
+def _storage(blob_service):
+    from adobackup.core.storage_manager import StorageManager
+    storage = StorageManager("DefaultEndpointsProtocol=https;AccountName=test;AccountKey=dGVzdA==;EndpointSuffix=core.windows.net")
+    storage.client = blob_service
+    storage.transfer = BlobTransfer(blob_service, chunk_size=1024)
+    return storage
+
+
+def test_upload_snapshot_bundles_git_mirrors(tmp_path, blob_service):
+    import subprocess
+    origin = tmp_path / "origin"
+    subprocess.run(["git", "init", "-q", str(origin)], check=True)
+    (origin / "a.txt").write_text("a")
+    subprocess.run(["git", "-C", str(origin), "add", "."], check=True)
+    subprocess.run(["git", "-C", str(origin), "-c", "user.name=t", "-c", "user.email=t@t",
+                    "commit", "-q", "-m", "init"], check=True)
+
+    snapshot = tmp_path / "20240101_000000"
+    subprocess.run(["git", "clone", "-q", "--mirror", str(origin), str(snapshot / "repos" / "r.git")], check=True)
+    (snapshot / "shards").mkdir()
+    (snapshot / "shards" / "repos.ndjson").write_text('{"type":"repo"}\n')
+
+    summary = _storage(blob_service).upload_snapshot(snapshot)
+
+    assert sorted(blob_service.blobs) == ["20240101_000000/repos/r.git.bundle", "20240101_000000/shards/repos.ndjson"]
+    assert summary["blobs"] == 2
+    assert blob_service.blobs["20240101_000000/repos/r.git.bundle"][0].startswith(b"# v2 git bundle")
+
+
+def test_blob_reader_restores_mirrors_from_bundles(tmp_path, blob_service):
+    import json
+    import subprocess
+    from adobackup.core.backup_reader import BackupReader
+    from adobackup.core.shards import ShardWriter
+
+    origin = tmp_path / "origin"
+    subprocess.run(["git", "init", "-q", str(origin)], check=True)
+    (origin / "a.txt").write_text("a")
+    subprocess.run(["git", "-C", str(origin), "add", "."], check=True)
+    subprocess.run(["git", "-C", str(origin), "-c", "user.name=t", "-c", "user.email=t@t",
+                    "commit", "-q", "-m", "init"], check=True)
+    snapshot = tmp_path / "20240101_000000"
+    subprocess.run(["git", "clone", "-q", "--mirror", str(origin), str(snapshot / "repos" / "P" / "r.git")], check=True)
+    subprocess.run(["git", "init", "-q", "--bare", str(snapshot / "repos" / "P" / "empty.git")], check=True)
+    with ShardWriter(snapshot / "shards" / "repos.ndjson") as shard:
+        for name in ("r", "empty"):
+            shard.write({"type": "repo", "name": name, "project": "P", "status": "success",
+                         "path": f"repos/P/{name}.git"})
+    storage = _storage(blob_service)
+    storage.upload_snapshot(snapshot)
+    storage.upload_backup("backups", "latest_backup.json", json.dumps(
+        {"metadata": {"date": snapshot.name}, "data": {"repos": shard.summary(snapshot)}}
+    ))
+
+    reader = BackupReader.from_blob(storage)
+    repos = reader.repos()
+    repo = next(repos)
+    head = subprocess.run(["git", "-C", repo["local_path"], "rev-parse", "HEAD"], capture_output=True, check=True)
+    assert head.stdout == subprocess.run(["git", "-C", str(origin), "rev-parse", "HEAD"], capture_output=True).stdout
+    empty = next(repos)
+    assert not os.path.exists(repo["local_path"])
+    subprocess.run(["git", "-C", empty["local_path"], "rev-parse", "--git-dir"], check=True, capture_output=True)
+    reader.close()
+    assert not reader.work_dir.exists()
+
+
+def test_blob_reader_unpacks_archived_snapshots(tmp_path, blob_service):
+    import json
+    from adobackup.core.backup_reader import BackupReader
+    from adobackup.core.shards import ShardWriter
+
+    snapshot = tmp_path / "20240101_000000"
+    with ShardWriter(snapshot / "shards" / "pipelines.ndjson") as shard:
+        shard.write({"type": "pipeline", "id": 7, "name": "ci", "project": "P", "project_id": "p1",
+                     "status": "success"})
+    (snapshot / "pipelines" / "p1").mkdir(parents=True)
+    (snapshot / "pipelines" / "p1" / "7.json").write_text('{"id": 7}')
+    storage = _storage(blob_service)
+    summary = storage.upload_archive(snapshot, max_workers=2)
+    storage.upload_backup("backups", "latest_backup.json", json.dumps({
+        "metadata": {"date": snapshot.name, "archive": {"blob": summary["blob"], "codec": summary["codec"]}},
+        "data": {"pipelines": shard.summary(snapshot)},
+    }))
+
+    reader = BackupReader.from_blob(storage)
+    assert [p["name"] for p in reader.pipelines()] == ["ci"]
+    assert json.loads(reader.read_file("pipelines/p1/7.json")) == {"id": 7}
+    reader.close()
+    assert not reader.work_dir.exists()
+
+
+def test_chunk_store_dedupes_snapshots_and_collects_garbage(tmp_path):
+    from adobackup.core.chunk_store import ChunkStore, LocalObjectBackend
+
+    store = ChunkStore(LocalObjectBackend(tmp_path / "store"), chunk_size=256)
+    records = "".join(f'{{"type":"work_item","id":{i}}}\n' for i in range(200))
+    day1 = tmp_path / "20240101_000000"
+    (day1 / "shards").mkdir(parents=True)
+    (day1 / "shards" / "boards.ndjson").write_text(records)
+    (day1 / "pipelines").mkdir()
+    (day1 / "pipelines" / "1.json").write_text('{"id": 1}')
+
+    first = store.put_snapshot(day1)
+    assert first["new_bytes"] == first["bytes"]
+
+    day2 = tmp_path / "20240102_000000"
+    (day2 / "shards").mkdir(parents=True)
+    (day2 / "shards" / "boards.ndjson").write_text(records.replace('"id":150', '"id":1500'))
+    (day2 / "pipelines").mkdir()
+    (day2 / "pipelines" / "1.json").write_text('{"id": 1}')
+
+    second = store.put_snapshot(day2)
+    assert 0 < second["new_bytes"] < second["bytes"] // 4
+
+    restored = store.restore_snapshot("20240102_000000", tmp_path / "out")
+    assert (restored / "shards" / "boards.ndjson").read_text() == (day2 / "shards" / "boards.ndjson").read_text()
+
+    gc = store.expire(keep_last=1)
+    assert gc["expired"] == ["20240101_000000"] and gc["removed"] >= 1
+    assert store.list_snapshots() == ["20240102_000000"]
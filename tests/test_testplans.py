@@ -0,0 +1,70 @@
+import json
+from datetime import datetime, timezone
+
+from azure.devops.v7_1.test_plan import models
+
+from benchmarks.fake_ado import FakeAzureDevOps
+from benchmarks.synthetic import SyntheticOrg
+from adobackup.modules.http_client import PooledConnection
+from adobackup.modules.serialize import projection, to_dict
+from adobackup.modules import testplans
+
+
+def test_to_dict_uses_rest_keys_and_projection():
+    owner = models.IdentityRef(display_name="Ada", unique_name="ada@contoso.com", id="1", image_url="avatar.png",
+                               _links=models.ReferenceLinks(links={"avatar": {}}))
+    plan = models.TestPlan(id=7, name="Release", area_path="Web", owner=owner,
+                           start_date=datetime(2024, 1, 2, tzinfo=timezone.utc), description=None)
+
+    assert to_dict(plan, projection("id", "area_path", "start_date", "owner.display_name", "description")) == {
+        "id": 7, "areaPath": "Web", "startDate": "2024-01-02T00:00:00+00:00", "owner": {"displayName": "Ada"}
+    }
+    assert "_links" in to_dict(owner)
+    assert projection("owner", "owner.id") == {"owner": True}
+
+
+def test_plans_suites_and_cases_follow_continuation_tokens(tmp_path):
+    org = SyntheticOrg.generate("src", tmp_path / "remote", projects=2, repos=0, work_items=0, wikis=0,
+                                test_plans=3, suites=3, cases=5)
+
+    with FakeAzureDevOps([org], page_size=2) as server:
+        module = testplans.TestPlansModule(PooledConnection(server.org_url("src"), "pat"), max_workers=3)
+        records = list(module.stream(tmp_path))
+        calls = server.stats()["calls"]
+
+    assert [r["plan_id"] for r in records] == list(range(1, 7))
+    assert all(r["suites"] == 3 and r["cases"] == 15 for r in records)
+    # Two pages of plans per project, two of suites per plan, three of cases per suite
+    assert calls["GET test_plans"] == 4
+    assert calls["GET test_suites"] == 12
+    assert calls["GET test_cases"] == 54
+
+    with open(tmp_path / "test_plans" / "plan_1.json") as f:
+        saved = json.load(f)
+    assert saved["project"] == "Project001"
+    assert saved["plan"]["name"] == "Plan 1"
+    assert [case["order"] for case in saved["suites"][0]["testCases"]] == [1, 2, 3, 4, 5]
+    assert "_links" not in saved["suites"][0]
+
+
+def test_a_failing_plan_yields_a_failed_record_and_is_not_journaled(tmp_path, monkeypatch):
+    from adobackup.modules.journal import RunJournal
+
+    org = SyntheticOrg.generate("src", tmp_path / "remote", projects=1, repos=0, work_items=0, wikis=0,
+                                test_plans=3, suites=1, cases=2)
+    original = testplans.TestPlansModule._suite_cases
+
+    def flaky(self, project_name, plan_id, suite_id):
+        if plan_id == 2:
+            raise RuntimeError("boom")
+        return original(self, project_name, plan_id, suite_id)
+
+    monkeypatch.setattr(testplans.TestPlansModule, "_suite_cases", flaky)
+    journal = RunJournal(tmp_path / "journal.ndjson").scope("test_plans")
+    with FakeAzureDevOps([org]) as server:
+        module = testplans.TestPlansModule(PooledConnection(server.org_url("src"), "pat"), journal=journal)
+        records = list(module.stream(tmp_path))
+
+    assert [r["status"] for r in records] == ["success", "failed", "success"]
+    assert records[1]["error"] == "boom"
+    assert [journal.done(unit) for unit in ("1", "2", "3")] == [True, False, True]